@@ -77,8 +77,10 @@ function transformToBackend(frontendShop: Partial<CoffeeShop>): any {
   return result;
 }
 
+// Slim records for the map (no description, machine or links); load the
+// full record with getCoffeeShop when a shop is opened.
 export async function getCoffeeShops(): Promise<CoffeeShop[]> {
-  const response = await fetch(`${API_BASE_URL}/coffee-shops`);
+  const response = await fetch(`${API_BASE_URL}/coffee-shops?view=summary`);
   if (!response.ok) {
     throw new Error(`Failed to fetch coffee shops: ${response.statusText}`);
   }
@@ -3,6 +3,7 @@ import React, { useCallback, useState } from 'react';
 import { StyleSheet, View, ActivityIndicator, Text } from 'react-native';
 import MapView, { Region } from 'react-native-maps';
 import { useShops } from '../../hooks/useShops';
+import { getCoffeeShop } from '../lib/api';
 import type { CoffeeShop } from '../lib/types';
 import { ShopDetailScreen } from './ShopDetailScreen';
 import { ShopMarker } from '../components/ShopMarker';
@@ -19,9 +20,14 @@ export function MapScreen() {
     longitudeDelta: 0.1,
   });
 
-  const handleCalloutPress = useCallback((shop: CoffeeShop) => {
+  // Markers hold summaries; the detail screen needs the full record
+  const handleCalloutPress = useCallback(async (shop: CoffeeShop) => {
     setLastViewedShopId(shop.id);
-    setSelectedShop(shop);
+    try {
+      setSelectedShop(await getCoffeeShop(shop.id));
+    } catch (err) {
+      console.error('Error loading coffee shop:', err);
+    }
   }, []);
 
   const handleCloseDetail = useCallback(() => {
@@ -0,0 +1,40 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.core.serialization import json_response
+from app.models.city_stat import CityStat
+from app.schemas.coffee_shop import CityStats
+
+router = APIRouter()
+
+
+@router.get("/cities", response_model=List[CityStats])
+def get_cities(
+    state: Optional[str] = Query(None, min_length=2, max_length=2, description="Two-letter state code"),
+    min_shops: int = Query(1, ge=1, description="Only cities with at least this many shops"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get shop counts per city, largest first, from the city_stats aggregate
+    table (one row per city, so this never scans the shops). Shops whose
+    address couldn't be parsed into a US city/state aren't counted.
+    """
+    query = db.query(CityStat).filter(CityStat.shop_count >= min_shops)
+    if state:
+        query = query.filter(CityStat.state == state.upper())
+    stats = query.order_by(CityStat.shop_count.desc(), CityStat.state, CityStat.city).all()
+    return json_response([
+        {
+            "city": stat.city,
+            "state": stat.state,
+            "shop_count": stat.shop_count,
+            "pour_over": stat.pour_over_count,
+            "has_wifi": stat.has_wifi_count,
+            "accessibility": stat.accessibility_count,
+            "starred": stat.starred_count,
+            "center": {"latitude": stat.center_latitude, "longitude": stat.center_longitude},
+            "bbox": [stat.min_latitude, stat.min_longitude, stat.max_latitude, stat.max_longitude],
+        }
+        for stat in stats
+    ])
@@ -1,12 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import csv
+import io
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
-from typing import List
-from app.core.database import get_db
+from typing import AsyncIterator, Iterator, List, Literal, Sequence, Union
+from app.core.database import get_db, SessionLocal
+from app.core.duplicates import find_duplicates
+from app.core.geo import MAX_SURFACE_DISTANCE_KM, bounding_box, haversine_km, postgis_enabled
 from app.core.geocoding import geocode_address
 from app.core.auth import get_current_admin_user
+from app.core.catalog_cache import CATALOG_CACHE, catalog_cache
+from app.core.changes import catalog_state, changes_since
+from app.core.events import catalog_events
+from app.core.geocode_jobs import enqueue_geocode_job, job_to_dict
+from app.core.serialization import (
+    ShopView,
+    fields_for_view,
+    json_response,
+    rows_to_dicts,
+    encode_json,
+    shop_columns,
+    shop_to_dict,
+)
+from app.core.shop_writes import apply_shop_update, insert_shop, remove_shop, update_duplicates
+from app.core.snapshot import catalog_snapshot
 from app.models.coffee_shop import CoffeeShop
 from app.models.user import User
-from app.schemas.coffee_shop import CoffeeShop as CoffeeShopSchema, CoffeeShopCreate, CoffeeShopUpdate
+from app.schemas.coffee_shop import (
+    CoffeeShop as CoffeeShopSchema,
+    CoffeeShopBatch,
+    CoffeeShopBatchRequest,
+    CoffeeShopChanges,
+    CoffeeShopCreate,
+    CoffeeShopSummary,
+    DuplicateConflict,
+    GeocodeJobStatus,
+    CoffeeShopUpdate,
+)
 
 router = APIRouter()
 
@@ -29,39 +61,298 @@ def serialize_weekly_hours(weekly_hours):
         return result
     return weekly_hours
 
-@router.get("/coffee-shops", response_model=List[CoffeeShopSchema])
-def get_coffee_shops(db: Session = Depends(get_db)):
+def duplicate_conflict(candidates: List[dict]) -> Response:
+    """409 listing the existing shops a write looks like (see app/core/duplicates.py)."""
+    names = ", ".join(candidate["name"] for candidate in candidates[:3])
+    return json_response(
+        {"detail": f"Possible duplicate of existing shop(s): {names}", "candidates": candidates},
+        status_code=409,
+    )
+
+
+# List endpoints return raw JSON (see app/core/serialization.py); the
+# response_model only documents the shape
+ShopListResponse = Union[List[CoffeeShopSchema], List[CoffeeShopSummary]]
+
+
+def shops_response(shops: List[CoffeeShop], view: ShopView):
+    """Encode ORM results of a list/search endpoint for the requested view."""
+    fields = fields_for_view(view)
+    return json_response([shop_to_dict(shop, fields) for shop in shops])
+
+@router.get("/coffee-shops", response_model=ShopListResponse)
+def get_coffee_shops(view: ShopView = "full", db: Session = Depends(get_db)):
+    """
+    Get all coffee shops. Use view=summary for the slim list/map payload.
+    """
+    snapshot = catalog_snapshot.current(db)
+    if snapshot is not None:
+        return Response(content=snapshot.list_body(view), media_type="application/json")
+    if CATALOG_CACHE:
+        return Response(content=catalog_cache.get(db, view), media_type="application/json")
+    fields = fields_for_view(view)
+    rows = db.query(*shop_columns(fields)).all()
+    return json_response(rows_to_dicts(rows, fields))
+
+# Rows fetched per round trip by the export cursor
+EXPORT_BATCH_SIZE = 1000
+
+
+def _stream_shop_batches(fields: Sequence[str]) -> Iterator[list]:
+    """
+    Yield batches of shop rows from a server-side cursor.
+    Opens its own session because it runs after the request's dependencies
+    have been torn down.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(*shop_columns(fields))
+            .order_by(CoffeeShop.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+def _ndjson_chunks(fields: Sequence[str]) -> Iterator[bytes]:
+    """One JSON object per line, one chunk per cursor batch."""
+    for batch in _stream_shop_batches(fields):
+        yield b"".join(encode_json(dict(zip(fields, row))) + b"\n" for row in batch)
+
+
+def _csv_chunks(fields: Sequence[str]) -> Iterator[str]:
+    """CSV with a header row; weekly_hours is written as a JSON string."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for batch in _stream_shop_batches(fields):
+        for row in batch:
+            writer.writerow([
+                encode_json(value).decode() if isinstance(value, dict) else value
+                for value in row
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Empty catalog: only the header was written
+        yield buffer.getvalue()
+
+@router.get("/coffee-shops/export")
+def export_coffee_shops(format: Literal["ndjson", "csv"] = "ndjson", view: ShopView = "full"):
+    """
+    Stream the full catalog as NDJSON (one shop per line) or CSV.
+    Rows are read in batches from a server-side cursor, so memory stays flat
+    regardless of catalog size and the first rows go out immediately.
+    """
+    fields = fields_for_view(view)
+    if format == "csv":
+        return StreamingResponse(
+            _csv_chunks(fields),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="coffee-shops.csv"'},
+        )
+    return StreamingResponse(_ndjson_chunks(fields), media_type="application/x-ndjson")
+
+@router.get("/coffee-shops/changes", response_model=CoffeeShopChanges)
+def get_coffee_shop_changes(
+    since: int = Query(0, ge=0),
+    view: ShopView = "full",
+    db: Session = Depends(get_db)
+):
+    """
+    Get shops created, updated or deleted since catalog version `since`.
+    Clients store the returned version and pass it on the next call. since=0
+    (or a version this server can't sync from, e.g. from before a bulk import)
+    returns the full catalog with full=true, and the client should replace its
+    local copy.
+    """
+    fields = fields_for_view(view)
+    # Read the version before the data: a write landing in between is
+    # returned now and again on the next sync, which is harmless.
+    state = catalog_state(db)
+    version = state.version
+
+    if since == 0 or since > version or since < state.baseline:
+        rows = db.query(*shop_columns(fields)).all()
+        return json_response({
+            "version": version,
+            "full": True,
+            "upserts": rows_to_dicts(rows, fields),
+            "deletes": [],
+        })
+
+    upsert_ids, delete_ids = changes_since(db, since)
+    rows = []
+    if upsert_ids:
+        rows = db.query(*shop_columns(fields)).filter(CoffeeShop.id.in_(upsert_ids)).all()
+    return json_response({
+        "version": version,
+        "full": False,
+        "upserts": rows_to_dicts(rows, fields),
+        "deletes": delete_ids,
+    })
+
+# Upper bound on ids per batch request
+MAX_BATCH_IDS = 500
+
+
+def _batch_response(ids: List[int], view: ShopView, db: Session):
+    """Shops for `ids` in request order (duplicates dropped) and the ids not found."""
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+
+    snapshot = catalog_snapshot.current(db)
+    if snapshot is not None:
+        bodies, missing = [], []
+        for shop_id in ids:
+            body = snapshot.shop_body(shop_id, view)
+            if body is None:
+                missing.append(shop_id)
+            else:
+                bodies.append(body)
+        content = b'{"shops":[' + b",".join(bodies) + b'],"missing":' + encode_json(missing) + b"}"
+        return Response(content=content, media_type="application/json")
+
+    fields = fields_for_view(view)
+    found = {}
+    if ids:
+        rows = db.query(*shop_columns(fields)).filter(CoffeeShop.id.in_(ids)).all()
+        found = {shop["id"]: shop for shop in rows_to_dicts(rows, fields)}
+    return json_response({
+        "shops": [found[shop_id] for shop_id in ids if shop_id in found],
+        "missing": [shop_id for shop_id in ids if shop_id not in found],
+    })
+
+@router.get("/coffee-shops/batch", response_model=CoffeeShopBatch)
+def get_coffee_shops_batch(
+    ids: str = Query(..., description="Comma-separated shop ids, e.g. 1,2,3"),
+    view: ShopView = "full",
+    db: Session = Depends(get_db)
+):
+    """
+    Get several coffee shops in one request, in the order the ids were given.
+    Ids that don't exist are listed in `missing`. Use POST for long lists.
+    """
+    try:
+        shop_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    return _batch_response(shop_ids, view, db)
+
+@router.post("/coffee-shops/batch", response_model=CoffeeShopBatch)
+def post_coffee_shops_batch(
+    request: CoffeeShopBatchRequest,
+    view: ShopView = "full",
+    db: Session = Depends(get_db)
+):
+    """
+    Same as GET /coffee-shops/batch with the ids in the request body.
+    """
+    return _batch_response(request.ids, view, db)
+
+# Comment lines sent while idle so proxies don't close the stream
+EVENTS_HEARTBEAT_SECONDS = 15.0
+
+@router.get("/coffee-shops/events")
+async def stream_coffee_shop_events(request: Request):
     """
-    Get all coffee shops.
+    Server-Sent Events stream of catalog writes (created, updated, deleted).
+    Each event's id is the catalog version, so a client that reconnects can
+    catch up with /coffee-shops/changes?since=<last id>. A `resync` event
+    means the client fell behind and should refetch.
     """
-    shops = db.query(CoffeeShop).all()
-    return shops
+    async def event_stream() -> AsyncIterator[bytes]:
+        async with catalog_events.subscribe() as queue:
+            yield b"retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if event is None:
+                    yield b"event: resync\ndata: {}\n\n"
+                    return
+                yield (
+                    f"id: {event['version']}\nevent: {event['type']}\n".encode()
+                    + b"data: " + encode_json(event) + b"\n\n"
+                )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/coffee-shops/{shop_id}", response_model=CoffeeShopSchema)
 def get_coffee_shop(shop_id: int, db: Session = Depends(get_db)):
     """
     Get a specific coffee shop by ID.
     """
+    snapshot = catalog_snapshot.current(db)
+    if snapshot is not None:
+        body = snapshot.shop_body(shop_id)
+        if body is None:
+            raise HTTPException(status_code=404, detail="Coffee shop not found")
+        return Response(content=body, media_type="application/json")
+
     shop = db.query(CoffeeShop).filter(CoffeeShop.id == shop_id).first()
     if shop is None:
         raise HTTPException(status_code=404, detail="Coffee shop not found")
     return shop
 
-@router.post("/coffee-shops", response_model=CoffeeShopSchema, status_code=201)
+def geocode_accepted(job) -> Response:
+    """202 for a write waiting on background geocoding; Location points at the job."""
+    response = json_response(job_to_dict(job), status_code=202)
+    response.headers["Location"] = f"/api/v1/geocode-jobs/{job.id}"
+    return response
+
+@router.post(
+    "/coffee-shops",
+    response_model=CoffeeShopSchema,
+    status_code=201,
+    responses={202: {"model": GeocodeJobStatus}, 409: {"model": DuplicateConflict}},
+)
 async def create_coffee_shop(
     shop: CoffeeShopCreate,
+    allow_duplicate: bool = Query(False, description="Create even if a nearby shop has a similar name"),
+    defer_geocode: bool = Query(False, description="Geocode in the background and answer 202 with a job"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
     Create a new coffee shop. Requires admin authentication.
-    If latitude/longitude are not provided, they will be geocoded from the address.
+    If latitude/longitude are not provided, they will be geocoded from the address,
+    or with defer_geocode=true by a background job (poll /geocode-jobs/{job_id}).
+    Answers 409 with the candidates when a nearby shop looks like the same place.
     """
+    data = {
+        "name": shop.name,
+        "address": shop.address,
+        "image": shop.image,
+        "accessibility": shop.accessibility,
+        "has_wifi": shop.has_wifi,
+        "description": shop.description,
+        "machine": shop.machine,
+        "weekly_hours": serialize_weekly_hours(shop.weekly_hours),
+        "pour_over": shop.pour_over,
+        "website": shop.website,
+        "instagram": shop.instagram,
+    }
+    
     # Geocode address if coordinates are not provided
     latitude = shop.latitude
     longitude = shop.longitude
     
     if latitude is None or longitude is None:
+        if defer_geocode:
+            job = enqueue_geocode_job(db, "create", shop.address, data, allow_duplicate=allow_duplicate)
+            return geocode_accepted(job)
         coordinates = await geocode_address(shop.address)
         if coordinates:
             latitude, longitude = coordinates
@@ -71,36 +362,30 @@ async def create_coffee_shop(
                 detail=f"Could not geocode address: {shop.address}. Please provide latitude and longitude manually."
             )
     
-    db_shop = CoffeeShop(
-        name=shop.name,
-        address=shop.address,
-        latitude=latitude,
-        longitude=longitude,
-        image=shop.image,
-        accessibility=shop.accessibility,
-        has_wifi=shop.has_wifi,
-        description=shop.description,
-        machine=shop.machine,
-        weekly_hours=serialize_weekly_hours(shop.weekly_hours),
-        pour_over=shop.pour_over,
-        website=shop.website,
-        instagram=shop.instagram
-    )
-    db.add(db_shop)
-    db.commit()
-    db.refresh(db_shop)
-    return db_shop
+    if not allow_duplicate:
+        candidates = find_duplicates(db, shop.name, shop.address, latitude, longitude)
+        if candidates:
+            return duplicate_conflict(candidates)
+    
+    return insert_shop(db, dict(data, latitude=latitude, longitude=longitude))
 
-@router.put("/coffee-shops/{shop_id}", response_model=CoffeeShopSchema)
+@router.put(
+    "/coffee-shops/{shop_id}",
+    response_model=CoffeeShopSchema,
+    responses={202: {"model": GeocodeJobStatus}, 409: {"model": DuplicateConflict}},
+)
 async def update_coffee_shop(
     shop_id: int,
     shop: CoffeeShopUpdate,
+    allow_duplicate: bool = Query(False, description="Save even if a nearby shop has a similar name"),
+    defer_geocode: bool = Query(False, description="Geocode a new address in the background and answer 202 with a job"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
     Update a coffee shop. Requires admin authentication.
-    If address is updated without new coordinates, they will be geocoded from the new address.
+    If address is updated without new coordinates, they will be geocoded from the new address;
+    with defer_geocode=true the whole update waits for a background job instead.
     """
     db_shop = db.query(CoffeeShop).filter(CoffeeShop.id == shop_id).first()
     if db_shop is None:
@@ -116,6 +401,14 @@ async def update_coffee_shop(
     # If address changed but coordinates weren't provided, geocode the new address
     if "address" in update_data and update_data["address"] != db_shop.address:
         if "latitude" not in update_data or "longitude" not in update_data:
+            if defer_geocode:
+                update_data.pop("latitude", None)
+                update_data.pop("longitude", None)
+                job = enqueue_geocode_job(
+                    db, "update", update_data["address"], update_data,
+                    shop_id=db_shop.id, allow_duplicate=allow_duplicate,
+                )
+                return geocode_accepted(job)
             coordinates = await geocode_address(update_data["address"])
             if coordinates:
                 update_data["latitude"], update_data["longitude"] = coordinates
@@ -125,12 +418,13 @@ async def update_coffee_shop(
                     detail=f"Could not geocode address: {update_data['address']}. Please provide latitude and longitude manually."
                 )
     
-    for field, value in update_data.items():
-        setattr(db_shop, field, value)
+    # Re-check for duplicates when the shop is renamed or moved
+    if not allow_duplicate:
+        candidates = update_duplicates(db, db_shop, update_data)
+        if candidates:
+            return duplicate_conflict(candidates)
     
-    db.commit()
-    db.refresh(db_shop)
-    return db_shop
+    return apply_shop_update(db, db_shop, update_data)
 
 @router.delete("/coffee-shops/{shop_id}", status_code=204)
 def delete_coffee_shop(
@@ -145,35 +439,136 @@ def delete_coffee_shop(
     if db_shop is None:
         raise HTTPException(status_code=404, detail="Coffee shop not found")
     
-    db.delete(db_shop)
-    db.commit()
+    remove_shop(db, db_shop)
     return None
 
-@router.get("/coffee-shops/search/by-location", response_model=List[CoffeeShopSchema])
+@router.get("/coffee-shops/search/by-location", response_model=ShopListResponse)
 def search_coffee_shops_by_location(
     latitude: float,
     longitude: float,
     radius: float = 10.0,  # radius in kilometers
+    view: ShopView = "full",
     db: Session = Depends(get_db)
 ):
     """
-    Search coffee shops by location within a radius.
-    This is a simplified version - for production, consider using PostGIS for accurate distance calculations.
+    Search coffee shops by location within a radius, nearest first.
+    Uses PostGIS ST_DWithin when enabled, otherwise an indexed bounding box
+    prefilter followed by an exact haversine check.
     """
-    # Simple bounding box search (approximate)
-    # For production, use proper geospatial queries with PostGIS
-    shops = db.query(CoffeeShop).all()
-    
-    # Filter by approximate distance (Haversine formula would be better)
-    import math
-    filtered_shops = []
-    for shop in shops:
-        # Simple distance calculation (not accurate for large distances)
-        lat_diff = abs(shop.latitude - latitude)
-        lon_diff = abs(shop.longitude - longitude)
-        distance = math.sqrt(lat_diff**2 + lon_diff**2) * 111  # Rough conversion to km
+    snapshot = catalog_snapshot.current(db)
+    if snapshot is not None:
+        indices = [index for _, index in snapshot.ranked(latitude, longitude, radius)]
+        return Response(content=snapshot.bodies(indices, view), media_type="application/json")
+
+    if postgis_enabled():
+        shops = (
+            db.query(CoffeeShop)
+            .filter(text(f"ST_DWithin(coffee_shops.geog, {_POSTGIS_POINT}, :meters)"))
+            .order_by(text(f"coffee_shops.geog <-> {_POSTGIS_POINT}"))
+            .params(lat=latitude, lng=longitude, meters=radius * 1000)
+            .all()
+        )
+        return shops_response(shops, view)
+
+    min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius)
+    candidates = _bbox_query(db, min_lat, min_lng, max_lat, max_lng).all()
+
+    matches = []
+    for shop in candidates:
+        distance = haversine_km(latitude, longitude, shop.latitude, shop.longitude)
         if distance <= radius:
-            filtered_shops.append(shop)
-    
-    return filtered_shops
+            matches.append((distance, shop))
+    matches.sort(key=lambda match: match[0])
+    return shops_response([shop for _, shop in matches], view)
+
+@router.get("/coffee-shops/search/nearest", response_model=ShopListResponse)
+def search_nearest_coffee_shops(
+    latitude: float,
+    longitude: float,
+    limit: int = Query(10, ge=1, le=100),
+    view: ShopView = "full",
+    db: Session = Depends(get_db)
+):
+    """
+    Get the closest coffee shops to a point, nearest first.
+    Uses the PostGIS KNN operator when enabled, otherwise widens a bounding
+    box search until enough shops are found.
+    """
+    snapshot = catalog_snapshot.current(db)
+    if snapshot is not None:
+        indices = snapshot.nearest(latitude, longitude, limit)
+        return Response(content=snapshot.bodies(indices, view), media_type="application/json")
+
+    if postgis_enabled():
+        shops = (
+            db.query(CoffeeShop)
+            .order_by(text(f"coffee_shops.geog <-> {_POSTGIS_POINT}"))
+            .params(lat=latitude, lng=longitude)
+            .limit(limit)
+            .all()
+        )
+        return shops_response(shops, view)
+
+    radius = 5.0
+    while True:
+        min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius)
+        candidates = _bbox_query(db, min_lat, min_lng, max_lat, max_lng).all()
+        covers_globe = radius >= MAX_SURFACE_DISTANCE_KM
+        ranked = sorted(
+            ((haversine_km(latitude, longitude, shop.latitude, shop.longitude), shop) for shop in candidates),
+            key=lambda match: match[0]
+        )
+        if covers_globe:
+            return shops_response([shop for _, shop in ranked[:limit]], view)
+        # Shops in the box corners may be farther than ones just outside it,
+        # so only trust results that fall inside the inscribed circle.
+        within = [shop for distance, shop in ranked if distance <= radius]
+        if len(within) >= limit:
+            return shops_response(within[:limit], view)
+        radius = min(radius * 4, MAX_SURFACE_DISTANCE_KM)
+
+@router.get("/coffee-shops/search/by-bbox", response_model=ShopListResponse)
+def search_coffee_shops_by_bbox(
+    min_lat: float,
+    min_lng: float,
+    max_lat: float,
+    max_lng: float,
+    view: ShopView = "full",
+    db: Session = Depends(get_db)
+):
+    """
+    Get coffee shops inside a bounding box, e.g. the visible map viewport.
+    """
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="Bounding box min values must not exceed max values")
+
+    snapshot = catalog_snapshot.current(db)
+    if snapshot is not None:
+        indices = snapshot.in_bbox(min_lat, min_lng, max_lat, max_lng)
+        return Response(content=snapshot.bodies(indices, view), media_type="application/json")
+
+    if postgis_enabled():
+        shops = (
+            db.query(CoffeeShop)
+            .filter(text(
+                "coffee_shops.geog && "
+                "ST_MakeEnvelope(:min_lng, :min_lat, :max_lng, :max_lat, 4326)::geography"
+            ))
+            .params(min_lat=min_lat, min_lng=min_lng, max_lat=max_lat, max_lng=max_lng)
+            .all()
+        )
+        return shops_response(shops, view)
 
+    return shops_response(_bbox_query(db, min_lat, min_lng, max_lat, max_lng).all(), view)
+
+
+# Point literal for PostGIS queries; expects :lat and :lng bind params
+_POSTGIS_POINT = "ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)::geography"
+
+
+def _bbox_query(db: Session, min_lat: float, min_lng: float, max_lat: float, max_lng: float):
+    """Portable bounding box filter served by the (latitude, longitude) index."""
+    return db.query(CoffeeShop).filter(
+        CoffeeShop.latitude.between(min_lat, max_lat),
+        CoffeeShop.longitude.between(min_lng, max_lng),
+    )
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.core.auth import get_current_admin_user
+from app.core.database import get_db
+from app.core.geocode_jobs import job_to_dict
+from app.core.serialization import json_response
+from app.models.geocode_job import GeocodeJob
+from app.models.user import User
+from app.schemas.coffee_shop import GeocodeJobStatus
+
+router = APIRouter()
+
+
+@router.get("/geocode-jobs/{job_id}", response_model=GeocodeJobStatus)
+def get_geocode_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user),
+):
+    """
+    Get a background geocoding job (from ?defer_geocode=true). Poll until
+    status is `done`, when shop_id names the written shop, or `failed`,
+    when error says why (with candidates if the shop looked like a duplicate).
+    Requires admin authentication.
+    """
+    job = db.get(GeocodeJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Geocode job not found")
+    return json_response(job_to_dict(job))
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import RedirectResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.database import get_db
+from app.core.images import IMAGE_WIDTHS, MEDIA_TYPES, ImageUnavailable, image_resizer, variant_etag
+from app.models.coffee_shop import CoffeeShop
+
+router = APIRouter()
+
+# Variants are keyed by the source URL, so a changed shop image gets a new
+# ETag; browsers and CDNs keep a variant for a week and revalidate after
+IMAGE_CACHE_CONTROL = "public, max-age=604800, stale-while-revalidate=86400"
+
+
+@router.get("/images/{shop_id}")
+async def get_shop_image(
+    shop_id: int,
+    request: Request,
+    w: int = Query(480, ge=1, le=IMAGE_WIDTHS[-1], description="Requested width in pixels"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get a shop's image resized to width `w` (snapped up to a fixed set of
+    widths), as WebP when the client accepts it and JPEG otherwise. Images
+    that can't be resized redirect to the original URL.
+    """
+    # Async for the fetch and resize, so keep the blocking query off the event loop
+    image = await run_in_threadpool(
+        lambda: db.query(CoffeeShop.image).filter(CoffeeShop.id == shop_id).scalar()
+    )
+    if not image:
+        raise HTTPException(status_code=404, detail="Coffee shop image not found")
+
+    image_format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    etag = f'"{variant_etag(image, w, image_format)}"'
+    headers = {"Cache-Control": IMAGE_CACHE_CONTROL, "ETag": etag, "Vary": "Accept"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        data, _ = await image_resizer.variant(image, w, image_format)
+    except ImageUnavailable as e:
+        print(f"Serving original image for shop {shop_id}: {e}")
+        return RedirectResponse(image, status_code=307)
+    return Response(content=data, media_type=MEDIA_TYPES[image_format], headers=headers)
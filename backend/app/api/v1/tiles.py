@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.orm import Session
+from app.core.changes import CatalogState, catalog_state, positions_since
+from app.core.database import get_db
+from app.core.serialization import SUMMARY_FIELDS, shop_columns
+from app.core.tiles import MAX_TILE_ZOOM, CatalogTag, buffered_tile_bounds, encode_point_tile, tile_cache
+from app.models.coffee_shop import CoffeeShop
+
+router = APIRouter()
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+# Cached tiles here are checked against the catalog version on every request;
+# downstream caches (browser/CDN) only hold them briefly
+TILE_CACHE_CONTROL = "public, max-age=60, s-maxage=300"
+
+# Scalar attributes carried by each point feature (id and position are encoded
+# separately; vector tile values can't hold the weekly_hours object)
+TILE_PROPERTIES = [field for field in SUMMARY_FIELDS if field not in ("id", "latitude", "longitude", "weekly_hours")]
+
+
+def sync_tile_cache(db: Session, state: CatalogState) -> CatalogTag:
+    """
+    Bring the tile cache up to `state`, evicting only the tiles the logged
+    changes touched. Tiles from another epoch, or from before a bulk change
+    (which the log doesn't cover), are dropped by the next put instead.
+    """
+    version = (state.epoch, state.version)
+    cached = tile_cache.version
+    if cached is not None and cached[0] == state.epoch and state.baseline <= cached[1] < state.version:
+        tile_cache.advance(cached, version, positions_since(db, cached[1]))
+    return version
+
+
+@router.get("/tiles/{z}/{x}/{y}.mvt")
+def get_shop_tile(z: int, x: int, y: int, db: Session = Depends(get_db)):
+    """
+    Get a Mapbox Vector Tile of coffee shop points for the given XYZ tile.
+    Features carry the summary attributes; the layer is named `coffee_shops`.
+    """
+    if not 0 <= z <= MAX_TILE_ZOOM or not 0 <= x < (1 << z) or not 0 <= y < (1 << z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    key = (z, x, y)
+    # Read the version first; see get_coffee_shop_changes
+    version = sync_tile_cache(db, catalog_state(db))
+    tile = tile_cache.get(key, version)
+    if tile is None:
+        min_lat, min_lng, max_lat, max_lng = buffered_tile_bounds(z, x, y)
+        rows = (
+            db.query(*shop_columns(("id", "latitude", "longitude", *TILE_PROPERTIES)))
+            .filter(
+                CoffeeShop.latitude.between(min_lat, max_lat),
+                CoffeeShop.longitude.between(min_lng, max_lng),
+            )
+            .all()
+        )
+        tile = encode_point_tile(
+            ((row[0], row[1], row[2], dict(zip(TILE_PROPERTIES, row[3:]))) for row in rows),
+            z, x, y,
+        )
+        tile_cache.put(key, version, tile)
+
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers={"Cache-Control": TILE_CACHE_CONTROL})
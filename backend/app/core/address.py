@@ -0,0 +1,68 @@
+"""
+City/state extraction from free-form US addresses.
+
+Addresses come from admins and Google Places in the usual
+"street, city, ST 12345[, USA]" shape. The state segment is found from the
+end (two-letter code or full state name, optional ZIP) and the segment
+before it is taken as the city.
+"""
+import re
+from typing import Optional, Tuple
+
+US_STATES = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA",
+    "colorado": "CO", "connecticut": "CT", "delaware": "DE", "district of columbia": "DC",
+    "florida": "FL", "georgia": "GA", "hawaii": "HI", "idaho": "ID", "illinois": "IL",
+    "indiana": "IN", "iowa": "IA", "kansas": "KS", "kentucky": "KY", "louisiana": "LA",
+    "maine": "ME", "maryland": "MD", "massachusetts": "MA", "michigan": "MI", "minnesota": "MN",
+    "mississippi": "MS", "missouri": "MO", "montana": "MT", "nebraska": "NE", "nevada": "NV",
+    "new hampshire": "NH", "new jersey": "NJ", "new mexico": "NM", "new york": "NY",
+    "north carolina": "NC", "north dakota": "ND", "ohio": "OH", "oklahoma": "OK", "oregon": "OR",
+    "pennsylvania": "PA", "rhode island": "RI", "south carolina": "SC", "south dakota": "SD",
+    "tennessee": "TN", "texas": "TX", "utah": "UT", "vermont": "VT", "virginia": "VA",
+    "washington": "WA", "west virginia": "WV", "wisconsin": "WI", "wyoming": "WY",
+    "puerto rico": "PR",
+}
+STATE_CODES = set(US_STATES.values())
+
+COUNTRY_SEGMENTS = {"usa", "us", "united states", "united states of america"}
+_STATE_SEGMENT = re.compile(r"^(?P<state>[A-Za-z][A-Za-z .]*?)\.?(?:\s+(?P<zip>\d{5})(?:-\d{4})?)?$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize_state(value: str) -> Optional[str]:
+    value = _WHITESPACE.sub(" ", value).strip()
+    if value.upper() in STATE_CODES:
+        return value.upper()
+    return US_STATES.get(value.lower())
+
+
+def normalize_city(city: str) -> str:
+    """Collapse whitespace; title-case only all-upper or all-lower names (keeps "McKinney")."""
+    city = _WHITESPACE.sub(" ", city).strip(" .")
+    if city.isupper() or city.islower():
+        city = " ".join(word.capitalize() for word in city.split(" "))
+    return city
+
+
+def parse_city_state(address: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Return (city, state code) for a US address, or None if it can't be found."""
+    if not address:
+        return None
+    segments = [segment.strip() for segment in address.split(",") if segment.strip()]
+    while segments and segments[-1].lower().strip(".") in COUNTRY_SEGMENTS:
+        segments.pop()
+
+    for i in range(len(segments) - 1, 0, -1):
+        match = _STATE_SEGMENT.match(segments[i])
+        if not match:
+            continue
+        state = _normalize_state(match.group("state"))
+        if state is None:
+            continue
+        city = normalize_city(segments[i - 1])
+        # "123 Main St, TX 78701" has no city segment
+        if not city or city[0].isdigit():
+            return None
+        return city, state
+    return None
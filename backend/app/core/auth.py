@@ -43,6 +43,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def decode_access_token(token: str) -> Optional[str]:
+    """Username from a validly signed, unexpired token; None for anything else."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    return username if isinstance(username, str) else None
+
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Get a user by username."""
     return db.query(User).filter(User.username == username).first()
@@ -66,12 +76,8 @@ async def get_current_user(
     if not token:
         return None
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-    except JWTError:
+    username = decode_access_token(token)
+    if username is None:
         return None
     
     user = get_user_by_username(db, username)
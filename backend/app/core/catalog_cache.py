@@ -0,0 +1,51 @@
+"""
+In-memory cache of the encoded GET /coffee-shops bodies.
+
+Bodies are kept per view and tagged with the catalog epoch and version they
+were built at. Each request reads both (one primary-key lookup), so a write
+made through any worker or script is picked up on the next read without
+cross-process invalidation. Rows are read after the version, and versions
+are assigned in commit order (see app/core/changes.py), so every change up
+to the tag is in the body; a racing write can only make it newer.
+"""
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.changes import catalog_state
+from app.core.serialization import ShopView, encode_json, fields_for_view, rows_to_dicts, shop_columns
+
+CATALOG_CACHE = os.getenv("CATALOG_CACHE", "true").lower() in ("1", "true", "yes")
+
+
+class CatalogCache:
+    """Encoded catalog list bodies per view, valid for one catalog (epoch, version)."""
+
+    def __init__(self):
+        self._version: Optional[Tuple[int, int]] = None
+        self._bodies: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, view: ShopView) -> bytes:
+        state = catalog_state(db)
+        version = (state.epoch, state.version)
+        with self._lock:
+            if self._version == version and view in self._bodies:
+                return self._bodies[view]
+
+        fields = fields_for_view(view)
+        body = encode_json(rows_to_dicts(db.query(*shop_columns(fields)).all(), fields))
+        with self._lock:
+            if self._version != version:
+                self._version = version
+                self._bodies = {}
+            self._bodies[view] = body
+        return body
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._bodies = {}
+
+
+catalog_cache = CatalogCache()
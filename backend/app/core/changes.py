@@ -0,0 +1,126 @@
+"""
+Catalog change log used for delta sync.
+
+Every write to coffee_shops appends a CatalogChange row in the same
+transaction, so a client holding version N only needs the rows after N.
+
+Versions must follow commit order, which sequence or autoincrement ids
+don't: on PostgreSQL an id is handed out at insert time, so a reader could
+see id N committed while a transaction holding a lower id is still open and
+then skip that change forever. Instead each change takes its id from the
+single catalog_version row, incremented by an UPDATE that row-locks it
+until the writer commits. Writers therefore get versions one at a time in
+commit order, and a reader that sees version N has every change up to N.
+
+Writes that bypass the log (seed scripts, imports) call mark_bulk_change,
+which bumps the version and raises the baseline: clients holding an older
+version get the full catalog, since the log can't tell them what changed.
+Caches key on (epoch, version) so a recreated database, whose versions
+start over, never matches bodies cached from the old one.
+"""
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models.catalog_change import CatalogChange
+from app.models.catalog_version import CatalogVersion
+from app.models.coffee_shop import CoffeeShop
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+class CatalogState(NamedTuple):
+    version: int
+    baseline: int
+    epoch: int
+
+
+def next_version(db: Session) -> int:
+    """
+    Take the next catalog version. Holds the catalog_version row lock until
+    the caller commits or rolls back, so keep the rest of the transaction short.
+    """
+    db.execute(
+        update(CatalogVersion).where(CatalogVersion.id == 1).values(version=CatalogVersion.version + 1)
+    )
+    return db.query(CatalogVersion.version).filter(CatalogVersion.id == 1).scalar()
+
+
+def record_change(
+    db: Session, shop_id: int, operation: str, previous: Optional[Dict[str, float]] = None
+) -> CatalogChange:
+    """
+    Append a change for shop_id, with its position before the write if it
+    had one. Committed together with the caller's write; flushed here so
+    change.id (the new version) is available right away.
+    """
+    previous = previous or {}
+    change = CatalogChange(
+        id=next_version(db), shop_id=shop_id, operation=operation,
+        previous_latitude=previous.get("latitude"), previous_longitude=previous.get("longitude"),
+    )
+    db.add(change)
+    db.flush()
+    return change
+
+
+def mark_bulk_change(db: Session) -> int:
+    """
+    Record writes made without record_change: bumps the version and makes
+    every older version resync in full. Commit it with the writes.
+    """
+    version = next_version(db)
+    db.execute(update(CatalogVersion).where(CatalogVersion.id == 1).values(baseline=version))
+    return version
+
+
+def catalog_state(db: Session) -> CatalogState:
+    """Latest committed version with its baseline and epoch (zeros before migration 9)."""
+    row = (
+        db.query(CatalogVersion.version, CatalogVersion.baseline, CatalogVersion.epoch)
+        .filter(CatalogVersion.id == 1)
+        .first()
+    )
+    return CatalogState(*row) if row is not None else CatalogState(0, 0, 0)
+
+
+def current_version(db: Session) -> int:
+    """Latest committed catalog version (0 if nothing has been logged yet)."""
+    return catalog_state(db).version
+
+
+def changes_since(db: Session, since: int) -> Tuple[List[int], List[int]]:
+    """
+    Collapse the log after `since` to the latest operation per shop.
+    Returns (upserted_ids, deleted_ids).
+    """
+    latest = {}
+    rows = (
+        db.query(CatalogChange.shop_id, CatalogChange.operation)
+        .filter(CatalogChange.id > since)
+        .order_by(CatalogChange.id)
+    )
+    for shop_id, operation in rows:
+        latest[shop_id] = operation
+
+    upserts = [shop_id for shop_id, operation in latest.items() if operation == UPSERT]
+    deletes = [shop_id for shop_id, operation in latest.items() if operation == DELETE]
+    return upserts, deletes
+
+
+def positions_since(db: Session, since: int) -> Set[Tuple[float, float]]:
+    """
+    Every position a shop changed after `since` has held since then: where
+    it was before each change, and where it is now if it still exists.
+    """
+    positions = set(
+        db.query(CatalogChange.previous_latitude, CatalogChange.previous_longitude)
+        .filter(CatalogChange.id > since, CatalogChange.previous_latitude.isnot(None))
+        .distinct()
+    )
+    changed = db.query(CatalogChange.shop_id).filter(CatalogChange.id > since)
+    positions.update(
+        db.query(CoffeeShop.latitude, CoffeeShop.longitude)
+        .filter(CoffeeShop.id.in_(changed.scalar_subquery()), CoffeeShop.latitude.isnot(None))
+    )
+    return {(latitude, longitude) for latitude, longitude in positions if longitude is not None}
@@ -0,0 +1,103 @@
+"""
+Maintenance of the city_stats aggregate table.
+
+Writes call refresh_city_stats for the cities they touched (the shop's old
+and new city) inside the same transaction. Each refresh recomputes one
+city's row from its shops through the (state, city) index, so deletes and
+attribute changes need no special cases. The city_stats row is locked first
+so concurrent writes to the same city serialize instead of overwriting each
+other's counts. A new city's row is created with INSERT ... ON CONFLICT DO
+NOTHING before locking, since SELECT ... FOR UPDATE on a missing row locks
+nothing and two first writes would both try to insert it.
+"""
+from typing import Iterable, Optional, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.city_stat import CityStat
+from app.models.coffee_shop import CoffeeShop
+
+City = Tuple[Optional[str], Optional[str]]
+
+
+def _count_true(column):
+    return func.sum(case((column.is_(True), 1), else_=0))
+
+
+def _aggregates():
+    return (
+        func.count(CoffeeShop.id),
+        _count_true(CoffeeShop.pour_over),
+        _count_true(CoffeeShop.has_wifi),
+        _count_true(CoffeeShop.accessibility),
+        _count_true(CoffeeShop.starred),
+        func.avg(CoffeeShop.latitude),
+        func.avg(CoffeeShop.longitude),
+        func.min(CoffeeShop.latitude),
+        func.min(CoffeeShop.longitude),
+        func.max(CoffeeShop.latitude),
+        func.max(CoffeeShop.longitude),
+    )
+
+
+def _apply(stat: CityStat, row) -> None:
+    (stat.shop_count, stat.pour_over_count, stat.has_wifi_count, stat.accessibility_count,
+     stat.starred_count, stat.center_latitude, stat.center_longitude, stat.min_latitude,
+     stat.min_longitude, stat.max_latitude, stat.max_longitude) = row
+
+
+def _lock_city(db: Session, city: str, state: str) -> CityStat:
+    """The city's row, created empty if missing, locked until the caller commits."""
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    placeholder = insert(CityStat).values(
+        city=city, state=state, shop_count=0, pour_over_count=0, has_wifi_count=0,
+        accessibility_count=0, starred_count=0, center_latitude=0.0, center_longitude=0.0,
+        min_latitude=0.0, min_longitude=0.0, max_latitude=0.0, max_longitude=0.0,
+    ).on_conflict_do_nothing(index_elements=["city", "state"])
+    while True:
+        # Waits for a concurrent insert of the same city to commit or roll back
+        db.execute(placeholder)
+        stat = (
+            db.query(CityStat)
+            .filter(CityStat.city == city, CityStat.state == state)
+            .with_for_update()
+            .populate_existing()
+            .first()
+        )
+        if stat is not None:
+            return stat
+        # A write holding the lock deleted the row (its last shop left); recreate it
+
+
+def refresh_city_stats(db: Session, cities: Iterable[City]) -> None:
+    """Recompute the city_stats rows for `cities`; untagged shops (None) are skipped."""
+    # Sorted so concurrent writes lock shared cities in the same order
+    for city, state in sorted({(city, state) for city, state in cities if city and state}):
+        stat = _lock_city(db, city, state)
+        row = (
+            db.query(*_aggregates())
+            .filter(CoffeeShop.city == city, CoffeeShop.state == state)
+            .one()
+        )
+        if not row[0]:
+            db.delete(stat)
+            continue
+        _apply(stat, row)
+    db.flush()
+
+
+def rebuild_city_stats(db: Session) -> int:
+    """Rebuild the whole table from coffee_shops; returns the number of cities."""
+    db.query(CityStat).delete()
+    rows = (
+        db.query(CoffeeShop.city, CoffeeShop.state, *_aggregates())
+        .filter(CoffeeShop.city.isnot(None), CoffeeShop.state.isnot(None))
+        .group_by(CoffeeShop.city, CoffeeShop.state)
+        .all()
+    )
+    for row in rows:
+        stat = CityStat(city=row[0], state=row[1])
+        _apply(stat, row[2:])
+        db.add(stat)
+    db.flush()
+    return len(rows)
@@ -2,6 +2,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from app.core.profiling import DB_PROFILE, enable_profiling
 
 # Database URL - defaults to SQLite, but can be overridden with environment variable
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./coffee_shops.db")
@@ -14,15 +15,20 @@ if DATABASE_URL.startswith("sqlite"):
     )
 else:
     # For PostgreSQL or other databases - use connection pooling for performance
+    # Pools are per worker process; size them with WEB_CONCURRENCY in mind
     engine = create_engine(
         DATABASE_URL,
-        pool_size=5,              # Maintain 5 connections in the pool
-        max_overflow=10,          # Allow up to 10 additional connections
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),        # Connections kept in the pool
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),  # Additional connections under load
         pool_timeout=30,          # Wait up to 30s for a connection
         pool_recycle=1800,        # Recycle connections after 30 minutes
         pool_pre_ping=True,       # Verify connections are alive before using
     )
 
+# Slow-query and N+1 logging for development and load tests (see app/core/profiling.py)
+if DB_PROFILE:
+    enable_profiling(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
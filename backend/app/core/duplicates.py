@@ -0,0 +1,114 @@
+"""
+Near-duplicate detection for shop writes.
+
+A new or moved shop is compared against existing shops within
+DUPLICATE_RADIUS_METERS. The radius becomes a bounding box on the
+(latitude, longitude) index, so only a handful of rows are read. A nearby
+shop is a likely duplicate when its name is similar (trigram similarity at
+or above DUPLICATE_NAME_SIMILARITY) or its street line is the same.
+
+Similarity follows pg_trgm: names are lowercased and split into words, and
+each word, padded with two leading spaces and one trailing space, gives
+its set of 3-grams. The score is |A & B| / |A | B|. On PostgreSQL with
+pg_trgm installed, the database computes it with similarity(). Otherwise
+the same trigram sets are built in memory for the candidates. Both paths
+give the same scores.
+"""
+import os
+import re
+from typing import Any, Dict, FrozenSet, List, Optional
+from sqlalchemy import func, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.geo import bounding_box, haversine_km
+from app.models.coffee_shop import CoffeeShop
+
+DUPLICATE_RADIUS_METERS = float(os.getenv("DUPLICATE_RADIUS_METERS", "150"))
+DUPLICATE_NAME_SIMILARITY = float(os.getenv("DUPLICATE_NAME_SIMILARITY", "0.45"))
+
+# Word separators: anything but letters and digits, as in pg_trgm
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+_trigram_ready = False
+
+
+def detect_trigram(engine: Engine) -> bool:
+    """Use the database's similarity() when pg_trgm is installed (see migrations)."""
+    global _trigram_ready
+
+    _trigram_ready = False
+    if engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.connect() as conn:
+            _trigram_ready = conn.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first() is not None
+    except Exception as e:
+        print(f"Could not check for pg_trgm: {e}")
+    return _trigram_ready
+
+
+def trigrams(value: str) -> FrozenSet[str]:
+    grams = set()
+    for word in _NON_ALNUM.split(value.lower()):
+        if word:
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def similarity(a: str, b: str) -> float:
+    a_grams, b_grams = trigrams(a), trigrams(b)
+    if not a_grams or not b_grams:
+        return 0.0
+    return len(a_grams & b_grams) / len(a_grams | b_grams)
+
+
+def street_line(address: str) -> str:
+    """First address segment with case and punctuation normalized ("123 main st")."""
+    return " ".join(_NON_ALNUM.split(address.split(",")[0].lower())).strip()
+
+
+def find_duplicates(
+    db: Session,
+    name: str,
+    address: str,
+    latitude: float,
+    longitude: float,
+    exclude_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Existing shops that look like the same place, most similar first."""
+    radius_km = DUPLICATE_RADIUS_METERS / 1000
+    min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, radius_km)
+    columns = [CoffeeShop.id, CoffeeShop.name, CoffeeShop.address, CoffeeShop.latitude, CoffeeShop.longitude]
+    if _trigram_ready:
+        columns.append(func.similarity(func.lower(CoffeeShop.name), name.lower()))
+    query = db.query(*columns).filter(
+        CoffeeShop.latitude.between(min_lat, max_lat),
+        CoffeeShop.longitude.between(min_lng, max_lng),
+    )
+    if exclude_id is not None:
+        query = query.filter(CoffeeShop.id != exclude_id)
+
+    street = street_line(address)
+    candidates = []
+    for row in query.all():
+        distance_km = haversine_km(latitude, longitude, row.latitude, row.longitude)
+        if distance_km > radius_km:
+            continue
+        score = float(row[5]) if _trigram_ready else similarity(name, row.name)
+        same_street = bool(street) and street_line(row.address) == street
+        if score >= DUPLICATE_NAME_SIMILARITY or same_street:
+            candidates.append({
+                "id": row.id,
+                "name": row.name,
+                "address": row.address,
+                "latitude": row.latitude,
+                "longitude": row.longitude,
+                "distance_m": round(distance_km * 1000, 1),
+                "name_similarity": round(score, 3),
+                "same_address": same_street,
+            })
+    candidates.sort(key=lambda candidate: (-candidate["name_similarity"], candidate["distance_m"]))
+    return candidates
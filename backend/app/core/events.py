@@ -0,0 +1,149 @@
+"""
+In-process broadcast of catalog change events for Server-Sent Events.
+
+Handlers publish after committing a write; every open SSE connection in
+this process gets its own bounded queue. With several workers, set
+CATALOG_EVENTS_BACKEND=postgres: events are then sent with NOTIFY and each
+worker LISTENs and fans them out to its own subscribers.
+"""
+import asyncio
+import json
+import os
+import select
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+from sqlalchemy import text
+from app.core.database import engine
+
+CATALOG_EVENTS_BACKEND = os.getenv("CATALOG_EVENTS_BACKEND", "memory")
+NOTIFY_CHANNEL = "catalog_events"
+# NOTIFY payloads must stay under 8000 bytes
+MAX_NOTIFY_PAYLOAD = 7900
+# Events buffered per subscriber before it is considered too slow
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class CatalogBroadcaster:
+    """Fan out catalog events to asyncio queues, one per subscriber."""
+
+    def __init__(self, backend: str = "memory"):
+        self.backend = backend
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    async def start(self) -> None:
+        """Bind to the running event loop; start LISTENing when using Postgres."""
+        self._loop = asyncio.get_running_loop()
+        if self.backend == "postgres" and engine.dialect.name == "postgresql":
+            self._stopping.clear()
+            self._listener = threading.Thread(target=self._listen, name="catalog-events-listener", daemon=True)
+            self._listener.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._listener is not None:
+            await asyncio.to_thread(self._listener.join, 10)
+            self._listener = None
+        self._loop = None
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """
+        Publish a committed change. Safe to call from the event loop or from
+        a threadpool worker (sync endpoints).
+        """
+        if self.backend == "postgres" and engine.dialect.name == "postgresql":
+            payload = json.dumps(event, default=str)
+            if len(payload) > MAX_NOTIFY_PAYLOAD:
+                # Subscribers can fetch the shop itself; keep the notification small
+                payload = json.dumps({key: value for key, value in event.items() if key != "shop"})
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": payload})
+            except Exception as e:
+                print(f"Error publishing catalog event: {e}")
+            return
+        self._deliver(event)
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        Call `callback(event)` on the event loop for every event this process
+        receives, e.g. to invalidate caches. Must be quick and non-blocking.
+        """
+        self._listeners.append(callback)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """
+        Register a queue for the lifetime of the context. A None item means
+        the subscriber fell behind and was dropped; it should resync.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._fan_out, event)
+
+    def _fan_out(self, event: Dict[str, Any]) -> None:
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error in catalog event listener: {e}")
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Drop the backlog and tell the slow client to resync
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                self._subscribers.discard(queue)
+
+    def _listen(self) -> None:
+        """LISTEN loop on a dedicated connection, reconnecting on errors."""
+        while not self._stopping.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                connection.detach()
+                pg_conn = connection.driver_connection
+                pg_conn.autocommit = True
+                with pg_conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                while not self._stopping.is_set():
+                    if select.select([pg_conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    pg_conn.poll()
+                    while pg_conn.notifies:
+                        notification = pg_conn.notifies.pop(0)
+                        try:
+                            self._deliver(json.loads(notification.payload))
+                        except ValueError:
+                            continue
+            except Exception as e:
+                print(f"Catalog event listener error, reconnecting: {e}")
+                self._stopping.wait(5)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+
+catalog_events = CatalogBroadcaster(backend=CATALOG_EVENTS_BACKEND)
@@ -0,0 +1,82 @@
+"""
+Geospatial helpers for coffee shop search.
+
+Distance math runs in Python (portable, works on SQLite) unless PostGIS is
+enabled, in which case the database does the work against a GiST-indexed
+geography column (added by the coffee_shops_postgis_geography migration).
+"""
+import math
+import os
+from typing import Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Opt in with USE_POSTGIS=true (requires PostgreSQL with the postgis extension)
+USE_POSTGIS = os.getenv("USE_POSTGIS", "false").lower() in ("1", "true", "yes")
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+# Half the earth's circumference: no two points are farther apart than this
+MAX_SURFACE_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+_postgis_ready = False
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometers."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Return (min_lat, min_lng, max_lat, max_lng) enclosing a circle of radius_km.
+    Used as an index-friendly prefilter before the exact distance check.
+    """
+    if radius_km >= MAX_SURFACE_DISTANCE_KM:
+        return (-90.0, -180.0, 90.0, 180.0)
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6:
+        lng_delta = 180.0
+    else:
+        lng_delta = min(180.0, radius_km / (KM_PER_DEGREE_LAT * cos_lat))
+    return (
+        max(-90.0, latitude - lat_delta),
+        max(-180.0, longitude - lng_delta),
+        min(90.0, latitude + lat_delta),
+        min(180.0, longitude + lng_delta),
+    )
+
+
+def postgis_enabled() -> bool:
+    """True once detect_postgis has found the geography column."""
+    return _postgis_ready
+
+
+def detect_postgis(engine: Engine) -> bool:
+    """
+    Check whether PostGIS search can be used: USE_POSTGIS is set, the
+    database is PostgreSQL and the coffee_shops_postgis_geography migration
+    has added the GiST-indexed geog column. Otherwise the portable path is used.
+    """
+    global _postgis_ready
+
+    _postgis_ready = False
+    if not USE_POSTGIS or engine.dialect.name != "postgresql":
+        return False
+    try:
+        with engine.connect() as conn:
+            _postgis_ready = conn.execute(text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'coffee_shops' AND column_name = 'geog'"
+            )).first() is not None
+    except Exception as e:
+        print(f"Could not check for PostGIS, using portable geo queries: {e}")
+    if not _postgis_ready:
+        print("USE_POSTGIS is set but coffee_shops.geog is missing; run migrate.py")
+    return _postgis_ready
@@ -0,0 +1,231 @@
+"""
+Persistent background geocoding for shop writes.
+
+With ?defer_geocode=true, a create or address change without coordinates
+is stored as a geocode_jobs row and the API answers 202 right away. Each
+worker process runs a GeocodeWorker that claims due jobs one at a time,
+geocodes the address outside any database session, and then applies the
+write through app/core/shop_writes.py, completing the job in the same
+transaction.
+
+Jobs survive restarts because they live in the database. A claim is a
+conditional UPDATE, so concurrent workers never take the same job. A job
+left in `geocoding` by a crashed worker is reclaimed once its lease
+(GEOCODE_JOB_LEASE_SECONDS) runs out. Lookups that find nothing are retried
+with a growing delay, up to GEOCODE_JOB_MAX_ATTEMPTS.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.database import SessionLocal
+from app.core.duplicates import find_duplicates
+from app.core.geocoding import geocode_address
+from app.core.shop_writes import apply_shop_update, insert_shop, update_duplicates
+from app.models.coffee_shop import CoffeeShop
+from app.models.geocode_job import GeocodeJob
+
+GEOCODE_WORKER = os.getenv("GEOCODE_WORKER", "true").lower() in ("1", "true", "yes")
+GEOCODE_POLL_SECONDS = float(os.getenv("GEOCODE_POLL_SECONDS", "5"))
+GEOCODE_JOB_MAX_ATTEMPTS = int(os.getenv("GEOCODE_JOB_MAX_ATTEMPTS", "3"))
+GEOCODE_JOB_RETRY_SECONDS = float(os.getenv("GEOCODE_JOB_RETRY_SECONDS", "60"))
+GEOCODE_JOB_LEASE_SECONDS = float(os.getenv("GEOCODE_JOB_LEASE_SECONDS", "300"))
+
+PENDING = "pending_geocode"
+RUNNING = "geocoding"
+DONE = "done"
+FAILED = "failed"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_geocode_job(
+    db: Session,
+    operation: str,
+    address: str,
+    payload: Dict[str, Any],
+    shop_id: Optional[int] = None,
+    allow_duplicate: bool = False,
+) -> GeocodeJob:
+    """Store a write to finish once `address` is geocoded; wakes this process's worker."""
+    now = _now()
+    job = GeocodeJob(
+        operation=operation,
+        shop_id=shop_id,
+        address=address,
+        payload=payload,
+        allow_duplicate=allow_duplicate,
+        status=PENDING,
+        attempts=0,
+        run_after=now,
+        created_at=now,
+        updated_at=now,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    geocode_worker.notify()
+    return job
+
+
+def job_to_dict(job: GeocodeJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "operation": job.operation,
+        "status": job.status,
+        "shop_id": job.shop_id,
+        "address": job.address,
+        "attempts": job.attempts,
+        "error": job.error,
+        "candidates": job.candidates,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+    }
+
+
+def _claimable(now: datetime):
+    return or_(
+        and_(GeocodeJob.status == PENDING, GeocodeJob.run_after <= now),
+        and_(GeocodeJob.status == RUNNING, GeocodeJob.updated_at < now - timedelta(seconds=GEOCODE_JOB_LEASE_SECONDS)),
+    )
+
+
+def claim_next_job() -> Optional[Tuple[int, str]]:
+    """Take the oldest due job; returns (job id, address) or None when idle."""
+    db = SessionLocal()
+    try:
+        now = _now()
+        job_ids = [
+            row.id for row in
+            db.query(GeocodeJob.id).filter(_claimable(now)).order_by(GeocodeJob.id).limit(10).all()
+        ]
+        for job_id in job_ids:
+            claimed = (
+                db.query(GeocodeJob)
+                .filter(GeocodeJob.id == job_id, _claimable(now))
+                .update(
+                    {"status": RUNNING, "attempts": GeocodeJob.attempts + 1, "updated_at": now},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+            if claimed:
+                return job_id, db.query(GeocodeJob.address).filter(GeocodeJob.id == job_id).scalar()
+        return None
+    finally:
+        db.close()
+
+
+def _fail(db: Session, job: GeocodeJob, error: str, candidates=None) -> None:
+    job.status = FAILED
+    job.error = error
+    job.candidates = candidates
+    job.updated_at = _now()
+    db.commit()
+
+
+def complete_job(job_id: int, coordinates: Optional[Tuple[float, float]]) -> None:
+    """Apply a claimed job's write with the geocoded coordinates, or schedule a retry."""
+    db = SessionLocal()
+    try:
+        job = db.get(GeocodeJob, job_id)
+        if job is None:
+            return
+        if coordinates is None:
+            if job.attempts >= GEOCODE_JOB_MAX_ATTEMPTS:
+                _fail(db, job, f"Could not geocode address: {job.address}")
+            else:
+                job.status = PENDING
+                job.run_after = _now() + timedelta(seconds=GEOCODE_JOB_RETRY_SECONDS * job.attempts)
+                job.updated_at = _now()
+                db.commit()
+            return
+
+        data = dict(job.payload, latitude=coordinates[0], longitude=coordinates[1])
+
+        def mark_done(shop: CoffeeShop) -> None:
+            job.status = DONE
+            job.shop_id = shop.id
+            job.error = None
+            job.updated_at = _now()
+
+        if job.operation == "create":
+            if not job.allow_duplicate:
+                candidates = find_duplicates(db, data["name"], data["address"], *coordinates)
+                if candidates:
+                    _fail(db, job, "Possible duplicate of an existing shop", candidates)
+                    return
+            insert_shop(db, data, before_commit=mark_done)
+        else:
+            db_shop = db.query(CoffeeShop).filter(CoffeeShop.id == job.shop_id).first()
+            if db_shop is None:
+                _fail(db, job, "Coffee shop no longer exists")
+                return
+            if not job.allow_duplicate:
+                candidates = update_duplicates(db, db_shop, data)
+                if candidates:
+                    _fail(db, job, "Possible duplicate of an existing shop", candidates)
+                    return
+            apply_shop_update(db, db_shop, data, before_commit=mark_done)
+    finally:
+        db.close()
+
+
+class GeocodeWorker:
+    """Per-process loop that drains the geocode_jobs queue."""
+
+    def __init__(self, poll_seconds: float = GEOCODE_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self) -> None:
+        """Check the queue now instead of at the next poll (call from the event loop)."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            # Cleared before looking, so a job enqueued meanwhile still wakes us
+            self._wake.clear()
+            try:
+                claimed = await run_in_threadpool(claim_next_job)
+            except Exception as e:
+                print(f"Error claiming geocode job: {e}")
+                claimed = None
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, address = claimed
+            # No session is held while waiting on the geocoder
+            coordinates = await geocode_address(address)
+            try:
+                await run_in_threadpool(complete_job, job_id, coordinates)
+            except Exception as e:
+                # The lease expires and another attempt picks the job up
+                print(f"Error completing geocode job {job_id}: {e}")
+
+
+geocode_worker = GeocodeWorker()
@@ -1,50 +1,206 @@
 """
-Geocoding utility using OpenStreetMap Nominatim API.
+Address geocoding with pluggable backends.
+
+GEOCODER_BACKEND selects the implementation:
+
+- nominatim (default): the Nominatim search API at GEOCODER_URL, which is
+  the public OpenStreetMap instance unless pointed at a self-hosted server
+  (or the local stand-in, `python -m benchmarks.geocoder_server`).
+- offline: no network. Answers come from recorded responses
+  (GEOCODER_FIXTURES, a JSON object of address -> [lat, lng] or null) and
+  then from a gazetteer (GEOCODER_GAZETTEER, a CSV of
+  city,state,latitude,longitude) matched on the address's city and state.
+
+Set GEOCODER_RECORD to a JSON path to save every Nominatim answer in the
+fixtures format, so a session against the real service can be replayed
+offline later.
 """
+import abc
+import asyncio
+import csv
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
 import httpx
-from urllib.parse import quote
-from typing import Optional, Tuple
+from app.core.address import parse_city_state
+from app.core.metrics import geocode_duration
+
+GEOCODER_BACKEND = os.getenv("GEOCODER_BACKEND", "nominatim")
+GEOCODER_URL = os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org").rstrip("/")
+GEOCODER_TIMEOUT = float(os.getenv("GEOCODER_TIMEOUT", "10"))
+GEOCODER_FIXTURES = os.getenv("GEOCODER_FIXTURES", "")
+GEOCODER_GAZETTEER = os.getenv("GEOCODER_GAZETTEER", "")
+GEOCODER_RECORD = os.getenv("GEOCODER_RECORD", "")
+
+Coordinates = Tuple[float, float]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fixture_key(address: str) -> str:
+    """Recorded responses are keyed case- and whitespace-insensitively."""
+    return _WHITESPACE.sub(" ", address).strip().lower()
+
+
+def load_fixtures(path: str) -> Dict[str, Optional[Coordinates]]:
+    with open(path) as f:
+        return {
+            fixture_key(address): tuple(coordinates) if coordinates else None
+            for address, coordinates in json.load(f).items()
+        }
+
+
+def load_gazetteer(path: str) -> Dict[Tuple[str, str], Coordinates]:
+    with open(path, newline="") as f:
+        return {
+            (row["city"].strip().lower(), row["state"].strip().upper()): (float(row["latitude"]), float(row["longitude"]))
+            for row in csv.DictReader(f)
+        }
+
+
+class Geocoder(abc.ABC):
+    """Backend interface: lookup raises on backend errors and returns None when not found."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def lookup(self, address: str) -> Optional[Coordinates]:
+        ...
+
+    async def status(self) -> Dict[str, Any]:
+        return {"ok": True}
+
+    async def close(self) -> None:
+        pass
+
+
+class NominatimGeocoder(Geocoder):
+    """Nominatim search API; one pooled HTTP client is shared by all lookups."""
+
+    name = "nominatim"
+
+    def __init__(self, base_url: str = GEOCODER_URL, timeout: float = GEOCODER_TIMEOUT, record_path: str = ""):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.record_path = record_path
+        self._recorded: Dict[str, Optional[Coordinates]] = {}
+        if record_path and os.path.exists(record_path):
+            self._recorded = load_fixtures(record_path)
+        self._record_lock = threading.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
 
+    def _http_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                headers={"User-Agent": "CoffeeFilter/1.0"},  # Required by Nominatim ToS
+            )
+        return self._client
+
+    async def lookup(self, address: str) -> Optional[Coordinates]:
+        response = await self._http_client().get(
+            "/search", params={"q": address, "format": "json", "limit": 1}
+        )
+        response.raise_for_status()
+        data = response.json()
+        coordinates = (float(data[0]["lat"]), float(data[0]["lon"])) if data else None
+        if self.record_path:
+            await asyncio.to_thread(self._record, address, coordinates)
+        return coordinates
+
+    def _record(self, address: str, coordinates: Optional[Coordinates]) -> None:
+        with self._record_lock:
+            self._recorded[fixture_key(address)] = coordinates
+            directory = os.path.dirname(os.path.abspath(self.record_path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".geocoder-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._recorded, f, indent=1, sort_keys=True)
+            os.replace(temp_path, self.record_path)
+
+    async def status(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        response = await self._http_client().get("/status", timeout=2.0)
+        return {
+            "ok": response.status_code == 200,
+            "rtt_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class OfflineGeocoder(Geocoder):
+    """Recorded responses first, then the city centroid from the gazetteer."""
+
+    name = "offline"
+
+    def __init__(
+        self,
+        fixtures: Optional[Dict[str, Optional[Coordinates]]] = None,
+        gazetteer: Optional[Dict[Tuple[str, str], Coordinates]] = None,
+    ):
+        self.fixtures = fixtures or {}
+        self.gazetteer = gazetteer or {}
+
+    @classmethod
+    def from_files(cls, fixtures_path: str = "", gazetteer_path: str = "") -> "OfflineGeocoder":
+        return cls(
+            load_fixtures(fixtures_path) if fixtures_path else None,
+            load_gazetteer(gazetteer_path) if gazetteer_path else None,
+        )
+
+    def lookup_sync(self, address: str) -> Optional[Coordinates]:
+        key = fixture_key(address)
+        if key in self.fixtures:
+            return self.fixtures[key]
+        parsed = parse_city_state(address)
+        if parsed is None:
+            return None
+        city, state = parsed
+        return self.gazetteer.get((city.lower(), state))
 
-async def geocode_address(address: str) -> Optional[Tuple[float, float]]:
+    async def lookup(self, address: str) -> Optional[Coordinates]:
+        return self.lookup_sync(address)
+
+    async def status(self) -> Dict[str, Any]:
+        return {"ok": True, "fixtures": len(self.fixtures), "gazetteer": len(self.gazetteer)}
+
+
+def create_geocoder() -> Geocoder:
+    if GEOCODER_BACKEND == "offline":
+        return OfflineGeocoder.from_files(GEOCODER_FIXTURES, GEOCODER_GAZETTEER)
+    return NominatimGeocoder(GEOCODER_URL, GEOCODER_TIMEOUT, GEOCODER_RECORD)
+
+
+geocoder = create_geocoder()
+
+
+async def geocode_address(address: str) -> Optional[Coordinates]:
     """
-    Geocode an address to latitude and longitude coordinates.
-    Uses OpenStreetMap Nominatim API (free, no API key required).
-    
+    Geocode an address to latitude and longitude coordinates with the
+    configured backend.
+
     Args:
         address: The address string to geocode
-        
+
     Returns:
         Tuple of (latitude, longitude) if successful, None otherwise
     """
+    started = time.perf_counter()
+    outcome = "error"
     try:
-        encoded_address = quote(address)
-        url = f"https://nominatim.openstreetmap.org/search?q={encoded_address}&format=json&limit=1"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                url,
-                headers={
-                    "User-Agent": "CoffeeFilter/1.0",  # Required by Nominatim ToS
-                },
-                timeout=10.0
-            )
-            
-            if response.status_code != 200:
-                return None
-                
-            data = response.json()
-            
-            if not data or len(data) == 0:
-                return None
-                
-            result = data[0]
-            latitude = float(result["lat"])
-            longitude = float(result["lon"])
-            
-            return (latitude, longitude)
-            
+        coordinates = await geocoder.lookup(address)
+        outcome = "found" if coordinates else "not_found"
+        return coordinates
     except Exception as e:
         print(f"Error geocoding address: {e}")
         return None
-
+    finally:
+        geocode_duration.observe(time.perf_counter() - started, outcome=outcome)
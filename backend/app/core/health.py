@@ -0,0 +1,157 @@
+"""
+Liveness and readiness checks.
+
+Liveness only says the process is serving requests. Readiness decides
+whether this instance should get traffic: the database must answer, the
+connection pool must have headroom, and every component registered for
+warm-up must have finished. The geocoder is reported but non-critical, since
+writes with explicit coordinates and all reads work without it.
+
+Results are cached for HEALTH_CACHE_SECONDS so frequent probes stay cheap;
+the geocoder backend is probed at most every GEOCODER_CHECK_SECONDS to stay
+within Nominatim's usage policy.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from app.core.database import engine
+from app.core.geocoding import geocoder
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "3"))
+DB_CHECK_TIMEOUT = float(os.getenv("DB_CHECK_TIMEOUT", "2"))
+# Take the instance out of rotation once this share of the pool is checked out
+POOL_SATURATION_LIMIT = float(os.getenv("POOL_SATURATION_LIMIT", "1.0"))
+GEOCODER_CHECK_SECONDS = float(os.getenv("GEOCODER_CHECK_SECONDS", "60"))
+CHECK_GEOCODER = os.getenv("HEALTH_CHECK_GEOCODER", "true").lower() in ("1", "true", "yes")
+
+
+class WarmupTracker:
+    """Components that must finish warming up before the instance is ready."""
+
+    def __init__(self):
+        self._started: Dict[str, float] = {}
+        self._durations: Dict[str, float] = {}
+        self._completed_at: Optional[str] = None
+
+    def expect(self, name: str) -> None:
+        self._started[name] = time.perf_counter()
+        self._durations.pop(name, None)
+
+    def begin(self, name: str) -> None:
+        """Restart the clock for a component registered earlier with expect()."""
+        self._started[name] = time.perf_counter()
+
+    def mark_warm(self, name: str) -> None:
+        started = self._started.get(name, time.perf_counter())
+        self._durations[name] = time.perf_counter() - started
+        if self.is_warm():
+            self._completed_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    def is_warm(self) -> bool:
+        return all(name in self._durations for name in self._started)
+
+    def report(self) -> Dict[str, Any]:
+        done = self.is_warm()
+        return {
+            "done": done,
+            "seconds": round(sum(self._durations.values()), 3) if done else None,
+            "completed_at": self._completed_at if done else None,
+            "components": {
+                name: (
+                    {"warm": True, "seconds": round(self._durations[name], 3)}
+                    if name in self._durations else {"warm": False}
+                )
+                for name in self._started
+            },
+        }
+
+
+warmup = WarmupTracker()
+
+
+def pool_status() -> Dict[str, Any]:
+    """Checked-out connections against the pool's capacity (size + overflow)."""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout") or not hasattr(pool, "size"):
+        return {"saturated": False}
+    capacity = pool.size() + max(0, getattr(pool, "_max_overflow", 0))
+    in_use = pool.checkedout()
+    saturation = in_use / capacity if capacity else 0.0
+    return {
+        "in_use": in_use,
+        "capacity": capacity,
+        "saturation": round(saturation, 2),
+        "saturated": saturation >= POOL_SATURATION_LIMIT,
+    }
+
+
+def _ping_database() -> float:
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    return time.perf_counter() - started
+
+
+async def check_database() -> Dict[str, Any]:
+    try:
+        seconds = await asyncio.wait_for(run_in_threadpool(_ping_database), DB_CHECK_TIMEOUT)
+        return {"ok": True, "rtt_ms": round(seconds * 1000, 2)}
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"no response within {DB_CHECK_TIMEOUT}s"}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+
+
+_geocoder_result: Optional[Dict[str, Any]] = None
+_geocoder_checked_at = 0.0
+
+
+async def check_geocoder() -> Dict[str, Any]:
+    global _geocoder_result, _geocoder_checked_at
+
+    if not CHECK_GEOCODER:
+        return {"ok": None, "skipped": True}
+    if _geocoder_result is not None and time.monotonic() - _geocoder_checked_at < GEOCODER_CHECK_SECONDS:
+        return _geocoder_result
+
+    try:
+        _geocoder_result = {"backend": geocoder.name, **await geocoder.status()}
+    except Exception as e:
+        _geocoder_result = {"backend": geocoder.name, "ok": False, "error": str(e)}
+    _geocoder_checked_at = time.monotonic()
+    return _geocoder_result
+
+
+_readiness: Optional[Dict[str, Any]] = None
+_readiness_checked_at = 0.0
+_readiness_lock: Optional[asyncio.Lock] = None
+
+
+async def readiness() -> Dict[str, Any]:
+    """Run (or reuse) the readiness checks; concurrent probes share one run."""
+    global _readiness, _readiness_checked_at, _readiness_lock
+
+    if _readiness_lock is None:
+        _readiness_lock = asyncio.Lock()
+    async with _readiness_lock:
+        if _readiness is not None and time.monotonic() - _readiness_checked_at < HEALTH_CACHE_SECONDS:
+            return _readiness
+
+        database, geocoder = await asyncio.gather(check_database(), check_geocoder())
+        pool = pool_status()
+        ready = database["ok"] and not pool["saturated"] and warmup.is_warm()
+        _readiness = {
+            "status": "ready" if ready else "not_ready",
+            "ready": ready,
+            "checks": {
+                "database": database,
+                "pool": pool,
+                "warmup": warmup.report(),
+                "geocoder": geocoder,
+            },
+        }
+        _readiness_checked_at = time.monotonic()
+        return _readiness
@@ -0,0 +1,326 @@
+"""
+Resized shop image variants with a size-bounded on-disk LRU cache.
+
+Shop images are often full-size Google photos. The source is fetched once
+(for googleusercontent URLs, already scaled down to the largest width we
+serve) and each requested width is rendered to WebP or JPEG with Pillow.
+Widths snap up to a fixed set of buckets so the number of variants per shop
+stays small. Files are evicted least-recently-used once the cache exceeds
+IMAGE_CACHE_MAX_BYTES; hits refresh a file's mtime, which is the LRU clock.
+
+Every worker shares the directory, so its total size lives there too, in a
+small usage file that writers update under a file lock. A write that takes
+the total over the bound rescans the directory and evicts, so the bound
+holds for all workers together.
+
+Image URLs come from shop records, so fetches only go to public addresses:
+the host of the URL and of every redirect is resolved and rejected if it is
+private, loopback, link-local or otherwise not globally routable. The HTTP
+client resolves and checks each host again when it opens a connection and
+connects to exactly the address it checked, so a host that answers with a
+public address first and a private one later (DNS rebinding) gets nowhere.
+"""
+import asyncio
+import fcntl
+import hashlib
+import io
+import ipaddress
+import os
+import re
+import socket
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+import httpcore
+import httpx
+from PIL import Image, ImageOps
+
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "./image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_MB", "512")) * 1024 * 1024
+IMAGE_MAX_SOURCE_BYTES = int(os.getenv("IMAGE_MAX_SOURCE_MB", "15")) * 1024 * 1024
+IMAGE_MAX_REDIRECTS = 5
+IMAGE_WIDTHS = (160, 320, 480, 640, 960, 1280)
+IMAGE_QUALITY = {"webp": 75, "jpeg": 80}
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+# Google photo URLs end in a sizing suffix such as "=s1360-w1360-h1020"
+_GOOGLE_SIZE_SUFFIX = re.compile(r"=[swh]\d+(-[swh]\d+)*(-[a-z0-9]+)*$")
+
+
+class ImageUnavailable(Exception):
+    """The source image could not be fetched or decoded."""
+
+
+def is_public_address(address: str) -> bool:
+    return ipaddress.ip_address(address.split("%")[0]).is_global
+
+
+async def resolve_public(host: str, port: int) -> List[str]:
+    """Addresses of `host`; raises ImageUnavailable unless all of them are public."""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError) as e:
+        raise ImageUnavailable(f"Could not resolve {host}: {e}")
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not addresses or not all(is_public_address(address) for address in addresses):
+        raise ImageUnavailable(f"Refusing to fetch from {host}: not a public address")
+    return addresses
+
+
+async def check_public_url(url: str) -> None:
+    """Raise ImageUnavailable unless `url` is http(s) and its host resolves only to public addresses."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ImageUnavailable(f"Unsupported image URL: {url}")
+    await resolve_public(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+
+
+class PublicAddressBackend(httpcore.AsyncNetworkBackend):
+    """
+    Resolves each host itself and connects only to an address that passed
+    the public check. TLS still uses the URL's hostname (SNI and certificate)
+    and the Host header is unchanged, since only the socket target is pinned.
+    """
+
+    def __init__(self, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await resolve_public(host, port)
+        except ImageUnavailable as e:
+            raise httpcore.ConnectError(str(e))
+        error = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise httpcore.ConnectError("Refusing to fetch images over a Unix socket")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class PublicAddressTransport(httpx.AsyncHTTPTransport):
+    """httpx transport whose connections go through PublicAddressBackend."""
+
+    def __init__(self, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        super().__init__()
+        # httpx doesn't expose the network backend, so swap in a pool that uses ours
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(), network_backend=PublicAddressBackend(backend)
+        )
+
+
+def width_bucket(width: int) -> int:
+    """Smallest served width that is at least `width` (capped at the largest)."""
+    for bucket in IMAGE_WIDTHS:
+        if width <= bucket:
+            return bucket
+    return IMAGE_WIDTHS[-1]
+
+
+def source_url(url: str) -> str:
+    """Ask Google's image CDN for the largest width we serve instead of the original."""
+    if "googleusercontent.com" in url:
+        max_width = IMAGE_WIDTHS[-1]
+        if _GOOGLE_SIZE_SUFFIX.search(url):
+            return _GOOGLE_SIZE_SUFFIX.sub(f"=w{max_width}", url)
+        return f"{url}=w{max_width}"
+    return url
+
+
+def image_key(url: str) -> str:
+    """Stable key for a source URL; changes when a shop's image changes."""
+    return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+
+def variant_etag(url: str, width: int, image_format: str) -> str:
+    return f"{image_key(url)}-{width_bucket(width)}-{image_format}"
+
+
+class DiskLRUCache:
+    """
+    Files under `directory`, evicted least-recently-used (by mtime) beyond
+    `max_bytes` across every process using the directory.
+    """
+
+    LOCK_NAME = ".lock"
+    USAGE_NAME = ".usage"
+    # Evict down to this fraction of max_bytes, so a full cache doesn't rescan on every write
+    LOW_WATERMARK = 0.9
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _scan(self):
+        """(mtime, name, size) of every cached file, oldest first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            # Skips the lock and usage files and in-flight writes
+            if entry.name.startswith(".") or entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        return entries
+
+    def _read_usage(self) -> Optional[int]:
+        try:
+            with open(self.path(self.USAGE_NAME)) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def get(self, name: str) -> Optional[bytes]:
+        try:
+            with open(self.path(name), "rb") as f:
+                data = f.read()
+            os.utime(self.path(name))
+            return data
+        except FileNotFoundError:
+            return None
+
+    def put(self, name: str, data: bytes) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f"{self.path(name)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+
+        with open(self.path(self.LOCK_NAME), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            os.replace(temp_path, self.path(name))
+            usage = self._read_usage()
+            # Overwrites and outside deletions make the count drift high; the
+            # rescan below corrects it
+            usage = None if usage is None else usage + len(data)
+            if usage is None or usage > self.max_bytes:
+                usage = self._evict()
+            with open(self.path(self.USAGE_NAME), "w") as f:
+                f.write(str(usage))
+
+    def _evict(self) -> int:
+        """Rescan and, if over max_bytes, drop the oldest files; returns the new total. Hold the lock."""
+        entries = self._scan()
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * self.LOW_WATERMARK if total > self.max_bytes else total
+        # The newest file (usually the one just written) is always kept
+        for _, name, size in entries[:-1]:
+            if total <= target:
+                break
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+class ImageResizer:
+    """Fetch, resize and cache image variants; concurrent misses share one fetch."""
+
+    def __init__(self, cache: DiskLRUCache):
+        self.cache = cache
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Redirects are followed by _fetch, which checks every hop; no
+            # proxies from the environment, which would resolve hosts themselves
+            self._client = httpx.AsyncClient(
+                transport=PublicAddressTransport(), trust_env=False,
+                timeout=10.0, follow_redirects=False, headers={"User-Agent": "CoffeeFilter/1.0"},
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _cached(self, name: str, build) -> bytes:
+        """Return cache entry `name`, building it at most once across concurrent callers."""
+        data = await asyncio.to_thread(self.cache.get, name)
+        if data is not None:
+            return data
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            try:
+                data = await asyncio.to_thread(self.cache.get, name)
+                if data is None:
+                    data = await build()
+                    await asyncio.to_thread(self.cache.put, name, data)
+            finally:
+                self._locks.pop(name, None)
+        return data
+
+    async def _fetch(self, url: str) -> bytes:
+        chunks = []
+        received = 0
+        target = source_url(url)
+        try:
+            for _ in range(IMAGE_MAX_REDIRECTS + 1):
+                await check_public_url(target)
+                async with self._http_client().stream("GET", target) as response:
+                    if response.is_redirect:
+                        target = urljoin(target, response.headers["location"])
+                        continue
+                    if response.status_code != 200:
+                        raise ImageUnavailable(f"Fetching {url} returned {response.status_code}")
+                    async for chunk in response.aiter_bytes():
+                        received += len(chunk)
+                        if received > IMAGE_MAX_SOURCE_BYTES:
+                            raise ImageUnavailable(f"Source image is larger than {IMAGE_MAX_SOURCE_BYTES} bytes")
+                        chunks.append(chunk)
+                    return b"".join(chunks)
+        except httpx.HTTPError as e:
+            raise ImageUnavailable(f"Could not fetch {url}: {e}")
+        raise ImageUnavailable(f"Too many redirects fetching {url}")
+
+    async def variant(self, url: str, width: int, image_format: str) -> Tuple[bytes, str]:
+        """Return (encoded image, etag) for `url` at the bucketed width and format."""
+        etag = variant_etag(url, width, image_format)
+        width = width_bucket(width)
+
+        async def render() -> bytes:
+            source = await self._cached(f"{image_key(url)}.src", lambda: self._fetch(url))
+            return await asyncio.to_thread(resize_image, source, width, image_format)
+
+        return await self._cached(f"{etag}.{image_format}", render), etag
+
+
+def resize_image(source: bytes, width: int, image_format: str) -> bytes:
+    """Downscale (never upscale) to `width` and encode as WebP or JPEG."""
+    try:
+        image = Image.open(io.BytesIO(source))
+        image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        raise ImageUnavailable(f"Could not decode source image: {e}")
+
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    if image.mode not in ("RGB", "RGBA") or (image_format == "jpeg" and image.mode == "RGBA"):
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    if image_format == "webp":
+        image.save(output, "WEBP", quality=IMAGE_QUALITY["webp"], method=4)
+    else:
+        image.save(output, "JPEG", quality=IMAGE_QUALITY["jpeg"], optimize=True, progressive=True)
+    return output.getvalue()
+
+
+image_resizer = ImageResizer(DiskLRUCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES))
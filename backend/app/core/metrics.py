@@ -0,0 +1,229 @@
+"""
+In-process request and database metrics, exposed in Prometheus text format.
+
+MetricsMiddleware times every request and labels it by route template
+(e.g. /api/v1/coffee-shops/{shop_id}), so a regression shows up against the
+endpoint that caused it. SQLAlchemy cursor events attribute query count and
+time to the request that issued them via a context variable; this works for
+sync endpoints too because the threadpool runs them in a copy of the context.
+
+Metrics are per process: under gunicorn each worker keeps its own counters.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.type = "counter"
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self.type = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        # labels -> ([count per bucket], sum, count)
+        self._values: Dict[Labels, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    samples.append((f"{self.name}_bucket", key + (("le", _format_value(bound)),), bucket_count))
+                samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), count))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "Requests by route, method and status code"))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route", LATENCY_BUCKETS))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size by route", SIZE_BUCKETS))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served"))
+db_queries_per_request = registry.register(Histogram(
+    "http_request_db_queries", "Database statements issued per request", QUERY_COUNT_BUCKETS))
+db_time_per_request = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in the database per request", LATENCY_BUCKETS))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Duration of individual database statements", LATENCY_BUCKETS))
+geocode_duration = registry.register(Histogram(
+    "geocode_duration_seconds", "Latency of geocoding lookups by outcome", LATENCY_BUCKETS))
+
+
+# =============================================================================
+# Per-request context
+# =============================================================================
+
+@dataclass
+class RequestStats:
+    """Mutable per-request accumulator shared with threadpool copies of the context."""
+    method: str
+    path: str
+    scope: dict = field(repr=False)
+    query_count: int = 0
+    query_seconds: float = 0.0
+    # Statement -> executions, only filled in when DB_PROFILE is on
+    statements: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    @property
+    def route(self) -> str:
+        return route_template(self.scope)
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def route_template(scope) -> str:
+    """Route path template for labels; unmatched paths share one label."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware so streaming responses are timed to their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(method=scope["method"], path=scope["path"], scope=scope)
+        token = current_request.set(stats)
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            current_request.reset(token)
+
+            route = stats.route
+            method = scope["method"]
+            http_requests.inc(route=route, method=method, status=str(status_code))
+            http_request_duration.observe(elapsed, route=route, method=method)
+            http_response_size.observe(response_bytes, route=route, method=method)
+            db_queries_per_request.observe(stats.query_count, route=route, method=method)
+            db_time_per_request.observe(stats.query_seconds, route=route, method=method)
+
+
+# =============================================================================
+# SQLAlchemy instrumentation
+# =============================================================================
+
+def instrument_engine(engine: Engine) -> None:
+    """Record the duration of every statement and attribute it to the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_query_duration.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.query_count += 1
+            stats.query_seconds += elapsed
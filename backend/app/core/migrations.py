@@ -0,0 +1,351 @@
+"""
+Versioned schema migrations.
+
+Each migration runs once and is recorded in the schema_migrations table.
+Run them at deploy time with `python migrate.py`, not on every worker boot.
+On PostgreSQL the runner holds an advisory lock, so concurrent deploys
+don't race, and the helpers below use online-safe patterns:
+
+- DDL runs with a short lock_timeout and is retried, so it never queues
+  behind long transactions while blocking every reader behind it.
+- Indexes are built with CREATE INDEX CONCURRENTLY.
+- Data backfills update bounded batches, one transaction each, instead of
+  one table-wide UPDATE.
+
+Optional migrations (e.g. PostGIS) declare `applies`; they are only pending
+while it returns True. A migration returning False was skipped because a
+precondition wasn't met (e.g. the extension isn't installed). It isn't
+recorded and is retried on the next run.
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from app.core.database import Base
+import app.models  # noqa: F401 - registers every table on Base.metadata
+
+# Arbitrary constant identifying the migration runner's advisory lock
+ADVISORY_LOCK_KEY = 7_240_519
+DDL_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+DDL_RETRIES = 10
+BACKFILL_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Engine], Optional[bool]]
+    applies: Optional[Callable[[Engine], bool]] = None
+
+
+# =============================================================================
+# Online-safe helpers
+# =============================================================================
+
+def _is_postgres(engine: Engine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def run_ddl(engine: Engine, statement: str) -> None:
+    """Run a DDL statement with a short lock_timeout, retrying on lock timeouts."""
+    for attempt in range(1, DDL_RETRIES + 1):
+        try:
+            with engine.begin() as conn:
+                if _is_postgres(engine):
+                    conn.execute(text(f"SET LOCAL lock_timeout = '{DDL_LOCK_TIMEOUT}'"))
+                conn.execute(text(statement))
+            return
+        except Exception as e:
+            if "lock timeout" not in str(e).lower() or attempt == DDL_RETRIES:
+                raise
+            print(f"  Lock timeout, retrying ({attempt}/{DDL_RETRIES})...")
+            time.sleep(min(30, 2 ** attempt))
+
+
+def has_column(engine: Engine, table: str, column: str) -> bool:
+    return column in {col["name"] for col in inspect(engine).get_columns(table)}
+
+
+def add_column_if_missing(engine: Engine, table: str, column: str, definition: str) -> None:
+    """
+    Add a nullable column, or one with a constant default (metadata-only on
+    PostgreSQL 11+, so no table rewrite).
+    """
+    if not has_column(engine, table, column):
+        run_ddl(engine, f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_index(engine: Engine, name: str, table: str, columns: str, using: str = "") -> None:
+    """
+    Create an index without blocking writes. On PostgreSQL this uses
+    CREATE INDEX CONCURRENTLY (outside a transaction) and first drops an
+    INVALID index left behind by an interrupted earlier build.
+    """
+    using_clause = f" USING {using}" if using else ""
+    if not _is_postgres(engine):
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table}{using_clause} ({columns})"))
+        return
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        invalid = conn.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}{using_clause} ({columns})"))
+
+
+def backfill_in_batches(
+    engine: Engine,
+    table: str,
+    set_clause: str,
+    where_clause: str,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+) -> int:
+    """
+    UPDATE rows matching where_clause in batches of batch_size, committing
+    each batch so row locks are short-lived. where_clause must stop matching
+    once a row is updated. Returns the number of rows updated.
+    """
+    total = 0
+    statement = text(
+        f"UPDATE {table} SET {set_clause} WHERE id IN "
+        f"(SELECT id FROM {table} WHERE {where_clause} ORDER BY id LIMIT :batch_size)"
+    )
+    while True:
+        with engine.begin() as conn:
+            updated = conn.execute(statement, {"batch_size": batch_size}).rowcount
+        if not updated:
+            return total
+        total += updated
+        print(f"  Backfilled {total} rows in {table}")
+
+
+# =============================================================================
+# Migrations
+# =============================================================================
+
+def _baseline_schema(engine: Engine):
+    # Creates any missing tables from the models; existing tables are left alone
+    Base.metadata.create_all(bind=engine)
+
+
+def _coffee_shops_starred(engine: Engine):
+    add_column_if_missing(engine, "coffee_shops", "starred", "BOOLEAN DEFAULT FALSE")
+    backfill_in_batches(engine, "coffee_shops", "starred = FALSE", "starred IS NULL")
+
+
+def _coffee_shops_lat_lng_index(engine: Engine):
+    create_index(engine, "ix_coffee_shops_lat_lng", "coffee_shops", "latitude, longitude")
+
+
+def _postgis_requested(engine: Engine) -> bool:
+    from app.core.geo import USE_POSTGIS
+
+    return USE_POSTGIS and _is_postgres(engine)
+
+
+def _coffee_shops_postgis_geography(engine: Engine):
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+    except Exception as e:
+        print(f"  PostGIS unavailable, skipping: {e}")
+        return False
+    if not has_column(engine, "coffee_shops", "geog"):
+        # Stored generated column: rewrites the table once, then stays in sync
+        # with latitude/longitude without triggers
+        run_ddl(
+            engine,
+            "ALTER TABLE coffee_shops ADD COLUMN geog geography(Point, 4326) "
+            "GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED",
+        )
+    create_index(engine, "ix_coffee_shops_geog", "coffee_shops", "geog", using="GIST")
+
+
+def _shared_rate_limits_requested(engine: Engine) -> bool:
+    from app.core.rate_limit import RATE_LIMIT_STORE
+
+    return RATE_LIMIT_STORE == "postgres" and _is_postgres(engine)
+
+
+def _rate_limit_buckets(engine: Engine):
+    # UNLOGGED: buckets are disposable, so skip WAL on this write-heavy table
+    run_ddl(engine, """
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+            key TEXT PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            allowed BOOLEAN NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL
+        )
+    """)
+
+
+def _coffee_shops_city_state(engine: Engine):
+    from app.core.address import parse_city_state
+    from app.core.cities import rebuild_city_stats
+    from sqlalchemy.orm import Session
+
+    add_column_if_missing(engine, "coffee_shops", "city", "VARCHAR")
+    add_column_if_missing(engine, "coffee_shops", "state", "VARCHAR(2)")
+    create_index(engine, "ix_coffee_shops_state_city", "coffee_shops", "state, city")
+
+    # Parsing happens in Python, so walk the table by id in batches instead
+    # of using backfill_in_batches; unparseable addresses stay NULL
+    last_id, total = 0, 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text("SELECT id, address FROM coffee_shops WHERE id > :last_id ORDER BY id LIMIT :batch_size"),
+                {"last_id": last_id, "batch_size": BACKFILL_BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+            updates = [
+                {"id": row.id, "city": parsed[0], "state": parsed[1]}
+                for row in rows if (parsed := parse_city_state(row.address))
+            ]
+            if updates:
+                conn.execute(
+                    text("UPDATE coffee_shops SET city = :city, state = :state WHERE id = :id"), updates
+                )
+        last_id = rows[-1].id
+        total += len(updates)
+        print(f"  Tagged {total} rows in coffee_shops")
+
+    Base.metadata.tables["city_stats"].create(bind=engine, checkfirst=True)
+    with Session(engine) as db:
+        print(f"  Aggregated {rebuild_city_stats(db)} cities")
+        db.commit()
+
+
+def _pg_trgm_extension(engine: Engine):
+    # Optional: without it, duplicate checks compute trigrams in Python
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        print(f"  pg_trgm unavailable, skipping: {e}")
+        return False
+
+
+def _geocode_jobs(engine: Engine):
+    # New table, so its indexes are created along with it
+    Base.metadata.tables["geocode_jobs"].create(bind=engine, checkfirst=True)
+
+
+def _catalog_version(engine: Engine):
+    # Versions now come from this counter (see app/core/changes.py); it
+    # continues from the existing log so clients' versions stay valid
+    Base.metadata.tables["catalog_version"].create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO catalog_version (id, version) "
+            "SELECT 1, COALESCE(MAX(id), 0) FROM catalog_changes "
+            "WHERE NOT EXISTS (SELECT 1 FROM catalog_version)"
+        ))
+
+
+def _catalog_version_epoch(engine: Engine):
+    import secrets
+
+    add_column_if_missing(engine, "catalog_version", "baseline", "INTEGER NOT NULL DEFAULT 0")
+    add_column_if_missing(engine, "catalog_version", "epoch", "BIGINT NOT NULL DEFAULT 0")
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE catalog_version SET epoch = :epoch WHERE epoch = 0"),
+            {"epoch": secrets.randbits(62) + 1},
+        )
+
+
+def _catalog_changes_previous_position(engine: Engine):
+    add_column_if_missing(engine, "catalog_changes", "previous_latitude", "FLOAT")
+    add_column_if_missing(engine, "catalog_changes", "previous_longitude", "FLOAT")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline_schema", _baseline_schema),
+    Migration(2, "coffee_shops_starred", _coffee_shops_starred),
+    Migration(3, "coffee_shops_lat_lng_index", _coffee_shops_lat_lng_index),
+    Migration(4, "coffee_shops_postgis_geography", _coffee_shops_postgis_geography, applies=_postgis_requested),
+    Migration(5, "rate_limit_buckets", _rate_limit_buckets, applies=_shared_rate_limits_requested),
+    Migration(6, "coffee_shops_city_state", _coffee_shops_city_state),
+    Migration(7, "pg_trgm_extension", _pg_trgm_extension, applies=_is_postgres),
+    Migration(8, "geocode_jobs", _geocode_jobs),
+    Migration(9, "catalog_version", _catalog_version),
+    Migration(10, "catalog_version_epoch", _catalog_version_epoch),
+    Migration(11, "catalog_changes_previous_position", _catalog_changes_previous_position),
+]
+
+
+# =============================================================================
+# Runner
+# =============================================================================
+
+def _ensure_version_table(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+
+
+def applied_versions(engine: Engine) -> List[int]:
+    """Versions recorded in schema_migrations (empty if the table doesn't exist)."""
+    if not inspect(engine).has_table("schema_migrations"):
+        return []
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def pending_migrations(engine: Engine) -> List[Migration]:
+    applied = set(applied_versions(engine))
+    return [
+        migration for migration in MIGRATIONS
+        if migration.version not in applied and (migration.applies is None or migration.applies(engine))
+    ]
+
+
+def _lock(conn: Connection) -> None:
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+
+def _unlock(conn: Connection) -> None:
+    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+
+def run_migrations(engine: Engine) -> List[Migration]:
+    """Apply pending migrations in order. Returns the migrations applied."""
+    lock_conn = None
+    if _is_postgres(engine):
+        lock_conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        _lock(lock_conn)
+
+    applied = []
+    try:
+        _ensure_version_table(engine)
+        for migration in pending_migrations(engine):
+            print(f"Applying migration {migration.version}: {migration.name}")
+            started = time.monotonic()
+            if migration.upgrade(engine) is False:
+                print(f"  Skipped {migration.name} (will retry on the next run)")
+                continue
+            with engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                    {"version": migration.version, "name": migration.name},
+                )
+            applied.append(migration)
+            print(f"  Done in {time.monotonic() - started:.2f}s")
+    finally:
+        if lock_conn is not None:
+            _unlock(lock_conn)
+            lock_conn.close()
+    return applied
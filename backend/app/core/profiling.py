@@ -0,0 +1,87 @@
+"""
+Opt-in query profiling for catching slow statements and N+1 patterns.
+
+Enable with DB_PROFILE=true. Every statement slower than DB_SLOW_QUERY_MS is
+logged with the route that issued it; with DB_EXPLAIN_SLOW=true (Postgres
+only) its EXPLAIN plan is logged as well, which is usually enough to spot a
+sequential scan that wants an index. Requests issuing more than
+DB_QUERY_COUNT_LIMIT statements are flagged together with their most
+repeated statement, the usual signature of an N+1 loop.
+"""
+import logging
+import os
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.metrics import current_request
+
+DB_PROFILE = os.getenv("DB_PROFILE", "false").lower() in ("1", "true", "yes")
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+DB_QUERY_COUNT_LIMIT = int(os.getenv("DB_QUERY_COUNT_LIMIT", "20"))
+DB_EXPLAIN_SLOW = os.getenv("DB_EXPLAIN_SLOW", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+
+def _one_line(statement: str, limit: int = 500) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    """EXPLAIN a statement on a raw DBAPI cursor so it isn't profiled itself."""
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN {statement}", parameters)
+        return "\n".join(row[0] for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def enable_profiling(engine: Engine) -> None:
+    """Attach slow-query logging and per-request statement tallies to the engine."""
+    explain = DB_EXPLAIN_SLOW and engine.dialect.name == "postgresql"
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["profile_started"].pop()) * 1000
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+        if elapsed_ms < DB_SLOW_QUERY_MS:
+            return
+
+        route = f"{stats.method} {stats.route}" if stats is not None else "(no request)"
+        logger.warning("Slow query (%.1f ms) on %s: %s", elapsed_ms, route, _one_line(statement))
+        if explain and not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            try:
+                logger.warning("Plan:\n%s", _explain(conn, statement, parameters))
+            except Exception as e:
+                logger.warning("Could not EXPLAIN slow query: %s", e)
+
+
+class QueryCountMiddleware:
+    """Flag requests that issue more than DB_QUERY_COUNT_LIMIT statements."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            stats = current_request.get()
+            if stats is not None and stats.query_count > DB_QUERY_COUNT_LIMIT:
+                statement, repeats = max(stats.statements.items(), key=lambda item: item[1], default=("", 0))
+                logger.warning(
+                    "%s %s issued %d queries (limit %d); most repeated (%dx): %s",
+                    stats.method, stats.route, stats.query_count, DB_QUERY_COUNT_LIMIT,
+                    repeats, _one_line(statement),
+                )
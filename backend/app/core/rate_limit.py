@@ -0,0 +1,242 @@
+"""
+Token-bucket rate limiting for anonymous read endpoints.
+
+Each (route, client) pair gets a bucket holding up to `limit` tokens that
+refills at limit/window tokens per second; a request spends one token.
+Clients are keyed by user when they send a valid bearer token (checked like
+the admin routes check it, so made-up tokens can't mint fresh buckets) and
+otherwise by IP. Behind a proxy, uvicorn's forwarded_allow_ips must list only
+that proxy for the IP to be the real client's (see gunicorn.conf.py).
+Responses carry RateLimit-Policy/-Limit/-Remaining/-Reset headers and a 429
+with Retry-After once the bucket is empty.
+
+The default store keeps buckets in process memory: a dict lookup and a bit
+of float math per request, with no lock since it only runs on the event
+loop. Limits are then per worker; set RATE_LIMIT_STORE=postgres to share
+buckets across workers (one UPSERT per limited request).
+"""
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Tuple
+import orjson
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import compile_path
+from app.core.auth import decode_access_token
+from app.core.database import engine
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+# Multiply every budget, e.g. 0.5 to tighten or 10 for load tests
+RATE_LIMIT_SCALE = float(os.getenv("RATE_LIMIT_SCALE", "1"))
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """`limit` requests per `window` seconds, allowing bursts of up to `limit`."""
+    limit: int
+    window: int
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window
+
+
+# Budgets for unauthenticated GET routes, keyed by route template
+ROUTE_LIMITS: Dict[str, RateLimit] = {
+    "/api/v1/coffee-shops": RateLimit(30, 60),
+    "/api/v1/coffee-shops/export": RateLimit(5, 3600),
+    "/api/v1/coffee-shops/changes": RateLimit(120, 60),
+    "/api/v1/coffee-shops/batch": RateLimit(120, 60),
+    "/api/v1/coffee-shops/search/by-location": RateLimit(120, 60),
+    "/api/v1/coffee-shops/search/nearest": RateLimit(120, 60),
+    "/api/v1/coffee-shops/search/by-bbox": RateLimit(240, 60),
+    "/api/v1/tiles/{z}/{x}/{y}.mvt": RateLimit(1200, 60),
+    "/api/v1/images/{shop_id}": RateLimit(600, 60),
+    "/api/v1/cities": RateLimit(120, 60),
+    "/api/v1/geocode-jobs/{job_id}": RateLimit(120, 60),
+}
+
+# POST routes that only read (long id lists) share their GET budget
+READ_ONLY_POSTS = {"/api/v1/coffee-shops/batch"}
+
+
+# =============================================================================
+# Stores
+# =============================================================================
+
+class MemoryStore:
+    """Buckets in a dict: key -> (tokens, last refill time)."""
+
+    # Drop idle, full buckets every this many calls so the dict stays bounded
+    PRUNE_EVERY = 10000
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._calls = 0
+
+    async def consume(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        """Spend one token; return (allowed, tokens left)."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (limit.limit, now))
+        tokens = min(limit.limit, tokens + (now - updated) * limit.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY == 0:
+            self._prune(now)
+        return allowed, tokens
+
+    def _prune(self, now: float) -> None:
+        # A bucket idle for longer than the longest window is full again
+        longest = max(limit.window for limit in ROUTE_LIMITS.values())
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < longest
+        }
+
+
+class PostgresStore:
+    """Buckets in an UNLOGGED table, refilled and spent in a single UPSERT."""
+
+    PRUNE_EVERY = 10000
+
+    _REFILL = (
+        "LEAST(:burst, rate_limit_buckets.tokens + "
+        "EXTRACT(EPOCH FROM clock_timestamp() - rate_limit_buckets.updated_at) * :rate)"
+    )
+    _CONSUME = text(f"""
+        INSERT INTO rate_limit_buckets (key, tokens, allowed, updated_at)
+        VALUES (:key, :burst - 1, TRUE, clock_timestamp())
+        ON CONFLICT (key) DO UPDATE SET
+            allowed = {_REFILL} >= 1,
+            tokens = CASE WHEN {_REFILL} >= 1 THEN {_REFILL} - 1 ELSE {_REFILL} END,
+            updated_at = clock_timestamp()
+        RETURNING allowed, tokens
+    """)
+
+    def __init__(self):
+        self._calls = 0
+
+    def _consume(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        with engine.begin() as conn:
+            allowed, tokens = conn.execute(
+                self._CONSUME, {"key": key, "burst": limit.limit, "rate": limit.rate}
+            ).one()
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                conn.execute(text(
+                    "DELETE FROM rate_limit_buckets WHERE updated_at < clock_timestamp() - interval '1 day'"
+                ))
+        return allowed, tokens
+
+    async def consume(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        return await run_in_threadpool(self._consume, key, limit)
+
+
+def create_store():
+    if RATE_LIMIT_STORE == "postgres":
+        return PostgresStore()
+    return MemoryStore()
+
+
+# =============================================================================
+# Middleware
+# =============================================================================
+
+def client_key(scope) -> str:
+    """The signed-in user for a valid bearer token, otherwise the client IP."""
+    for name, value in scope["headers"]:
+        if name == b"authorization" and value[:7].lower() == b"bearer ":
+            username = decode_access_token(value[7:].decode("latin-1"))
+            if username is not None:
+                return "u:" + username
+            break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+def _headers(limit: RateLimit, tokens: float) -> List[Tuple[bytes, bytes]]:
+    remaining = max(0, math.floor(tokens))
+    # Seconds until the next token (when empty) or until the bucket is full again
+    reset = (1 - tokens) / limit.rate if tokens < 1 else (limit.limit - tokens) / limit.rate
+    return [
+        (b"ratelimit-policy", f"{limit.limit};w={limit.window}".encode()),
+        (b"ratelimit-limit", str(limit.limit).encode()),
+        (b"ratelimit-remaining", str(remaining).encode()),
+        (b"ratelimit-reset", str(math.ceil(reset)).encode()),
+    ]
+
+
+class RateLimitMiddleware:
+    """
+    Apply ROUTE_LIMITS to GET/HEAD requests (and POST to read-only routes in
+    READ_ONLY_POSTS); other requests pass straight through.
+    """
+
+    def __init__(self, app, limits: Optional[Dict[str, RateLimit]] = None, store=None):
+        self.app = app
+        limits = limits if limits is not None else ROUTE_LIMITS
+        limits = {
+            path: RateLimit(max(1, round(limit.limit * RATE_LIMIT_SCALE)), limit.window)
+            for path, limit in limits.items()
+        }
+        self.store = store or create_store()
+        # Static paths resolve with a dict lookup; templated ones need a regex
+        self._static: Dict[str, Tuple[str, RateLimit]] = {}
+        self._templated: List[Tuple[Pattern, str, RateLimit]] = []
+        for path, limit in limits.items():
+            if "{" in path:
+                regex, _, _ = compile_path(path)
+                self._templated.append((regex, path, limit))
+            else:
+                self._static[path] = (path, limit)
+
+    def _match(self, path: str) -> Optional[Tuple[str, RateLimit]]:
+        matched = self._static.get(path)
+        if matched is None:
+            for regex, template, limit in self._templated:
+                if regex.match(path):
+                    return template, limit
+        return matched
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            scope["method"] in ("GET", "HEAD") or (scope["method"] == "POST" and scope["path"] in READ_ONLY_POSTS)
+        ):
+            await self.app(scope, receive, send)
+            return
+        matched = self._match(scope["path"])
+        if matched is None:
+            await self.app(scope, receive, send)
+            return
+
+        template, limit = matched
+        allowed, tokens = await self.store.consume(f"{template}|{client_key(scope)}", limit)
+        headers = _headers(limit, tokens)
+
+        if not allowed:
+            retry_after = str(math.ceil((1 - tokens) / limit.rate)).encode()
+            body = orjson.dumps({"detail": "Rate limit exceeded, retry later"})
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", retry_after),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
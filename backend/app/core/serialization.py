@@ -0,0 +1,56 @@
+"""
+Fast JSON encoding for coffee shop list responses.
+
+List endpoints select plain column tuples and encode them straight to bytes
+with orjson, skipping per-object Pydantic validation. The Pydantic schemas
+still document the response shape in OpenAPI.
+"""
+from typing import Any, Dict, Iterable, Literal, Sequence
+import orjson
+from fastapi import Response
+from app.models.coffee_shop import CoffeeShop
+
+# Column order matches app.schemas.coffee_shop.CoffeeShop
+SHOP_FIELDS = (
+    "id", "name", "address", "latitude", "longitude", "image",
+    "accessibility", "has_wifi", "description", "machine", "weekly_hours",
+    "pour_over", "website", "instagram", "starred", "city", "state",
+)
+
+# Column order matches app.schemas.coffee_shop.CoffeeShopSummary
+SUMMARY_FIELDS = (
+    "id", "name", "address", "latitude", "longitude", "image",
+    "accessibility", "has_wifi", "weekly_hours", "pour_over", "starred",
+)
+
+ShopView = Literal["full", "summary"]
+
+
+def fields_for_view(view: ShopView) -> Sequence[str]:
+    """Field names included in a list response for the requested view."""
+    return SUMMARY_FIELDS if view == "summary" else SHOP_FIELDS
+
+
+def shop_columns(fields: Sequence[str]) -> list:
+    """Model columns to select so rows come back as plain tuples."""
+    return [getattr(CoffeeShop, field) for field in fields]
+
+
+def shop_to_dict(shop: CoffeeShop, fields: Sequence[str] = SHOP_FIELDS) -> Dict[str, Any]:
+    """Convert a CoffeeShop ORM object to a plain dict."""
+    return {field: getattr(shop, field) for field in fields}
+
+
+def rows_to_dicts(rows: Iterable[Sequence[Any]], fields: Sequence[str]) -> list:
+    """Convert column tuples selected with shop_columns(fields) to dicts."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def encode_json(content: Any) -> bytes:
+    """Encode plain Python data to JSON bytes."""
+    return orjson.dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    """Return already-plain data as JSON without response_model validation."""
+    return Response(content=encode_json(content), status_code=status_code, media_type="application/json")
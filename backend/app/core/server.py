@@ -0,0 +1,36 @@
+"""
+Production server pieces used by gunicorn.conf.py.
+"""
+import os
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+# Set in the gunicorn master once startup tasks have run, so workers skip them
+BOOTSTRAPPED_ENV = "COFFEE_FILTER_BOOTSTRAPPED"
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """Uvicorn worker pinned to uvloop and httptools (both from uvicorn[standard])."""
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+def bootstrap_once() -> None:
+    """
+    Run one-time startup tasks in the gunicorn master before workers fork.
+    Workers inherit BOOTSTRAPPED_ENV and skip them in the app lifespan.
+    """
+    from app.core.database import engine
+    from app.core.snapshot import CATALOG_SNAPSHOT_PATH, build_snapshot
+    from app.main import create_default_admin, prepare_database
+
+    prepare_database()
+    create_default_admin()
+    if CATALOG_SNAPSHOT_PATH:
+        # Workers only map it; the master builds it once so they don't race
+        build_snapshot(CATALOG_SNAPSHOT_PATH)
+    # Don't hand pooled connections opened here to forked workers
+    engine.dispose()
+    os.environ[BOOTSTRAPPED_ENV] = "1"
+
+
+def is_bootstrapped() -> bool:
+    return os.getenv(BOOTSTRAPPED_ENV) == "1"
@@ -0,0 +1,103 @@
+"""
+Coffee shop writes shared by the API endpoints and the geocoding worker.
+
+Every write commits the shop together with its catalog change and the city
+stats refresh, then publishes the catalog event. Routing all writers through
+here keeps the change log, aggregates and caches in step no matter who
+made the change. `before_commit` lets a caller add its own bookkeeping
+(e.g. completing a geocode job) to the same transaction.
+"""
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.core.changes import DELETE, UPSERT, record_change
+from app.core.cities import refresh_city_stats
+from app.core.duplicates import find_duplicates
+from app.core.events import catalog_events
+from app.core.serialization import shop_to_dict
+from app.models.coffee_shop import CoffeeShop
+
+BeforeCommit = Optional[Callable[[CoffeeShop], None]]
+
+# Fields that identify a place, so changing one re-runs the duplicate check
+IDENTITY_FIELDS = ("name", "address", "latitude", "longitude")
+
+
+def publish_change(
+    event_type: str,
+    shop_id: int,
+    version: int,
+    shop: Optional[CoffeeShop] = None,
+    previous: Optional[dict] = None,
+):
+    """
+    Broadcast a committed write to /coffee-shops/events subscribers and
+    in-process listeners. `previous` holds the old latitude/longitude for
+    updates and deletes, so position-keyed caches can evict the old spot.
+    """
+    event = {"type": event_type, "shop_id": shop_id, "version": version}
+    if shop is not None:
+        event["shop"] = shop_to_dict(shop)
+    if previous is not None:
+        event["previous"] = previous
+    catalog_events.publish(event)
+
+
+def shop_position(shop: CoffeeShop) -> dict:
+    return {"latitude": shop.latitude, "longitude": shop.longitude}
+
+
+def update_duplicates(db: Session, db_shop: CoffeeShop, update_data: Dict[str, Any]) -> List[dict]:
+    """Duplicate candidates for an update, or [] if it doesn't rename or move the shop."""
+    if not any(
+        field in update_data and update_data[field] != getattr(db_shop, field) for field in IDENTITY_FIELDS
+    ):
+        return []
+    name, address, latitude, longitude = (
+        update_data[field] if update_data.get(field) is not None else getattr(db_shop, field)
+        for field in IDENTITY_FIELDS
+    )
+    return find_duplicates(db, name, address, latitude, longitude, exclude_id=db_shop.id)
+
+
+def insert_shop(db: Session, data: Dict[str, Any], before_commit: BeforeCommit = None) -> CoffeeShop:
+    db_shop = CoffeeShop(**data)
+    db.add(db_shop)
+    db.flush()
+    change = record_change(db, db_shop.id, UPSERT)
+    refresh_city_stats(db, [(db_shop.city, db_shop.state)])
+    if before_commit is not None:
+        before_commit(db_shop)
+    db.commit()
+    db.refresh(db_shop)
+    publish_change("created", db_shop.id, change.id, db_shop)
+    return db_shop
+
+
+def apply_shop_update(
+    db: Session, db_shop: CoffeeShop, update_data: Dict[str, Any], before_commit: BeforeCommit = None
+) -> CoffeeShop:
+    previous = shop_position(db_shop)
+    previous_city = (db_shop.city, db_shop.state)
+    for field, value in update_data.items():
+        setattr(db_shop, field, value)
+
+    change = record_change(db, db_shop.id, UPSERT, previous)
+    # Counts change with the flags too, so refresh even if the city didn't
+    refresh_city_stats(db, [previous_city, (db_shop.city, db_shop.state)])
+    if before_commit is not None:
+        before_commit(db_shop)
+    db.commit()
+    db.refresh(db_shop)
+    publish_change("updated", db_shop.id, change.id, db_shop, previous)
+    return db_shop
+
+
+def remove_shop(db: Session, db_shop: CoffeeShop) -> None:
+    shop_id = db_shop.id
+    previous = shop_position(db_shop)
+    previous_city = (db_shop.city, db_shop.state)
+    db.delete(db_shop)
+    change = record_change(db, shop_id, DELETE, previous)
+    refresh_city_stats(db, [previous_city])
+    db.commit()
+    publish_change("deleted", shop_id, change.id, previous=previous)
@@ -0,0 +1,314 @@
+"""
+Memory-mapped binary catalog snapshot shared by all worker processes.
+
+The catalog is compiled into one file that every worker maps read-only, so
+the pages live once in the OS page cache no matter how many workers run.
+Layout (little-endian):
+
+    header      magic, catalog epoch and version, shop count, string table offsets
+    ids         int32[count]    sorted ascending (binary search for detail)
+    latitudes   float64[count]
+    longitudes  float64[count]
+    offsets     uint64[count] + uint32[count] per view, into the string table
+    lat order   uint32[count] record indices and float64[count] latitudes,
+                sorted by latitude (bisect for geo queries)
+    strings     "[" shop_1 "," shop_2 ... "]" per view, pre-encoded JSON
+
+Because each view's shop objects are laid out as a JSON array, the list
+response is a single slice of the map and a detail response is another.
+
+Rebuilds write a temporary file and os.replace() it; workers notice the new
+inode on their next request and remap. Every read compares the snapshot's
+(epoch, version) with the catalog_version row, so writes from any process or
+script are seen: a stale snapshot is bypassed (callers fall back to the
+database) and a rebuild is scheduled until the new file lands.
+"""
+import bisect
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.changes import catalog_state
+from app.core.database import SessionLocal
+from app.core.geo import MAX_SURFACE_DISTANCE_KM, bounding_box, haversine_km
+from app.core.serialization import SHOP_FIELDS, SUMMARY_FIELDS, ShopView, encode_json, rows_to_dicts, shop_columns
+from app.models.coffee_shop import CoffeeShop
+
+# Opt in by pointing this at a writable path shared by the workers
+CATALOG_SNAPSHOT_PATH = os.getenv("CATALOG_SNAPSHOT_PATH", "")
+# Wait this long after a write before rebuilding, to batch bursts of edits
+SNAPSHOT_REBUILD_DELAY = float(os.getenv("CATALOG_SNAPSHOT_REBUILD_DELAY", "0.5"))
+
+MAGIC = b"CFSNAP04"
+# magic, epoch, version, count, full offset/length, summary offset/length
+HEADER = struct.Struct("<8sqqQQQQQ")
+VIEWS = ("full", "summary")
+
+logger = logging.getLogger(__name__)
+
+
+def _layout(count: int) -> Dict[str, int]:
+    """Byte offset of each array; 8-byte arrays come first so they stay aligned."""
+    offsets = {}
+    position = HEADER.size
+    for name, item_size in (
+        ("latitudes", 8), ("longitudes", 8), ("sorted_latitudes", 8),
+        ("full_start", 8), ("summary_start", 8),
+        ("ids", 4), ("lat_order", 4), ("full_length", 4), ("summary_length", 4),
+    ):
+        offsets[name] = position
+        position += item_size * count
+    offsets["strings"] = position
+    return offsets
+
+
+def _encode_view(shops: List[Dict[str, Any]], fields, base: int) -> Tuple[bytes, List[int], List[int]]:
+    """Encode shops as one JSON array; return it with each object's offset and length."""
+    parts = [b"["]
+    starts, lengths = [], []
+    position = base + 1
+    for i, shop in enumerate(shops):
+        if i:
+            parts.append(b",")
+            position += 1
+        body = encode_json({field: shop[field] for field in fields})
+        starts.append(position)
+        lengths.append(len(body))
+        parts.append(body)
+        position += len(body)
+    parts.append(b"]")
+    return b"".join(parts), starts, lengths
+
+
+def build_snapshot(path: str, force: bool = False) -> int:
+    """
+    Compile the catalog into `path` unless it is already at the current
+    version. Concurrent builders serialize on a lock file. Returns the version.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        db = SessionLocal()
+        try:
+            # Read the version first; see get_coffee_shop_changes
+            state = catalog_state(db)
+            version = state.version
+            if not force and snapshot_version(path) == (state.epoch, version):
+                return version
+            shops = rows_to_dicts(db.query(*shop_columns(SHOP_FIELDS)).order_by(CoffeeShop.id).all(), SHOP_FIELDS)
+        finally:
+            db.close()
+
+        count = len(shops)
+        layout = _layout(count)
+        full, full_start, full_length = _encode_view(shops, SHOP_FIELDS, layout["strings"])
+        summary, summary_start, summary_length = _encode_view(
+            shops, SUMMARY_FIELDS, layout["strings"] + len(full)
+        )
+        latitudes = [shop["latitude"] for shop in shops]
+        lat_order = sorted(range(count), key=latitudes.__getitem__)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(
+                    MAGIC, state.epoch, version, count,
+                    layout["strings"], len(full), layout["strings"] + len(full), len(summary),
+                ))
+                f.write(struct.pack(f"<{count}d", *latitudes))
+                f.write(struct.pack(f"<{count}d", *(shop["longitude"] for shop in shops)))
+                f.write(struct.pack(f"<{count}d", *(latitudes[i] for i in lat_order)))
+                f.write(struct.pack(f"<{count}Q", *full_start))
+                f.write(struct.pack(f"<{count}Q", *summary_start))
+                f.write(struct.pack(f"<{count}i", *(shop["id"] for shop in shops)))
+                f.write(struct.pack(f"<{count}I", *lat_order))
+                f.write(struct.pack(f"<{count}I", *full_length))
+                f.write(struct.pack(f"<{count}I", *summary_length))
+                f.write(full)
+                f.write(summary)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return version
+
+
+def snapshot_version(path: str) -> Optional[Tuple[int, int]]:
+    """Catalog (epoch, version) stored in the snapshot at `path`, or None if unreadable."""
+    try:
+        with open(path, "rb") as f:
+            magic, epoch, version, *_ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return (epoch, version) if magic == MAGIC else None
+
+
+class CatalogSnapshot:
+    """Read-only view over a mapped snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(self._map)
+        magic, self.epoch, self.version, self.count, full_offset, full_length, summary_offset, summary_length = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+
+        layout = _layout(self.count)
+
+        def array(name: str, fmt: str, size: int) -> memoryview:
+            start = layout[name]
+            return data[start:start + size * self.count].cast(fmt)
+
+        self.latitudes = array("latitudes", "d", 8)
+        self.longitudes = array("longitudes", "d", 8)
+        self.sorted_latitudes = array("sorted_latitudes", "d", 8)
+        self.ids = array("ids", "i", 4)
+        self.lat_order = array("lat_order", "I", 4)
+        self._starts = {"full": array("full_start", "Q", 8), "summary": array("summary_start", "Q", 8)}
+        self._lengths = {"full": array("full_length", "I", 4), "summary": array("summary_length", "I", 4)}
+        self._lists = {
+            "full": data[full_offset:full_offset + full_length],
+            "summary": data[summary_offset:summary_offset + summary_length],
+        }
+        self._data = data
+
+    def list_body(self, view: ShopView) -> memoryview:
+        """The whole catalog as a JSON array, straight from the map."""
+        return self._lists[view]
+
+    def _index_of(self, shop_id: int) -> Optional[int]:
+        index = bisect.bisect_left(self.ids, shop_id)
+        if index < self.count and self.ids[index] == shop_id:
+            return index
+        return None
+
+    def _object(self, index: int, view: ShopView) -> memoryview:
+        start = self._starts[view][index]
+        return self._data[start:start + self._lengths[view][index]]
+
+    def shop_body(self, shop_id: int, view: ShopView = "full") -> Optional[memoryview]:
+        """One shop's JSON object, or None if it isn't in the catalog."""
+        index = self._index_of(shop_id)
+        return self._object(index, view) if index is not None else None
+
+    def bodies(self, indices: Iterable[int], view: ShopView) -> bytes:
+        """JSON array of the given records, in order."""
+        return b"[" + b",".join(self._object(index, view) for index in indices) + b"]"
+
+    def in_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[int]:
+        """Record indices inside a bounding box, ordered by id."""
+        low = bisect.bisect_left(self.sorted_latitudes, min_lat)
+        high = bisect.bisect_right(self.sorted_latitudes, max_lat)
+        longitudes = self.longitudes
+        return sorted(
+            index for index in self.lat_order[low:high]
+            if min_lng <= longitudes[index] <= max_lng
+        )
+
+    def ranked(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[float, int]]:
+        """(distance, index) pairs within radius_km, nearest first."""
+        matches = []
+        for index in self.in_bbox(*bounding_box(latitude, longitude, radius_km)):
+            distance = haversine_km(latitude, longitude, self.latitudes[index], self.longitudes[index])
+            if distance <= radius_km:
+                matches.append((distance, index))
+        matches.sort()
+        return matches
+
+    def nearest(self, latitude: float, longitude: float, limit: int) -> List[int]:
+        """Indices of the `limit` closest shops, widening the search like the SQL path."""
+        radius = 5.0
+        while True:
+            ranked = self.ranked(latitude, longitude, radius)
+            if len(ranked) >= limit or radius >= MAX_SURFACE_DISTANCE_KM:
+                return [index for _, index in ranked[:limit]]
+            radius = min(radius * 4, MAX_SURFACE_DISTANCE_KM)
+
+
+class SnapshotManager:
+    """Per-process handle on the shared snapshot: remaps on swap, rebuilds after writes."""
+
+    def __init__(self, path: str, delay: float = SNAPSHOT_REBUILD_DELAY):
+        self.path = path
+        self.delay = delay
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def current(self, db: Session) -> Optional[CatalogSnapshot]:
+        """
+        The mapped snapshot if it matches the catalog version, else None (use
+        the database) with a rebuild scheduled.
+        """
+        if not self.path:
+            return None
+        state = catalog_state(db)
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return None
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.inode != inode:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot.inode != inode:
+                    try:
+                        snapshot = self._snapshot = CatalogSnapshot(self.path)
+                    except (OSError, ValueError) as e:
+                        logger.warning("Could not map catalog snapshot: %s", e)
+                        return None
+        if (snapshot.epoch, snapshot.version) != (state.epoch, state.version):
+            self._schedule_rebuild(restart=False)
+            return None
+        return snapshot
+
+    def build(self) -> None:
+        """Build (if stale) and map the snapshot; used at startup."""
+        build_snapshot(self.path)
+        db = SessionLocal()
+        try:
+            self.current(db)
+        finally:
+            db.close()
+
+    def on_event(self, event: Dict[str, Any]) -> None:
+        """Catalog event listener: rebuild once a burst of writes settles."""
+        self._schedule_rebuild(restart=True)
+
+    def _schedule_rebuild(self, restart: bool) -> None:
+        """Start the rebuild timer; `restart` pushes back one already pending."""
+        with self._lock:
+            if self._timer is not None:
+                if not restart:
+                    return
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._rebuild)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _rebuild(self) -> None:
+        with self._lock:
+            if self._timer is threading.current_thread():
+                self._timer = None
+        try:
+            build_snapshot(self.path)
+        except Exception as e:
+            logger.exception("Error rebuilding catalog snapshot: %s", e)
+
+
+catalog_snapshot = SnapshotManager(CATALOG_SNAPSHOT_PATH)
@@ -0,0 +1,171 @@
+"""
+Precomputed static catalog for CDN hosting.
+
+Writes the catalog as versioned, pre-compressed JSON files so anonymous
+reads can be served from static hosting:
+
+    <output>/manifest.json                 points at the current version
+    <output>/<version>/shops.json          full list (+ shops.json.gz)
+    <output>/<version>/summary.json        CoffeeShopSummary list
+    <output>/<version>/cells/<lat>_<lng>.json  summaries per 1-degree cell
+    <output>/<version>/shops/<id>.json     per-shop detail
+
+Version directories are named by content hash and never modified, so they
+can be cached forever; only manifest.json needs a short cache lifetime.
+The manifest records the catalog epoch and version it was built at, and a
+build is skipped when the manifest is already current.
+"""
+import fcntl
+import gzip
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+import orjson
+from app.core.changes import catalog_state
+from app.core.database import SessionLocal
+from app.core.serialization import SHOP_FIELDS, SUMMARY_FIELDS, encode_json, rows_to_dicts, shop_columns
+from app.models.coffee_shop import CoffeeShop
+
+# Set to enable automatic rebuilds after admin writes
+STATIC_CATALOG_DIR = os.getenv("STATIC_CATALOG_DIR", "")
+# Wait this long after a write before rebuilding, to batch bursts of edits
+REBUILD_DELAY_SECONDS = float(os.getenv("STATIC_CATALOG_REBUILD_DELAY", "5"))
+# Older version directories kept around for clients still holding an old manifest
+KEEP_VERSIONS = 3
+CELL_SIZE_DEGREES = 1.0
+
+
+def _write(path: str, content: bytes) -> None:
+    """Write a file plus a gzip copy (mtime=0 so identical content gives identical bytes)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+
+
+def _cell_name(latitude: float, longitude: float) -> str:
+    return f"{math.floor(latitude / CELL_SIZE_DEGREES)}_{math.floor(longitude / CELL_SIZE_DEGREES)}"
+
+
+def _read_manifest(output_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(output_dir, "manifest.json"), "rb") as f:
+            return orjson.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def build_static_catalog(output_dir: str, force: bool = False) -> Dict[str, Any]:
+    """
+    Build the catalog into output_dir unless the manifest is already at the
+    current catalog version, and return the manifest. Concurrent builders
+    serialize on a lock file, so a slower build can't publish older rows.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        db = SessionLocal()
+        try:
+            # Read the version first; see get_coffee_shop_changes
+            state = catalog_state(db)
+            existing = _read_manifest(output_dir)
+            if (
+                not force
+                and existing is not None
+                and existing.get("catalog_epoch") == state.epoch
+                and existing.get("catalog_version", -1) >= state.version
+            ):
+                return existing
+            shops = rows_to_dicts(db.query(*shop_columns(SHOP_FIELDS)).order_by(CoffeeShop.id).all(), SHOP_FIELDS)
+        finally:
+            db.close()
+
+        full_list = encode_json(shops)
+        version = hashlib.sha256(full_list).hexdigest()[:16]
+        version_dir = os.path.join(output_dir, version)
+        cells: Dict[str, list] = {}
+        for shop in shops:
+            summary = {field: shop[field] for field in SUMMARY_FIELDS}
+            cells.setdefault(_cell_name(shop["latitude"], shop["longitude"]), []).append(summary)
+
+        if not os.path.isdir(version_dir):
+            staging = tempfile.mkdtemp(prefix=".build-", dir=output_dir)
+            try:
+                _write(os.path.join(staging, "shops.json"), full_list)
+                _write(
+                    os.path.join(staging, "summary.json"),
+                    encode_json([summary for cell in cells.values() for summary in cell]),
+                )
+                for name, cell_shops in cells.items():
+                    _write(os.path.join(staging, "cells", f"{name}.json"), encode_json(cell_shops))
+                for shop in shops:
+                    _write(os.path.join(staging, "shops", f"{shop['id']}.json"), encode_json(shop))
+                os.rename(staging, version_dir)
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+
+        manifest = {
+            "version": version,
+            "catalog_version": state.version,
+            "catalog_epoch": state.epoch,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "shop_count": len(shops),
+            "cell_size_degrees": CELL_SIZE_DEGREES,
+            "files": {
+                "shops": f"{version}/shops.json",
+                "summary": f"{version}/summary.json",
+                "shop": f"{version}/shops/{{id}}.json",
+                "cell": f"{version}/cells/{{cell}}.json",
+            },
+            "cells": {name: len(cell_shops) for name, cell_shops in sorted(cells.items())},
+        }
+        manifest_tmp = os.path.join(output_dir, ".manifest.json.tmp")
+        with open(manifest_tmp, "wb") as f:
+            f.write(encode_json(manifest))
+        os.replace(manifest_tmp, os.path.join(output_dir, "manifest.json"))
+
+        _prune_old_versions(output_dir, keep=version)
+    return manifest
+
+
+def _prune_old_versions(output_dir: str, keep: str) -> None:
+    versions = [
+        entry for entry in os.scandir(output_dir)
+        if entry.is_dir() and not entry.name.startswith(".") and entry.name != keep
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class StaticCatalogRebuilder:
+    """Debounced background rebuild, triggered by catalog events."""
+
+    def __init__(self, output_dir: str, delay: float = REBUILD_DELAY_SECONDS):
+        self.output_dir = output_dir
+        self.delay = delay
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def schedule(self, event: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self) -> None:
+        try:
+            manifest = build_static_catalog(self.output_dir)
+            print(f"Rebuilt static catalog {manifest['version']} ({manifest['shop_count']} shops)")
+        except Exception as e:
+            print(f"Error rebuilding static catalog: {e}")
@@ -0,0 +1,248 @@
+"""
+Mapbox Vector Tile (MVT) encoding and caching for the coffee shop layer.
+
+Tiles hold a single point layer. The encoder is a small protobuf writer
+that covers what a point layer needs (no extra dependency). Encoded tiles
+are kept in a per-process LRU cache keyed by (z, x, y) and tagged with the
+catalog (epoch, version) they were built at. A request reads the version
+before the rows and only uses a tile built at that version, so writes
+through any worker or script are seen on the next request, and a tile built
+from rows read before a write is never served after it.
+
+When the version moves on, the cache evicts only the tiles covering the
+positions the changed shops held (read from the change log) and keeps the
+rest. It starts over when the epoch changes or a bulk change means the log
+can't say what changed.
+"""
+import math
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+LAYER_NAME = "coffee_shops"
+TILE_EXTENT = 4096
+# Points this close to a tile edge (in tile units) are also drawn in the
+# neighbouring tile, so marker icons aren't clipped at tile boundaries
+TILE_BUFFER = 64
+MAX_TILE_ZOOM = int(os.getenv("MAX_TILE_ZOOM", "20"))
+TILE_CACHE_SIZE = int(os.getenv("TILE_CACHE_SIZE", "4096"))
+MAX_MERCATOR_LAT = 85.0511287798
+
+TileKey = Tuple[int, int, int]
+# (epoch, version) from app/core/changes.catalog_state
+CatalogTag = Tuple[int, int]
+
+
+# =============================================================================
+# Tile math (Web Mercator / XYZ scheme)
+# =============================================================================
+
+def tile_fraction(latitude: float, longitude: float, zoom: int) -> Tuple[float, float]:
+    """Fractional tile coordinates of a point at the given zoom."""
+    n = 1 << zoom
+    latitude = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, latitude))
+    lat_rad = math.radians(latitude)
+    x = (longitude + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def _tile_lng(zoom: int, tx: float) -> float:
+    return tx / (1 << zoom) * 360.0 - 180.0
+
+
+def _tile_lat(zoom: int, ty: float) -> float:
+    ty = max(0.0, min(float(1 << zoom), ty))
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / (1 << zoom)))))
+
+
+def tile_bounds(zoom: int, x: int, y: int, pad: float = 0.0) -> Tuple[float, float, float, float]:
+    """
+    Return (min_lat, min_lng, max_lat, max_lng) of a tile, optionally grown
+    by `pad` tiles on every side.
+    """
+    return (
+        _tile_lat(zoom, y + 1 + pad),
+        max(-180.0, _tile_lng(zoom, x - pad)),
+        _tile_lat(zoom, y - pad),
+        min(180.0, _tile_lng(zoom, x + 1 + pad)),
+    )
+
+
+def buffered_tile_bounds(zoom: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Tile bounds grown by TILE_BUFFER, for selecting the points to encode."""
+    return tile_bounds(zoom, x, y, pad=TILE_BUFFER / TILE_EXTENT)
+
+
+def tiles_for_point(latitude: float, longitude: float, zoom: int) -> Iterator[TileKey]:
+    """Tiles at `zoom` (including buffer overlap) that can draw this point."""
+    pad = TILE_BUFFER / TILE_EXTENT
+    n = 1 << zoom
+    fx, fy = tile_fraction(latitude, longitude, zoom)
+    for tx in range(max(0, math.floor(fx - pad)), min(n - 1, math.floor(fx + pad)) + 1):
+        for ty in range(max(0, math.floor(fy - pad)), min(n - 1, math.floor(fy + pad)) + 1):
+            yield zoom, tx, ty
+
+
+# =============================================================================
+# Protobuf / MVT encoding
+# =============================================================================
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _encode_value(value: Any) -> bytes:
+    """Encode a tile Value message."""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _length_delimited(1, str(value).encode("utf-8"))
+
+
+def encode_point_tile(
+    features: Iterable[Tuple[int, float, float, Dict[str, Any]]],
+    zoom: int,
+    x: int,
+    y: int,
+) -> bytes:
+    """
+    Encode (id, latitude, longitude, properties) points into a one-layer MVT.
+    Properties with None values are omitted.
+    """
+    keys: Dict[str, int] = {}
+    values: Dict[Tuple[type, Any], int] = {}
+    encoded_values = []
+    encoded_features = []
+
+    for shop_id, latitude, longitude, properties in features:
+        fx, fy = tile_fraction(latitude, longitude, zoom)
+        px = round((fx - x) * TILE_EXTENT)
+        py = round((fy - y) * TILE_EXTENT)
+
+        tags = bytearray()
+        for name, value in properties.items():
+            if value is None:
+                continue
+            key_index = keys.setdefault(name, len(keys))
+            value_key = (type(value), value)
+            if value_key not in values:
+                values[value_key] = len(encoded_values)
+                encoded_values.append(_encode_value(value))
+            tags += _varint(key_index) + _varint(values[value_key])
+
+        # MoveTo(1) command followed by the zigzag-encoded point
+        geometry = _varint((1 << 3) | 1) + _varint(_zigzag(px)) + _varint(_zigzag(py))
+        feature = (
+            _key(1, 0) + _varint(shop_id)
+            + _length_delimited(2, bytes(tags))
+            + _key(3, 0) + _varint(1)  # GeomType.POINT
+            + _length_delimited(4, geometry)
+        )
+        encoded_features.append(_length_delimited(2, feature))
+
+    layer = bytearray()
+    layer += _key(15, 0) + _varint(2)  # version
+    layer += _length_delimited(1, LAYER_NAME.encode("utf-8"))
+    for feature in encoded_features:
+        layer += feature
+    for name in keys:
+        layer += _length_delimited(3, name.encode("utf-8"))
+    for value in encoded_values:
+        layer += _length_delimited(4, value)
+    layer += _key(5, 0) + _varint(TILE_EXTENT)
+
+    return _length_delimited(3, bytes(layer))
+
+
+# =============================================================================
+# Tile cache
+# =============================================================================
+
+class TileCache:
+    """Thread-safe LRU of encoded tiles, valid for one catalog version at a time."""
+
+    def __init__(self, max_tiles: int = TILE_CACHE_SIZE):
+        self.max_tiles = max_tiles
+        self._version: Optional[CatalogTag] = None
+        self._tiles: "OrderedDict[TileKey, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[CatalogTag]:
+        return self._version
+
+    def advance(self, cached: CatalogTag, version: CatalogTag, positions: Iterable[Tuple[float, float]]) -> None:
+        """
+        Move from `cached` to `version`, evicting the tiles that can draw any
+        of `positions` at each cached zoom. A no-op if another request has
+        already moved the cache.
+        """
+        with self._lock:
+            if self._version != cached:
+                return
+            zooms = {zoom for zoom, _, _ in self._tiles}
+            for latitude, longitude in positions:
+                for zoom in zooms:
+                    for key in tiles_for_point(latitude, longitude, zoom):
+                        self._tiles.pop(key, None)
+            self._version = version
+
+    def get(self, key: TileKey, version: CatalogTag) -> Optional[bytes]:
+        with self._lock:
+            if version != self._version:
+                return None
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key: TileKey, version: CatalogTag, tile: bytes) -> None:
+        with self._lock:
+            if version != self._version:
+                current = self._version
+                # A slow request that read an older version can't displace newer tiles
+                if current is not None and current[0] == version[0] and current[1] > version[1]:
+                    return
+                self._version = version
+                self._tiles.clear()
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._tiles.clear()
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+
+tile_cache = TileCache()
@@ -0,0 +1,94 @@
+"""
+Startup warm-up, run from the app lifespan before the server accepts traffic.
+
+Without it the first requests after a deploy pay for mapper configuration,
+opening pool connections, SQLAlchemy statement compilation and a cold OS
+page cache. Each step is timed and reported by /health/ready.
+"""
+import os
+import time
+from sqlalchemy import func
+from sqlalchemy.orm import configure_mappers
+from app.core.catalog_cache import CATALOG_CACHE, catalog_cache
+from app.core.changes import changes_since, current_version
+from app.core.database import SessionLocal, engine
+from app.core.geo import bounding_box
+from app.core.health import warmup
+from app.core.serialization import SHOP_FIELDS, encode_json, shop_to_dict
+from app.core.snapshot import catalog_snapshot
+from app.models.coffee_shop import CoffeeShop
+from app.schemas.coffee_shop import CoffeeShop as CoffeeShopSchema
+
+WARMUP = os.getenv("WARMUP", "true").lower() in ("1", "true", "yes")
+
+
+def _open_pool_connections() -> None:
+    """Check out up to pool_size connections at once so they're all opened."""
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+def _compile_hot_queries() -> None:
+    """Run the read paths once so statements land in the compiled cache."""
+    db = SessionLocal()
+    try:
+        version = current_version(db)
+        changes_since(db, version)
+        shop = db.query(CoffeeShop).order_by(CoffeeShop.id).first()
+        shop_id = shop.id if shop is not None else 0
+        db.query(CoffeeShop).filter(CoffeeShop.id == shop_id).first()
+        latitude, longitude = (shop.latitude, shop.longitude) if shop is not None else (0.0, 0.0)
+        min_lat, min_lng, max_lat, max_lng = bounding_box(latitude, longitude, 1.0)
+        db.query(CoffeeShop).filter(
+            CoffeeShop.latitude.between(min_lat, max_lat),
+            CoffeeShop.longitude.between(min_lng, max_lng),
+        ).all()
+        db.query(func.count(CoffeeShop.id)).scalar()
+        if shop is not None:
+            # Response encoders: the orjson fast path and the Pydantic response model
+            encode_json(shop_to_dict(shop, SHOP_FIELDS))
+            CoffeeShopSchema.model_validate(shop).model_dump_json()
+    finally:
+        db.close()
+
+
+def _load_catalog() -> None:
+    """Build the cached list bodies; reading every row also warms the page cache."""
+    db = SessionLocal()
+    try:
+        for view in ("full", "summary"):
+            catalog_cache.get(db, view)
+    finally:
+        db.close()
+
+
+def warm_up() -> None:
+    """Run every warm-up step, recording each one's duration for readiness."""
+    steps = [
+        ("mappers", configure_mappers),
+        ("pool", _open_pool_connections),
+        ("queries", _compile_hot_queries),
+    ]
+    if catalog_snapshot.enabled:
+        steps.append(("snapshot", catalog_snapshot.build))
+    elif CATALOG_CACHE:
+        steps.append(("catalog", _load_catalog))
+
+    for name, _ in steps:
+        warmup.expect(name)
+    started = time.perf_counter()
+    for name, step in steps:
+        warmup.begin(name)
+        try:
+            step()
+        except Exception as e:
+            # A failed warm-up step only costs latency; don't keep the instance unready
+            print(f"Warm-up step {name} failed: {e}")
+        warmup.mark_warm(name)
+    print(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
@@ -1,15 +1,46 @@
+import asyncio
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import coffee_shops, auth
-from app.core.database import engine, Base, SessionLocal
+from fastapi.responses import JSONResponse
+from app.api.v1 import coffee_shops, auth, cities, geocode_jobs, images, tiles
+from app.core.database import DATABASE_URL, engine, SessionLocal
+from sqlalchemy.exc import IntegrityError
 from app.core.auth import get_password_hash
-from app.models import coffee_shop, user
+from app.core.duplicates import detect_trigram
+from app.core.events import catalog_events
+from app.core.geo import detect_postgis
+from app.core.geocode_jobs import GEOCODE_WORKER, geocode_worker
+from app.core.geocoding import geocoder
+from app.core.warmup import WARMUP, warm_up
+from app.core.health import readiness, warmup
+from app.core.images import image_resizer
+from app.core.metrics import MetricsMiddleware, instrument_engine, registry
+from app.core.profiling import DB_PROFILE, QueryCountMiddleware
+from app.core.rate_limit import RATE_LIMIT_ENABLED, RateLimitMiddleware
+from app.core.migrations import pending_migrations, run_migrations
+from app.core.server import is_bootstrapped
+from app.core.snapshot import catalog_snapshot
+from app.core.static_catalog import STATIC_CATALOG_DIR, StaticCatalogRebuilder
+from app.models import coffee_shop, catalog_change, user
 from app.models.user import User
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Schema changes are applied by `python migrate.py` at deploy time. For local
+# SQLite development they're applied on startup unless AUTO_MIGRATE=false.
+AUTO_MIGRATE = os.getenv(
+    "AUTO_MIGRATE", "true" if DATABASE_URL.startswith("sqlite") else "false"
+).lower() in ("1", "true", "yes")
+
+
+def prepare_database():
+    """Bring the schema up to date (dev) or warn if a deploy skipped migrate.py."""
+    if AUTO_MIGRATE:
+        run_migrations(engine)
+    else:
+        pending = pending_migrations(engine)
+        if pending:
+            print(f"Warning: {len(pending)} pending migration(s); run `python migrate.py`")
 
 
 def create_default_admin():
@@ -39,6 +70,10 @@ def create_default_admin():
             db.add(admin_user)
             db.commit()
             print(f"Created admin user: {admin_username}")
+    except IntegrityError:
+        # Another process created it concurrently
+        db.rollback()
+        print(f"Admin user already created: {admin_username}")
     except Exception as e:
         print(f"Error creating admin user: {e}")
     finally:
@@ -47,10 +82,30 @@ def create_default_admin():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: create default admin if needed
-    create_default_admin()
+    # Startup: schema check and default admin; in production the gunicorn
+    # master does these once before forking (see app/core/server.py)
+    warmup.expect("startup")
+    if not is_bootstrapped():
+        prepare_database()
+        create_default_admin()
+    detect_postgis(engine)
+    detect_trigram(engine)
+    if catalog_snapshot.enabled:
+        catalog_events.add_listener(catalog_snapshot.on_event)
+    if STATIC_CATALOG_DIR:
+        catalog_events.add_listener(StaticCatalogRebuilder(STATIC_CATALOG_DIR).schedule)
+    await catalog_events.start()
+    if GEOCODE_WORKER:
+        geocode_worker.start()
+    warmup.mark_warm("startup")
+    if WARMUP:
+        await asyncio.to_thread(warm_up)
     yield
     # Shutdown: cleanup if needed
+    await geocode_worker.stop()
+    await catalog_events.stop()
+    await image_resizer.close()
+    await geocoder.close()
 
 app = FastAPI(
     title="Coffee Filter API",
@@ -72,6 +127,10 @@ cors_origins.extend([
     "https://coffee-filter.us",
 ])
 
+# Inside CORS so 429 responses still carry CORS headers
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
@@ -80,9 +139,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if DB_PROFILE:
+    app.add_middleware(QueryCountMiddleware)
+
+# Outermost, so CORS preflights and error responses are measured too
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+
 # Include routers
 app.include_router(coffee_shops.router, prefix="/api/v1", tags=["coffee-shops"])
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
+app.include_router(tiles.router, prefix="/api/v1", tags=["tiles"])
+app.include_router(images.router, prefix="/api/v1", tags=["images"])
+app.include_router(cities.router, prefix="/api/v1", tags=["cities"])
+app.include_router(geocode_jobs.router, prefix="/api/v1", tags=["geocode-jobs"])
 
 @app.get("/")
 async def root():
@@ -92,3 +162,18 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Database, pool headroom and warm-up state; 503 takes the instance out of rotation."""
+    result = await readiness()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (per-process metrics)."""
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,5 +1,9 @@
 from app.models.coffee_shop import CoffeeShop
+from app.models.catalog_change import CatalogChange
+from app.models.catalog_version import CatalogVersion
+from app.models.city_stat import CityStat
+from app.models.geocode_job import GeocodeJob
 from app.models.user import User
 
-__all__ = ["CoffeeShop", "User"]
+__all__ = ["CoffeeShop", "CatalogChange", "CatalogVersion", "CityStat", "GeocodeJob", "User"]
 
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class CatalogChange(Base):
+    """Append-only log of coffee shop writes; the id doubles as the catalog version."""
+    __tablename__ = "catalog_changes"
+    # AUTOINCREMENT keeps SQLite from reusing ids, so versions never go backwards
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True, index=True)
+    shop_id = Column(Integer, nullable=False, index=True)
+    operation = Column(String, nullable=False)  # "upsert" or "delete"
+    # Where the shop was before this change (NULL for creates), so caches
+    # keyed by position can evict what the write touched
+    previous_latitude = Column(Float, nullable=True)
+    previous_longitude = Column(Float, nullable=True)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
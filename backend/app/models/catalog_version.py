@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger, Column, Integer
+from app.core.database import Base
+
+
+class CatalogVersion(Base):
+    """Single-row counter holding the latest committed catalog version (see app/core/changes.py)."""
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)  # Always 1
+    version = Column(Integer, nullable=False, server_default="0")
+    # Versions below this can't be synced from the log and get the full catalog
+    baseline = Column(Integer, nullable=False, server_default="0")
+    # Random per database, so a recreated catalog never matches a cache of an old one
+    epoch = Column(BigInteger, nullable=False, server_default="0")
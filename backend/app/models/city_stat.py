@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class CityStat(Base):
+    """Per-city shop counts, centroid and bounding box, kept current on every write."""
+    __tablename__ = "city_stats"
+
+    city = Column(String, primary_key=True)
+    state = Column(String(2), primary_key=True)
+    shop_count = Column(Integer, nullable=False, default=0)
+    pour_over_count = Column(Integer, nullable=False, default=0)
+    has_wifi_count = Column(Integer, nullable=False, default=0)
+    accessibility_count = Column(Integer, nullable=False, default=0)
+    starred_count = Column(Integer, nullable=False, default=0)
+    center_latitude = Column(Float, nullable=False)
+    center_longitude = Column(Float, nullable=False)
+    min_latitude = Column(Float, nullable=False)
+    min_longitude = Column(Float, nullable=False)
+    max_latitude = Column(Float, nullable=False)
+    max_longitude = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, JSON, Index
+from sqlalchemy.orm import validates
+from app.core.address import parse_city_state
 from app.core.database import Base
 
 class CoffeeShop(Base):
@@ -19,4 +21,18 @@ class CoffeeShop(Base):
     website = Column(String, nullable=True)
     instagram = Column(String, nullable=True)
     starred = Column(Boolean, default=False)  # Featured/favorite shop
+    # Derived from address on every write (see app/core/address.py)
+    city = Column(String, nullable=True)
+    state = Column(String(2), nullable=True)
 
+
+    __table_args__ = (
+        # Bounding box prefilter for location search (see app/core/geo.py)
+        Index("ix_coffee_shops_lat_lng", "latitude", "longitude"),
+        Index("ix_coffee_shops_state_city", "state", "city"),
+    )
+
+    @validates("address")
+    def _tag_city_state(self, key, address):
+        self.city, self.state = parse_city_state(address) or (None, None)
+        return address
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Index
+from app.core.database import Base
+
+
+class GeocodeJob(Base):
+    """A shop write waiting for its address to be geocoded (see app/core/geocode_jobs.py)."""
+    __tablename__ = "geocode_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    operation = Column(String, nullable=False)  # "create" or "update"
+    shop_id = Column(Integer, nullable=True)  # Target of an update; the new shop once a create is done
+    address = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)  # Shop fields to write once coordinates are known
+    allow_duplicate = Column(Boolean, nullable=False, default=False)
+    status = Column(String, nullable=False)  # pending_geocode, geocoding, done or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    candidates = Column(JSON, nullable=True)  # Likely duplicates when a job fails on them
+    run_after = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # The worker's queue scan
+        Index("ix_geocode_jobs_status_run_after", "status", "run_after"),
+    )
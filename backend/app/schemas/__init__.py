@@ -1,4 +1,4 @@
-from app.schemas.coffee_shop import CoffeeShop, CoffeeShopCreate, CoffeeShopUpdate
+from app.schemas.coffee_shop import CoffeeShop, CoffeeShopCreate, CoffeeShopUpdate, CoffeeShopSummary, CoffeeShopChanges, CoffeeShopBatch, CoffeeShopBatchRequest, CityStats, DuplicateConflict, GeocodeJobStatus
 
-__all__ = ["CoffeeShop", "CoffeeShopCreate", "CoffeeShopUpdate"]
+__all__ = ["CoffeeShop", "CoffeeShopCreate", "CoffeeShopUpdate", "CoffeeShopSummary", "CoffeeShopChanges", "CoffeeShopBatch", "CoffeeShopBatchRequest", "CityStats", "DuplicateConflict", "GeocodeJobStatus"]
 
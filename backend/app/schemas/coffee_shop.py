@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 class DayHours(BaseModel):
     """Hours for a single day"""
@@ -69,5 +69,85 @@ class CoffeeShopUpdate(BaseModel):
 class CoffeeShop(CoffeeShopBase):
     """Schema for coffee shop responses"""
     id: int
+    # Derived from address on write; None when it couldn't be parsed
+    city: Optional[str] = None
+    state: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+class CoffeeShopSummary(BaseModel):
+    """Slim schema for list and map responses - no description, machine or links"""
+    id: int
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    image: Optional[str] = None
+    accessibility: bool = False
+    has_wifi: bool = False
+    weekly_hours: WeeklyHours = {}  # Markers and the open-now filter need the hours
+    pour_over: bool = False
+    starred: bool = False
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CoffeeShopChanges(BaseModel):
+    """Delta sync response: shops changed or deleted since the client's version"""
+    version: int
+    full: bool = False  # True when upserts is the whole catalog and the client should replace its copy
+    upserts: List[CoffeeShop]
+    deletes: List[int]
+
+class CoffeeShopBatchRequest(BaseModel):
+    """Ids to fetch in one call, e.g. a user's favorites"""
+    ids: List[int]
+
+class CoffeeShopBatch(BaseModel):
+    """Batch fetch response: shops in the requested order, plus ids that don't exist"""
+    shops: List[CoffeeShop]
+    missing: List[int]
+
+class DuplicateCandidate(BaseModel):
+    """An existing shop that looks like the one being written"""
+    id: int
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    distance_m: float
+    name_similarity: float
+    same_address: bool
+
+class DuplicateConflict(BaseModel):
+    """409 response for a likely duplicate; resend with allow_duplicate=true to write anyway"""
+    detail: str
+    candidates: List[DuplicateCandidate]
+
+class GeocodeJobStatus(BaseModel):
+    """A write waiting on background geocoding; shop_id is set once it is done"""
+    id: int
+    operation: str
+    status: str
+    shop_id: Optional[int] = None
+    address: str
+    attempts: int
+    error: Optional[str] = None
+    candidates: Optional[List[DuplicateCandidate]] = None
+    created_at: str
+    updated_at: str
+
+class GeoPoint(BaseModel):
+    latitude: float
+    longitude: float
+
+class CityStats(BaseModel):
+    """Shop counts for one city, with its centroid and [min_lat, min_lng, max_lat, max_lng] bbox"""
+    city: str
+    state: str
+    shop_count: int
+    pour_over: int
+    has_wifi: int
+    accessibility: int
+    starred: int
+    center: GeoPoint
+    bbox: List[float]
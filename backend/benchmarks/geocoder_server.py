@@ -0,0 +1,62 @@
+"""
+Local Nominatim stand-in for benchmarks, tests and offline development.
+
+Usage:
+    python -m benchmarks.geocoder_server [--port 8089] [--fixtures PATH]
+                                         [--gazetteer PATH] [--latency-ms N]
+
+Serves the subset of the Nominatim API the app uses (`/search?q=...&format=json`
+and `/status`) from recorded responses and a gazetteer, via the offline
+geocoder (see app/core/geocoding.py for the file formats). Without files it
+knows the benchmark metros. --latency-ms adds a delay to every search to
+mimic a remote service. Point the API at it with:
+
+    GEOCODER_URL=http://127.0.0.1:8089 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from app.core.geocoding import OfflineGeocoder
+from benchmarks.seed import METROS
+
+
+def create_app(geocoder: OfflineGeocoder, latency_ms: float = 0) -> Starlette:
+    async def search(request: Request):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        coordinates = geocoder.lookup_sync(request.query_params.get("q", ""))
+        if coordinates is None:
+            return JSONResponse([])
+        latitude, longitude = coordinates
+        return JSONResponse([{"lat": str(latitude), "lon": str(longitude)}])
+
+    async def status(request: Request):
+        return PlainTextResponse("OK")
+
+    return Starlette(routes=[Route("/search", search), Route("/status", status)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Nominatim stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fixtures", default="", help="JSON of address -> [lat, lng] or null")
+    parser.add_argument("--gazetteer", default="", help="CSV with city,state,latitude,longitude")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every search")
+    args = parser.parse_args()
+
+    if args.fixtures or args.gazetteer:
+        geocoder = OfflineGeocoder.from_files(args.fixtures, args.gazetteer)
+    else:
+        geocoder = OfflineGeocoder(gazetteer={(city.lower(), state): (lat, lng) for city, state, lat, lng in METROS})
+    uvicorn.run(create_app(geocoder, args.latency_ms), host=args.host, port=args.port,
+                log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
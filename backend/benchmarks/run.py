@@ -0,0 +1,371 @@
+"""
+Load and latency benchmarks for the API.
+
+Usage:
+    python -m benchmarks.run [options]
+
+Options:
+    --sizes 1000,10000,100000   Catalog sizes to benchmark (default 1000,10000)
+    --scenarios list,...        Any of: list, list_summary, detail, search,
+                                login, write, write_geocoded (default: all)
+    --concurrency N             Concurrent clients (default 16)
+    --duration S                Seconds per scenario (default 10)
+    --database-url URL          Database to seed and serve (default: a temp SQLite file).
+                                The catalog in it is replaced!
+    --server uvicorn|gunicorn   How to run the API (default uvicorn, one process)
+    --geocoder-latency-ms N     Delay added by the local geocoder stand-in (default 0)
+    --output PATH               Write results JSON (default benchmarks/results/latest.json)
+    --baseline PATH             Compare against a stored run (default benchmarks/baseline.json)
+    --save-baseline             Store this run as the new baseline
+
+Each size is seeded with a synthetic catalog (benchmarks/seed.py), a local
+server is started against it, and every scenario is driven for --duration
+seconds. Reports p50/p95/p99 latency, requests/sec, errors and the
+server's resident memory. Regressions over --threshold percent against
+the baseline are flagged. The API geocodes against a local stand-in
+(benchmarks/geocoder_server.py), never the public Nominatim service.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+import httpx
+from sqlalchemy import create_engine
+
+from benchmarks.seed import METROS, seed_catalog
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_PREFIX = "/api/v1"
+ADMIN_USERNAME = "benchmark-admin"
+ADMIN_PASSWORD = "benchmark-password"
+SCENARIOS = ["list", "list_summary", "detail", "search", "login", "write", "write_geocoded"]
+
+Request = Callable[[httpx.AsyncClient], Awaitable[List[httpx.Response]]]
+
+
+# =============================================================================
+# Server management
+# =============================================================================
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(process: subprocess.Popen, url: str, name: str) -> None:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} exited during startup")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{name} did not become healthy within 60s")
+
+
+def start_geocoder(port: int, latency_ms: float) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.geocoder_server", "--port", str(port), "--latency-ms", str(latency_ms)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL,
+    )
+    _wait_healthy(process, f"http://127.0.0.1:{port}/status", "Geocoder stand-in")
+    return process
+
+
+def start_server(database_url: str, server: str, port: int, geocoder_url: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        GEOCODER_URL=geocoder_url,
+        ADMIN_USERNAME=ADMIN_USERNAME,
+        ADMIN_PASSWORD=ADMIN_PASSWORD,
+        PORT=str(port),
+        # Every benchmark client shares one IP
+        RATE_LIMIT_ENABLED="false",
+    )
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                   "--log-level", "warning", "--no-access-log"]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    _wait_healthy(process, f"http://127.0.0.1:{port}/health", "Server")
+    return process
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                for child in f.read().split():
+                    pids.extend(_process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def server_memory_mb(pid: int) -> Optional[float]:
+    """Resident memory of the server and its workers (Linux only)."""
+    total_kb = 0
+    for process_id in _process_tree(pid):
+        try:
+            with open(f"/proc/{process_id}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            return None
+    return round(total_kb / 1024, 1)
+
+
+# =============================================================================
+# Scenarios
+# =============================================================================
+
+def build_scenarios(shop_ids: List[int], token: str) -> Dict[str, Request]:
+    rng = random.Random(7)
+    auth = {"Authorization": f"Bearer {token}"}
+
+    async def list_all(client):
+        return [await client.get(f"{API_PREFIX}/coffee-shops")]
+
+    async def list_summary(client):
+        return [await client.get(f"{API_PREFIX}/coffee-shops", params={"view": "summary"})]
+
+    async def detail(client):
+        # Sample seeded ids, so every request hits a shop whatever the id sequence did
+        return [await client.get(f"{API_PREFIX}/coffee-shops/{rng.choice(shop_ids)}")]
+
+    async def search(client):
+        _, _, lat, lng = rng.choice(METROS)
+        return [await client.get(
+            f"{API_PREFIX}/coffee-shops/search/by-location",
+            params={"latitude": lat + rng.uniform(-0.05, 0.05), "longitude": lng + rng.uniform(-0.05, 0.05), "radius": 2},
+        )]
+
+    async def login(client):
+        return [await client.post(
+            f"{API_PREFIX}/auth/login",
+            data={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD},
+        )]
+
+    async def write(client):
+        # Coordinates are supplied so geocoding stays out of the measurement
+        _, _, lat, lng = rng.choice(METROS)
+        created = await client.post(f"{API_PREFIX}/coffee-shops", headers=auth, json={
+            "name": f"Benchmark Shop {rng.random()}",
+            "address": "1 Benchmark Way, Austin, TX 78701",
+            "latitude": lat + rng.uniform(-0.1, 0.1),
+            "longitude": lng + rng.uniform(-0.1, 0.1),
+        })
+        if created.status_code != 201:
+            return [created]
+        shop_id = created.json()["id"]
+        updated = await client.put(f"{API_PREFIX}/coffee-shops/{shop_id}", headers=auth, json={"description": "Updated"})
+        deleted = await client.delete(f"{API_PREFIX}/coffee-shops/{shop_id}", headers=auth)
+        return [created, updated, deleted]
+
+    async def write_geocoded(client):
+        # No coordinates: the create waits on the geocoder stand-in. Every
+        # shop lands on its city's centroid, so skip the duplicate check
+        city, state, _, _ = rng.choice(METROS)
+        created = await client.post(f"{API_PREFIX}/coffee-shops?allow_duplicate=true", headers=auth, json={
+            "name": f"Benchmark Shop {rng.random()}",
+            "address": f"{rng.randint(100, 9999)} Benchmark Way, {city}, {state}",
+        })
+        if created.status_code != 201:
+            return [created]
+        deleted = await client.delete(f"{API_PREFIX}/coffee-shops/{created.json()['id']}", headers=auth)
+        return [created, deleted]
+
+    return {
+        "list": list_all,
+        "list_summary": list_summary,
+        "detail": detail,
+        "search": search,
+        "login": login,
+        "write": write,
+        "write_geocoded": write_geocoded,
+    }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def drive(base_url: str, request: Request, concurrency: int, duration: float) -> Dict[str, float]:
+    """Run `request` from `concurrency` clients for `duration` seconds."""
+    latencies: List[float] = []
+    errors = 0
+    response_bytes = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker():
+            nonlocal errors, response_bytes
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    responses = await request(client)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+                for response in responses:
+                    response_bytes += len(response.content)
+                    if response.status_code >= 400:
+                        errors += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "avg_response_kb": round(response_bytes / max(1, len(latencies)) / 1024, 1),
+    }
+
+
+# =============================================================================
+# Reporting
+# =============================================================================
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Return human-readable regressions of p95 latency or throughput."""
+    regressions = []
+    for size, scenarios in results["sizes"].items():
+        for name, current in scenarios["scenarios"].items():
+            previous = baseline.get("sizes", {}).get(size, {}).get("scenarios", {}).get(name)
+            if not previous:
+                continue
+            if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold / 100):
+                regressions.append(f"{size}/{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+            if previous["rps"] and current["rps"] < previous["rps"] * (1 - threshold / 100):
+                regressions.append(f"{size}/{name}: rps {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+def print_table(size: int, scenarios: Dict[str, Dict], memory: Dict) -> None:
+    print(f"\n  {size} shops  (server RSS: idle {memory['idle_mb']} MB, peak {memory['peak_mb']} MB)")
+    print(f"  {'scenario':<14}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'KB/req':>9}")
+    for name, stats in scenarios.items():
+        print(f"  {name:<14}{stats['rps']:>9}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['errors']:>8}{stats['avg_response_kb']:>9}")
+
+
+def run(args) -> Dict:
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "server": args.server,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "sizes": {},
+    }
+    scenario_names = [name.strip() for name in args.scenarios.split(",")]
+    geocoder_port = _free_port()
+    geocoder = start_geocoder(geocoder_port, args.geocoder_latency_ms)
+    try:
+        for size in [int(value) for value in args.sizes.split(",")]:
+            results["sizes"][str(size)] = run_size(args, size, scenario_names, f"http://127.0.0.1:{geocoder_port}")
+    finally:
+        geocoder.terminate()
+        geocoder.wait(timeout=30)
+    return results
+
+
+def run_size(args, size: int, scenario_names: List[str], geocoder_url: str) -> Dict:
+    database_url = args.database_url
+    if not database_url:
+        temp_dir = tempfile.mkdtemp(prefix="coffee-bench-")
+        database_url = f"sqlite:///{temp_dir}/benchmark.db"
+
+    print(f"\nSeeding {size} shops...")
+    engine = create_engine(database_url)
+    shop_ids = seed_catalog(engine, size)
+    engine.dispose()
+
+    port = _free_port()
+    process = start_server(database_url, args.server, port, geocoder_url)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        token = httpx.post(
+            f"{base_url}{API_PREFIX}/auth/login",
+            data={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD},
+        ).json()["access_token"]
+        scenarios = build_scenarios(shop_ids, token)
+        memory = {"idle_mb": server_memory_mb(process.pid), "peak_mb": 0.0}
+        size_results = {}
+        for name in scenario_names:
+            print(f"  Running {name}...")
+            size_results[name] = asyncio.run(drive(base_url, scenarios[name], args.concurrency, args.duration))
+            memory["peak_mb"] = max(memory["peak_mb"], server_memory_mb(process.pid) or 0.0)
+        print_table(size, size_results, memory)
+        return {"memory": memory, "scenarios": size_results}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Coffee Filter API")
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--database-url")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--geocoder-latency-ms", type=float, default=0)
+    parser.add_argument("--output", default=os.path.join(BACKEND_DIR, "benchmarks", "results", "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(BACKEND_DIR, "benchmarks", "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n⚠️  Regressions over {args.threshold}% vs baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ No regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
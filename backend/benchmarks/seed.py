@@ -0,0 +1,109 @@
+"""
+Synthetic catalog generator for benchmarks.
+
+Usage:
+    python -m benchmarks.seed <count> [database_url]
+
+Shops are spread around real US metros with jittered coordinates and
+realistic field sizes, so list payloads and geo queries behave like
+production data. Generation is seeded, so the same count always gives
+the same catalog.
+"""
+import random
+import sys
+from typing import Iterator, List
+from sqlalchemy import create_engine, delete, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.changes import mark_bulk_change
+from app.core.cities import rebuild_city_stats
+from app.core.migrations import run_migrations
+from app.models.catalog_change import CatalogChange
+from app.models.coffee_shop import CoffeeShop
+
+METROS = [
+    ("Austin", "TX", 30.2672, -97.7431),
+    ("Los Angeles", "CA", 34.0522, -118.2437),
+    ("San Francisco", "CA", 37.7749, -122.4194),
+    ("Seattle", "WA", 47.6062, -122.3321),
+    ("Portland", "OR", 45.5152, -122.6784),
+    ("New York", "NY", 40.7128, -74.0060),
+    ("Boston", "MA", 42.3601, -71.0589),
+    ("Chicago", "IL", 41.8781, -87.6298),
+    ("Denver", "CO", 39.7392, -104.9903),
+    ("Kansas City", "MO", 39.0997, -94.5786),
+    ("Atlanta", "GA", 33.7490, -84.3880),
+    ("Nashville", "TN", 36.1627, -86.7816),
+]
+
+WORDS = ["Bean", "Ritual", "Ember", "Copper", "Sparrow", "Harbor", "Oak", "Golden", "Field", "North", "Lantern", "Stone"]
+SUFFIXES = ["Coffee", "Coffee Roasters", "Cafe", "Espresso Bar", "Coffee Co."]
+STREETS = ["Main St", "Broadway", "Oak Ave", "Elm St", "Grand Blvd", "Market St", "2nd Ave", "Park Rd"]
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+INSERT_BATCH_SIZE = 5000
+
+
+def generate_shops(count: int, seed: int = 42) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for i in range(count):
+        city, state, lat, lng = rng.choice(METROS)
+        hours = {"open": f"{rng.randint(6, 8)}am", "close": f"{rng.randint(3, 7)}pm"}
+        yield {
+            "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(SUFFIXES)} #{i}",
+            "address": f"{rng.randint(100, 9999)} {rng.choice(STREETS)}, {city}, {state} {rng.randint(10000, 99999)}",
+            "latitude": lat + rng.gauss(0, 0.08),
+            "longitude": lng + rng.gauss(0, 0.08),
+            "image": "https://placehold.co/150x150/e2e8f0/64748b?text=☕",
+            "accessibility": rng.random() < 0.7,
+            "has_wifi": rng.random() < 0.8,
+            "description": "Neighborhood specialty coffee bar with rotating single-origin pour-overs. " * rng.randint(1, 3),
+            "machine": rng.choice(["La Marzocco", "Slayer", "Synesso", ""]),
+            "weekly_hours": {day: dict(hours) for day in DAYS if rng.random() < 0.9},
+            "pour_over": rng.random() < 0.6,
+            "website": f"https://example.com/shop-{i}",
+            "instagram": f"@shop{i}",
+            "starred": rng.random() < 0.05,
+            # Core inserts skip the model's address hook, so tag the city here
+            "city": city,
+            "state": state,
+        }
+
+
+def seed_catalog(engine: Engine, count: int, seed: int = 42) -> List[int]:
+    """Replace the catalog with `count` synthetic shops. Returns their ids."""
+    run_migrations(engine)
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # DELETE leaves the id sequence where it was; start reseeded ids at 1 again
+            conn.execute(text("TRUNCATE coffee_shops, catalog_changes RESTART IDENTITY CASCADE"))
+        else:
+            conn.execute(delete(CatalogChange.__table__))
+            conn.execute(delete(CoffeeShop.__table__))
+
+    batch = []
+    with engine.begin() as conn:
+        for shop in generate_shops(count, seed):
+            batch.append(shop)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                conn.execute(CoffeeShop.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(CoffeeShop.__table__.insert(), batch)
+    with Session(engine) as db:
+        rebuild_city_stats(db)
+        # The log was cleared, so caches and clients must start over
+        mark_bulk_change(db)
+        db.commit()
+        return list(db.scalars(select(CoffeeShop.id).order_by(CoffeeShop.id)))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    count = int(sys.argv[1])
+    database_url = sys.argv[2] if len(sys.argv) > 2 else "sqlite:///./benchmark.db"
+    seed_catalog(create_engine(database_url), count)
+    print(f"Seeded {count} shops into {database_url}")
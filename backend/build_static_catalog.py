@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Build the static, pre-compressed catalog for CDN hosting.
+
+Usage:
+    python build_static_catalog.py [output_dir] [--force]
+
+Defaults to $STATIC_CATALOG_DIR, or ./static_catalog. Upload the directory
+to static hosting; serve manifest.json with a short cache lifetime and the
+version directories with a long one. The API rebuilds automatically after
+admin writes when STATIC_CATALOG_DIR is set. Nothing is written when the
+manifest is already at the current catalog version, unless --force is given.
+"""
+import os
+import sys
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.static_catalog import STATIC_CATALOG_DIR, build_static_catalog
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    output_dir = args[0] if args else (STATIC_CATALOG_DIR or "static_catalog")
+    manifest = build_static_catalog(output_dir, force="--force" in sys.argv[1:])
+    print(f"Built static catalog {manifest['version']} in {output_dir}")
+    print(f"  Shops: {manifest['shop_count']}")
+    print(f"  Cells: {len(manifest['cells'])}")
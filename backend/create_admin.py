@@ -17,14 +17,15 @@ import os
 # Add the parent directory to the path so we can import from app
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.core.database import SessionLocal, engine, Base
+from app.core.database import SessionLocal, engine
+from app.core.migrations import run_migrations
 from app.models.user import User
 from app.core.auth import get_password_hash
 
 def create_admin(username: str = "admin", password: str = "admin123"):
     """Create the admin user if it doesn't exist."""
     # Ensure tables exist
-    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     
     db = SessionLocal()
     try:
@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for production.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Environment:
+    PORT                 Port to bind (default 8000, set by Railway)
+    WEB_CONCURRENCY      Worker processes (default: CPU count, capped at 4)
+    KEEPALIVE            Seconds to hold idle keep-alive connections (default 75,
+                         longer than typical load balancer idle timeouts)
+    BACKLOG              Pending connection queue size (default 2048)
+    MAX_REQUESTS         Recycle a worker after this many requests (default 0 = never)
+    FORWARDED_ALLOW_IPS  Comma-separated IPs/CIDRs of the reverse proxy whose
+                         X-Forwarded-For is trusted (default 127.0.0.1). Set it
+                         to the platform proxy's range in every deployment
+
+Each worker has its own database pool (DB_POOL_SIZE + DB_MAX_OVERFLOW
+connections), so size WEB_CONCURRENCY with Postgres max_connections in mind.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", min(4, multiprocessing.cpu_count())))
+worker_class = "app.core.server.UvicornWorker"
+
+keepalive = int(os.getenv("KEEPALIVE", "75"))
+backlog = int(os.getenv("BACKLOG", "2048"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+# Trust X-Forwarded-* only from the proxy in front of us. The client IP keys
+# rate limits, so "*" would let any caller pick its own by sending the header
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# uvicorn logs access lines itself
+accesslog = None
+errorlog = "-"
+
+
+def on_starting(server):
+    """Runs once in the master before any worker forks."""
+    from app.core.server import bootstrap_once
+
+    bootstrap_once()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Apply database schema migrations (see app/core/migrations.py).
+
+Usage:
+    python migrate.py            Apply pending migrations
+    python migrate.py --status   List applied and pending migrations
+
+Uses DATABASE_URL like the API. Run this once per deploy, before starting
+the server.
+"""
+import os
+import sys
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import engine
+from app.core.migrations import MIGRATIONS, applied_versions, run_migrations
+
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        applied = set(applied_versions(engine))
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                state = "applied"
+            elif migration.applies is not None and not migration.applies(engine):
+                state = "not enabled"
+            else:
+                state = "pending"
+            print(f"  {migration.version:>4}  {migration.name:<40} {state}")
+        sys.exit(0)
+
+    applied = run_migrations(engine)
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database is up to date")
@@ -1,49 +1,76 @@
 """
 Migration script to convert hours + days_open to weekly_hours format.
 
-Run with: python3 migrate_weekly_hours.py
+Run with: python3 migrate_weekly_hours.py [--dry-run] [--batch-size N]
 
 This script:
 1. Adds the weekly_hours column if it doesn't exist
 2. Migrates existing data from hours/days_open to weekly_hours
 3. Drops the old hours and days_open columns
+
+Rows are read in keyset-paginated batches (WHERE id > last_id ORDER BY id)
+and written back with one executemany UPDATE per batch, each batch in its
+own transaction. Rows whose weekly_hours already matches are skipped, so
+reruns only touch what changed. --dry-run prints the diff without writing.
+The UPDATEs bypass the catalog change log, so a run that changed rows ends
+with a bulk change that makes caches and syncing clients reload.
 """
+import argparse
+import json
 import os
 import re
+import sys
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy import create_engine, text, inspect
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
 
 # Database URL - same as in database.py
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./coffee_shops.db")
 
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(DATABASE_URL)
+DEFAULT_BATCH_SIZE = 1000
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Matches patterns like "7am - 5pm", "7:00am-5:00pm", "7 AM - 5 PM"
+HOURS_PATTERN = re.compile(
+    r'(\d{1,2}(?::\d{2})?\s*(?:am|pm|AM|PM)?)\s*[-–]\s*(\d{1,2}(?::\d{2})?\s*(?:am|pm|AM|PM)?)'
+)
 
+# Map full day names to lowercase keys
+DAY_MAPPING = {
+    "Monday": "monday",
+    "Tuesday": "tuesday",
+    "Wednesday": "wednesday",
+    "Thursday": "thursday",
+    "Friday": "friday",
+    "Saturday": "saturday",
+    "Sunday": "sunday",
+}
 
-def parse_legacy_hours(hours_str: str) -> dict:
-    """
-    Parse legacy hours string like "7am - 5pm" or "7:00 AM - 5:00 PM" 
-    into {open, close} format.
-    """
+
+@lru_cache(maxsize=4096)
+def _parse_legacy_hours(hours_str: str) -> Tuple[str, str]:
     if not hours_str:
-        return {"open": "7am", "close": "5pm"}
-    
-    # Try to extract time range pattern
-    # Matches patterns like "7am - 5pm", "7:00am-5:00pm", "7 AM - 5 PM"
-    pattern = r'(\d{1,2}(?::\d{2})?\s*(?:am|pm|AM|PM)?)\s*[-–]\s*(\d{1,2}(?::\d{2})?\s*(?:am|pm|AM|PM)?)'
-    match = re.search(pattern, hours_str)
-    
+        return ("7am", "5pm")
+
+    match = HOURS_PATTERN.search(hours_str)
     if match:
         open_time = match.group(1).lower().replace(" ", "").replace(":00", "")
         close_time = match.group(2).lower().replace(" ", "").replace(":00", "")
-        return {"open": open_time, "close": close_time}
-    
+        return (open_time, close_time)
+
     # Default fallback
-    return {"open": "7am", "close": "5pm"}
+    return ("7am", "5pm")
+
+
+def parse_legacy_hours(hours_str: str) -> dict:
+    """
+    Parse legacy hours string like "7am - 5pm" or "7:00 AM - 5:00 PM" 
+    into {open, close} format.
+    """
+    open_time, close_time = _parse_legacy_hours(hours_str or "")
+    return {"open": open_time, "close": close_time}
 
 
 def convert_to_weekly_hours(hours_str: str, days_open: list) -> dict:
@@ -53,22 +80,11 @@ def convert_to_weekly_hours(hours_str: str, days_open: list) -> dict:
     parsed = parse_legacy_hours(hours_str)
     weekly_hours = {}
     
-    # Map full day names to lowercase keys
-    day_mapping = {
-        "Monday": "monday",
-        "Tuesday": "tuesday", 
-        "Wednesday": "wednesday",
-        "Thursday": "thursday",
-        "Friday": "friday",
-        "Saturday": "saturday",
-        "Sunday": "sunday",
-    }
-    
     if days_open:
         for day in days_open:
             # Handle cases like "Wednesday - Closed 1st Wednesday of the month"
             # Extract just the day name
-            for full_name, key in day_mapping.items():
+            for full_name, key in DAY_MAPPING.items():
                 if day.startswith(full_name):
                     weekly_hours[key] = parsed.copy()
                     break
@@ -80,11 +96,85 @@ def convert_to_weekly_hours(hours_str: str, days_open: list) -> dict:
     return weekly_hours
 
 
-def migrate():
+def _load_json(value: Any) -> Any:
+    """JSON columns come back as strings on SQLite and parsed on PostgreSQL."""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return None
+    return value
+
+
+def convert_rows(engine: Engine, has_hours: bool, has_days_open: bool, has_weekly_hours: bool = True,
+                 batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False) -> Dict[str, float]:
+    """
+    Convert hours/days_open to weekly_hours batch by batch.
+    Returns counters: scanned, updated, seconds.
+    """
+    hours_column = "hours" if has_hours else "NULL"
+    days_column = "days_open" if has_days_open else "NULL"
+    weekly_column = "weekly_hours" if has_weekly_hours else "NULL"
+    select_batch = text(
+        f"SELECT id, {hours_column} AS hours, {days_column} AS days_open, {weekly_column} AS weekly_hours "
+        f"FROM coffee_shops WHERE id > :last_id ORDER BY id LIMIT :batch_size"
+    )
+    update = text("UPDATE coffee_shops SET weekly_hours = :weekly_hours WHERE id = :id")
+
+    scanned = 0
+    updated = 0
+    last_id = 0
+    started = time.monotonic()
+
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(select_batch, {"last_id": last_id, "batch_size": batch_size}).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned += len(rows)
+
+        changes: List[Dict[str, Any]] = []
+        for row in rows:
+            days_open = _load_json(row.days_open) or []
+            weekly_hours = convert_to_weekly_hours(row.hours or "", days_open)
+            current = _load_json(row.weekly_hours)
+            if current == weekly_hours:
+                continue
+            if dry_run:
+                print(f"  Shop {row.id}: {row.hours!r} {days_open} -> {weekly_hours}"
+                      + (f" (was {current})" if current else ""))
+            changes.append({"id": row.id, "weekly_hours": json.dumps(weekly_hours)})
+
+        if changes and not dry_run:
+            with engine.begin() as conn:
+                conn.execute(update, changes)
+        updated += len(changes)
+
+        elapsed = time.monotonic() - started
+        rate = scanned / elapsed if elapsed > 0 else 0
+        print(f"  {scanned} rows scanned, {updated} {'to update' if dry_run else 'updated'} "
+              f"({rate:,.0f} rows/sec), last id {last_id}")
+
+    # Databases from before the catalog_version migration have no version to bump
+    if updated and not dry_run and inspect(engine).has_table("catalog_version"):
+        from app.core.changes import mark_bulk_change
+
+        with Session(engine) as db:
+            mark_bulk_change(db)
+            db.commit()
+
+    return {"scanned": scanned, "updated": updated, "seconds": time.monotonic() - started}
+
+
+def migrate(engine: Optional[Engine] = None, batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False):
     """Run the migration."""
-    db = SessionLocal()
+    from app.core.migrations import add_column_if_missing, run_ddl
+
+    if engine is None:
+        engine = create_engine(DATABASE_URL)
     inspector = inspect(engine)
-    is_sqlite = DATABASE_URL.startswith("sqlite")
+    is_sqlite = engine.dialect.name == "sqlite"
     
     try:
         # Check current columns
@@ -102,60 +192,25 @@ def migrate():
         
         # Step 1: Add weekly_hours column if it doesn't exist
         if not has_weekly_hours:
-            print("Adding weekly_hours column...")
-            if is_sqlite:
-                db.execute(text("ALTER TABLE coffee_shops ADD COLUMN weekly_hours JSON"))
+            if dry_run:
+                print("[DRY RUN] Would add weekly_hours column")
             else:
-                db.execute(text("ALTER TABLE coffee_shops ADD COLUMN weekly_hours JSONB"))
-            db.commit()
-            print("✓ Added weekly_hours column")
+                print("Adding weekly_hours column...")
+                add_column_if_missing(engine, "coffee_shops", "weekly_hours", "JSON" if is_sqlite else "JSONB")
+                print("✓ Added weekly_hours column")
         
         # Step 2: Migrate data
         if has_hours or has_days_open:
             print("Migrating data from hours/days_open to weekly_hours...")
-            
-            # Fetch all shops with old format
-            if has_hours and has_days_open:
-                result = db.execute(text("SELECT id, hours, days_open FROM coffee_shops"))
-            elif has_hours:
-                result = db.execute(text("SELECT id, hours, NULL as days_open FROM coffee_shops"))
-            else:
-                result = db.execute(text("SELECT id, NULL as hours, days_open FROM coffee_shops"))
-            
-            rows = result.fetchall()
-            
-            import json
-            for row in rows:
-                shop_id = row[0]
-                hours = row[1] or ""
-                days_open_raw = row[2]
-                
-                # Parse days_open - could be JSON string or already parsed
-                if days_open_raw:
-                    if isinstance(days_open_raw, str):
-                        try:
-                            days_open = json.loads(days_open_raw)
-                        except:
-                            days_open = []
-                    else:
-                        days_open = days_open_raw
-                else:
-                    days_open = []
-                
-                # Convert to new format
-                weekly_hours = convert_to_weekly_hours(hours, days_open)
-                weekly_hours_json = json.dumps(weekly_hours)
-                
-                # Update the row
-                db.execute(
-                    text("UPDATE coffee_shops SET weekly_hours = :weekly_hours WHERE id = :id"),
-                    {"weekly_hours": weekly_hours_json, "id": shop_id}
-                )
-                print(f"  Migrated shop {shop_id}: {weekly_hours}")
-            
-            db.commit()
-            print(f"✓ Migrated {len(rows)} shops")
+            stats = convert_rows(engine, has_hours, has_days_open, has_weekly_hours or not dry_run,
+                                 batch_size, dry_run)
+            print(f"✓ {'Would migrate' if dry_run else 'Migrated'} {stats['updated']} of "
+                  f"{stats['scanned']} shops in {stats['seconds']:.2f}s")
         
+        if dry_run:
+            print("\n✅ Dry run completed (no changes made)")
+            return
+
         # Step 3: Drop old columns (SQLite doesn't support DROP COLUMN directly in older versions)
         if is_sqlite:
             print("\n⚠️  SQLite doesn't easily support dropping columns.")
@@ -165,33 +220,36 @@ def migrate():
             print("   2. Delete coffee_shops.db")
             print("   3. Run seed_data.py (update it first to use weekly_hours)")
         else:
-            # PostgreSQL - drop old columns
+            # PostgreSQL - drop old columns (metadata-only, with a short lock timeout)
             if has_hours:
                 print("Dropping old 'hours' column...")
-                db.execute(text("ALTER TABLE coffee_shops DROP COLUMN hours"))
-                db.commit()
+                run_ddl(engine, "ALTER TABLE coffee_shops DROP COLUMN hours")
                 print("✓ Dropped hours column")
             
             if has_days_open:
                 print("Dropping old 'days_open' column...")
-                db.execute(text("ALTER TABLE coffee_shops DROP COLUMN days_open"))
-                db.commit()
+                run_ddl(engine, "ALTER TABLE coffee_shops DROP COLUMN days_open")
                 print("✓ Dropped days_open column")
         
         print("\n✅ Migration completed successfully!")
         
     except Exception as e:
         print(f"❌ Migration failed: {e}")
-        db.rollback()
         raise
-    finally:
-        db.close()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert hours/days_open to weekly_hours")
+    parser.add_argument("--dry-run", action="store_true", help="Print the changes without writing")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    # Allow `from app...` imports when run from another directory
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
     print("=" * 50)
     print("Weekly Hours Migration")
     print("=" * 50)
     print(f"Database: {DATABASE_URL}")
     print()
-    migrate()
+    migrate(batch_size=args.batch_size, dry_run=args.dry_run)
@@ -2,11 +2,22 @@
 """
 Coffee Shop Database Populator
 Uses Google Places API to find specialty coffee shops and add them to your database.
+Run with --coverage to print shop counts for each target city instead.
+
+Each city is searched as a quadtree: a Places nearby search returns at most
+60 results, so a cell that hits the cap is split into four and searched
+again, down to MIN_CELL_RADIUS_M. Searched cells are recorded in
+SEARCH_COVERAGE_FILE; later runs skip cells searched within
+COVERAGE_MAX_AGE_DAYS (pass --refresh to search everything again).
 """
 
 import requests
+import json
+import math
+import sys
 import time
 import os
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -56,6 +67,19 @@ MIN_RATING = 4.0
 # Minimum number of reviews (0 to disable)
 MIN_REVIEWS = 10
 
+# Quadtree search: each city starts as one cell of CITY_SEARCH_RADIUS_M and
+# cells that return PLACES_RESULT_CAP results are split, down to cells of
+# MIN_CELL_RADIUS_M
+CITY_SEARCH_RADIUS_M = 15000
+MIN_CELL_RADIUS_M = 500
+PLACES_RESULT_CAP = 60
+
+# Where searched cells are recorded, and how long a search stays fresh
+SEARCH_COVERAGE_FILE = os.getenv(
+    "SEARCH_COVERAGE_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_coverage.json")
+)
+COVERAGE_MAX_AGE_DAYS = int(os.getenv("COVERAGE_MAX_AGE_DAYS", "30"))
+
 # Major US cities to search (add more as needed)
 US_CITIES = [
     # Texas
@@ -158,8 +182,41 @@ def get_existing_shops(token: str) -> tuple[set, dict]:
     return existing, existing_coords
 
 
-def search_google_places(query: str, lat: float, lng: float, radius: int = 15000) -> list:
-    """Search Google Places API for coffee shops."""
+def get_city_counts() -> dict:
+    """Shop counts per (city, state) from the /cities aggregates."""
+    try:
+        response = requests.get(f"{API_BASE_URL}/cities")
+        if response.status_code == 200:
+            return {(row["city"], row["state"]): row for row in response.json()}
+    except Exception as e:
+        print(f"⚠️ Could not fetch city counts: {e}")
+    return {}
+
+
+def print_coverage_report():
+    """Show how many shops each target city has, thinnest coverage first."""
+    counts = get_city_counts()
+    print("=" * 60)
+    print("📊 COVERAGE")
+    print("=" * 60)
+    rows = sorted(
+        ((counts.get((city, state), {}), city, state) for city, state, _, _ in US_CITIES),
+        key=lambda row: row[0].get("shop_count", 0),
+    )
+    for stats, city, state in rows:
+        print(
+            f"   {city + ', ' + state:<24} {stats.get('shop_count', 0):>4} shops"
+            f"  ({stats.get('pour_over', 0)} pour-over, {stats.get('has_wifi', 0)} wifi)"
+        )
+    targets = {(city, state) for city, state, _, _ in US_CITIES}
+    others = [row for key, row in counts.items() if key not in targets]
+    if others:
+        print(f"\n   Plus {sum(row['shop_count'] for row in others)} shops in {len(others)} other cities")
+    print("=" * 60)
+
+
+def search_google_places(query: str, lat: float, lng: float, radius: int = 15000) -> tuple[list, int]:
+    """Search Google Places API for coffee shops. Returns (results, billable requests made)."""
     url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
     params = {
         "key": GOOGLE_PLACES_API_KEY,
@@ -170,8 +227,10 @@ def search_google_places(query: str, lat: float, lng: float, radius: int = 15000
     }
     
     results = []
+    calls = 0
     try:
         response = requests.get(url, params=params)
+        calls += 1
         data = response.json()
         
         if data.get("status") == "OK":
@@ -185,6 +244,7 @@ def search_google_places(query: str, lat: float, lng: float, radius: int = 15000
                     "pagetoken": data["next_page_token"]
                 }
                 response = requests.get(url, params=next_page_params)
+                calls += 1
                 data = response.json()
                 if data.get("status") == "OK":
                     results.extend(data.get("results", []))
@@ -196,7 +256,108 @@ def search_google_places(query: str, lat: float, lng: float, radius: int = 15000
     except Exception as e:
         print(f"❌ Places API error: {e}")
     
-    return results
+    return results, calls
+
+
+# =============================================================================
+# QUADTREE SEARCH PLANNING
+# =============================================================================
+
+METERS_PER_DEGREE_LAT = 111320
+
+
+def load_coverage() -> dict:
+    """Searched cells keyed by cell_key: {"searched_at", "results", "saturated"}."""
+    try:
+        with open(SEARCH_COVERAGE_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        print(f"⚠️ Ignoring unreadable coverage file: {e}")
+        return {}
+
+
+def save_coverage(coverage: dict):
+    temp_path = f"{SEARCH_COVERAGE_FILE}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(coverage, f, indent=1, sort_keys=True)
+    os.replace(temp_path, SEARCH_COVERAGE_FILE)
+
+
+def cell_key(query: str, lat: float, lng: float, half_side: float) -> str:
+    return f"{query}|{lat:.5f},{lng:.5f}|{round(half_side)}"
+
+
+def is_fresh(record: Optional[dict]) -> bool:
+    if not record:
+        return False
+    searched_at = datetime.fromisoformat(record["searched_at"])
+    return datetime.now(timezone.utc) - searched_at < timedelta(days=COVERAGE_MAX_AGE_DAYS)
+
+
+def child_cells(lat: float, lng: float, half_side: float) -> list:
+    """Centers and half-side of the four quadrants of a square cell."""
+    quarter = half_side / 2
+    dlat = quarter / METERS_PER_DEGREE_LAT
+    dlng = quarter / (METERS_PER_DEGREE_LAT * math.cos(math.radians(lat)))
+    return [
+        (lat + sign_lat * dlat, lng + sign_lng * dlng, quarter)
+        for sign_lat in (1, -1) for sign_lng in (-1, 1)
+    ]
+
+
+class QuadtreeSearch:
+    """
+    Search one city as a quadtree of square cells. Each cell is searched
+    with the circle that encloses it (radius = half side * sqrt 2), so the
+    four children of a split cell cover it without gaps.
+    """
+
+    def __init__(self, query: str, coverage: dict, refresh: bool = False):
+        self.query = query
+        self.coverage = coverage
+        self.refresh = refresh
+        self.places = {}
+        self.records = {}  # Cells searched this run, saved once the city is done
+        self.api_calls = 0
+        self.cells_searched = 0
+        self.cells_skipped = 0
+
+    def run(self, lat: float, lng: float) -> list:
+        # The root square encloses the whole CITY_SEARCH_RADIUS_M circle
+        self._search_cell(lat, lng, CITY_SEARCH_RADIUS_M, depth=0)
+        return list(self.places.values())
+
+    def _search_cell(self, lat: float, lng: float, half_side: float, depth: int):
+        key = cell_key(self.query, lat, lng, half_side)
+        radius = half_side * math.sqrt(2)
+        record = None if self.refresh else self.coverage.get(key)
+
+        if is_fresh(record):
+            saturated = record["saturated"]
+            self.cells_skipped += 1
+        else:
+            results, calls = search_google_places(self.query, lat, lng, round(radius))
+            self.api_calls += calls
+            self.cells_searched += 1
+            for place in results:
+                self.places.setdefault(place.get("place_id"), place)
+            saturated = len(results) >= PLACES_RESULT_CAP
+            self.records[key] = {
+                "searched_at": datetime.now(timezone.utc).isoformat(),
+                "results": len(results),
+                "saturated": saturated,
+            }
+            print(f"   {'  ' * depth}◻️ {radius / 1000:.1f} km cell at {lat:.4f},{lng:.4f}: "
+                  f"{len(results)} results{' (cap hit, splitting)' if saturated and radius / 2 >= MIN_CELL_RADIUS_M else ''}")
+
+        # Sparse cells are complete; only saturated ones need a closer look
+        if saturated and radius / 2 >= MIN_CELL_RADIUS_M:
+            for child_lat, child_lng, child_half_side in child_cells(lat, lng, half_side):
+                self._search_cell(child_lat, child_lng, child_half_side, depth + 1)
+        elif saturated:
+            print(f"   {'  ' * depth}⚠️ Cell at {lat:.4f},{lng:.4f} still saturated at the minimum size")
 
 
 def get_place_details(place_id: str) -> dict:
@@ -302,6 +463,10 @@ def add_shop_to_database(shop_data: dict, token: str) -> bool:
         )
         if response.status_code == 201:
             return True
+        elif response.status_code == 409:
+            # The API's own near-duplicate check caught what is_duplicate missed
+            print(f"  ⏭️ Skipped duplicate: {response.json().get('detail')}")
+            return False
         else:
             print(f"  ⚠️ Failed to add: {response.text}")
             return False
@@ -406,9 +571,11 @@ def main():
         print("\n🔍 DRY RUN MODE - No changes will be made\n")
     
     # City selection
+    city_counts = get_city_counts()
     print("\n🏙️ Cities to search:")
     for i, (city, state, _, _) in enumerate(US_CITIES):
-        print(f"   {i+1}. {city}, {state}")
+        count = city_counts.get((city, state), {}).get("shop_count", 0)
+        print(f"   {i+1}. {city}, {state} ({count} shops)")
     
     print(f"\n   Enter city numbers (comma-separated), 'all', or press Enter for all:")
     city_input = input("   > ").strip()
@@ -429,6 +596,18 @@ def main():
     total_added = 0
     total_skipped = 0
     total_found = 0
+    total_api_calls = 0
+    total_cells_searched = 0
+    total_cells_skipped = 0
+    
+    coverage = load_coverage()
+    refresh = "--refresh" in sys.argv
+    
+    def record_coverage(records: dict):
+        # Dry runs leave coverage alone so the real run still searches
+        if records and not dry_run:
+            coverage.update(records)
+            save_coverage(coverage)
     
     for city, state, lat, lng in selected_cities:
         print(f"\n{'='*50}")
@@ -436,11 +615,19 @@ def main():
         print(f"{'='*50}")
         
         city_shops = []
+        city_records = {}
         
         # Search with different queries
         for query in SEARCH_QUERIES:  # Search with all queries
             print(f"   Searching: '{query}'...")
-            places = search_google_places(query, lat, lng)
+            search = QuadtreeSearch(query, coverage, refresh)
+            places = search.run(lat, lng)
+            city_records.update(search.records)
+            total_api_calls += search.api_calls
+            total_cells_searched += search.cells_searched
+            total_cells_skipped += search.cells_skipped
+            print(f"   {search.cells_searched} cells searched ({search.api_calls} API calls), "
+                  f"{search.cells_skipped} fresh cells skipped, {len(places)} places")
             
             for place in places:
                 # Skip if already processed
@@ -498,6 +685,7 @@ def main():
         
         if not city_shops:
             print("   No new shops found")
+            record_coverage(city_records)
             continue
         
         # Show found shops
@@ -536,12 +724,15 @@ def main():
         
         total_added += added
         print(f"   Added {added}/{len(city_shops)} shops from {city}")
+        record_coverage(city_records)
     
     # Summary
     print("\n" + "=" * 60)
     print("📊 SUMMARY")
     print("=" * 60)
     print(f"   Cities searched: {len(selected_cities)}")
+    print(f"   Cells searched: {total_cells_searched} ({total_api_calls} Places API calls)")
+    print(f"   Fresh cells skipped: {total_cells_skipped}")
     print(f"   New shops found: {total_found}")
     print(f"   Duplicates skipped: {total_skipped}")
     print(f"   Shops added: {total_added}")
@@ -549,5 +740,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if "--coverage" in sys.argv:
+        print_coverage_report()
+    else:
+        main()
 
@@ -3,11 +3,14 @@ Script to seed the database with initial coffee shop data.
 Run with: python3 seed_data.py
 (Or: python seed_data.py if virtual environment is activated)
 """
-from app.core.database import SessionLocal, engine, Base
+from app.core.changes import mark_bulk_change
+from app.core.cities import rebuild_city_stats
+from app.core.database import SessionLocal, engine
+from app.core.migrations import run_migrations
 from app.models.coffee_shop import CoffeeShop
 
 # Create tables
-Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 db = SessionLocal()
 
@@ -160,6 +163,10 @@ try:
     else:
         for shop in shops:
             db.add(shop)
+        db.flush()
+        rebuild_city_stats(db)
+        # Bypasses the per-shop change log, so invalidate caches and synced clients
+        mark_bulk_change(db)
         db.commit()
         print(f"Successfully seeded {len(shops)} coffee shops!")
 except Exception as e:
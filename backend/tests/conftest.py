@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+# Point the app at a throwaway database before any app module creates its engine
+_db_dir = tempfile.mkdtemp(prefix="coffee-filter-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'test.db')}")
+os.environ.setdefault("RATE_LIMIT_SCALE", "1")
+os.environ.setdefault("HEALTH_CHECK_GEOCODER", "false")
+os.environ.setdefault("GEOCODER_BACKEND", "offline")
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def session_factory(request, tmp_path):
+    """
+    A freshly migrated database. The postgres variant needs TEST_POSTGRES_URL
+    pointing at a scratch database; its public schema is dropped first.
+    """
+    from app.core.migrations import run_migrations
+
+    if request.param == "sqlite":
+        engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    else:
+        url = os.getenv("TEST_POSTGRES_URL")
+        if not url:
+            pytest.skip("TEST_POSTGRES_URL not set")
+        engine = create_engine(url)
+        with engine.begin() as conn:
+            conn.execute(text("DROP SCHEMA public CASCADE"))
+            conn.execute(text("CREATE SCHEMA public"))
+    run_migrations(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
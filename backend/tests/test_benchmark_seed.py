@@ -0,0 +1,10 @@
+from benchmarks.seed import seed_catalog
+
+
+def test_reseeding_starts_ids_over(session_factory):
+    engine = session_factory.kw["bind"]
+
+    first = seed_catalog(engine, 20)
+    second = seed_catalog(engine, 20)
+
+    assert first == second == list(range(1, 21))
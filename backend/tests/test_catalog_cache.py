@@ -0,0 +1,64 @@
+import orjson
+
+from app.core.catalog_cache import CatalogCache
+from app.core.changes import UPSERT, mark_bulk_change, record_change
+from app.models.catalog_version import CatalogVersion
+from app.models.coffee_shop import CoffeeShop
+
+
+def add_shop(db, name):
+    shop = CoffeeShop(
+        name=name, address="1 Main St, Boise, ID 83702", latitude=43.6, longitude=-116.2,
+        accessibility=True, has_wifi=True, machine="", pour_over=False,
+    )
+    db.add(shop)
+    db.flush()
+    return shop
+
+
+def names(body):
+    return [shop["name"] for shop in orjson.loads(body)]
+
+
+def test_cache_follows_api_writes(session_factory):
+    db, cache = session_factory(), CatalogCache()
+    record_change(db, add_shop(db, "First").id, UPSERT)
+    db.commit()
+    assert names(cache.get(db, "summary")) == ["First"]
+
+    record_change(db, add_shop(db, "Second").id, UPSERT)
+    db.commit()
+    assert names(cache.get(db, "summary")) == ["First", "Second"]
+    db.close()
+
+
+def test_cache_follows_bulk_writes(session_factory):
+    db, cache = session_factory(), CatalogCache()
+    add_shop(db, "Seeded")
+    mark_bulk_change(db)
+    db.commit()
+    assert names(cache.get(db, "summary")) == ["Seeded"]
+
+    # A script writing outside the API bumps the version the same way
+    db.query(CoffeeShop).delete()
+    add_shop(db, "Reseeded")
+    mark_bulk_change(db)
+    db.commit()
+    assert names(cache.get(db, "summary")) == ["Reseeded"]
+    db.close()
+
+
+def test_cache_misses_on_a_recreated_catalog_with_the_same_version(session_factory):
+    db, cache = session_factory(), CatalogCache()
+    add_shop(db, "Old")
+    mark_bulk_change(db)
+    db.commit()
+    assert names(cache.get(db, "summary")) == ["Old"]
+
+    # Same version number, different database: only the epoch tells them apart
+    db.query(CoffeeShop).delete()
+    add_shop(db, "New")
+    db.query(CatalogVersion).update({CatalogVersion.epoch: CatalogVersion.epoch + 1})
+    db.commit()
+    assert names(cache.get(db, "summary")) == ["New"]
+    db.close()
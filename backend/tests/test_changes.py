@@ -0,0 +1,115 @@
+import threading
+import time
+
+from app.core.changes import (
+    DELETE,
+    UPSERT,
+    catalog_state,
+    changes_since,
+    current_version,
+    mark_bulk_change,
+    record_change,
+)
+
+
+def test_versions_follow_commit_order(session_factory):
+    """A later-starting writer can't commit a version past one still in flight."""
+    first, reader = session_factory(), session_factory()
+    first_change = record_change(first, 101, UPSERT)
+
+    second_version = []
+
+    def second_writer():
+        db = session_factory()
+        try:
+            second_version.append(record_change(db, 102, UPSERT).id)
+            db.commit()
+        finally:
+            db.close()
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    time.sleep(0.3)
+    # The second writer waits for the version lock instead of taking version 2
+    assert thread.is_alive()
+    assert current_version(reader) == 0
+    reader.rollback()
+
+    first.commit()
+    thread.join(10)
+    assert not thread.is_alive()
+
+    assert (first_change.id, second_version[0]) == (1, 2)
+    assert current_version(reader) == 2
+    # A client that synced at version 1 gets the second write, and one at 0 gets both
+    assert changes_since(reader, 1) == ([102], [])
+    assert sorted(changes_since(reader, 0)[0]) == [101, 102]
+    for db in (first, reader):
+        db.close()
+
+
+def test_reader_never_skips_a_change(session_factory):
+    """Whatever version a reader sees, syncing from it later returns every newer change."""
+    db, reader = session_factory(), session_factory()
+    seen = []
+    stop = threading.Event()
+
+    def poll():
+        while not stop.is_set():
+            seen.append(current_version(reader))
+            reader.rollback()
+
+    def write(shop_ids):
+        session = session_factory()
+        try:
+            for shop_id in shop_ids:
+                record_change(session, shop_id, UPSERT)
+                session.commit()
+        finally:
+            session.close()
+
+    poller = threading.Thread(target=poll)
+    writers = [threading.Thread(target=write, args=(range(start, start + 20),)) for start in (1000, 2000, 3000)]
+    poller.start()
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(30)
+    stop.set()
+    poller.join(10)
+
+    final = current_version(db)
+    assert final == 60
+    for version in set(seen):
+        upserts, _ = changes_since(db, version)
+        assert len(upserts) == final - version
+    db.close()
+    reader.close()
+
+
+def test_changes_collapse_to_latest_operation(session_factory):
+    db = session_factory()
+    record_change(db, 1, UPSERT)
+    record_change(db, 2, UPSERT)
+    record_change(db, 1, DELETE)
+    db.commit()
+
+    assert current_version(db) == 3
+    assert changes_since(db, 0) == ([2], [1])
+    assert changes_since(db, 3) == ([], [])
+    db.close()
+
+
+def test_bulk_change_forces_older_clients_to_resync(session_factory):
+    db = session_factory()
+    record_change(db, 1, UPSERT)
+    db.commit()
+    bulk = mark_bulk_change(db)
+    db.commit()
+    record_change(db, 2, UPSERT)
+    db.commit()
+
+    state = catalog_state(db)
+    assert (bulk, state.version, state.baseline) == (2, 3, 2)
+    assert state.epoch != 0
+    db.close()
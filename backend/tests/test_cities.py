@@ -0,0 +1,72 @@
+import threading
+import time
+
+from app.core.cities import refresh_city_stats
+from app.models.city_stat import CityStat
+from app.models.coffee_shop import CoffeeShop
+
+
+def add_shop(db, name, latitude=43.6, longitude=-116.2, address="1 Main St, Boise, ID 83702"):
+    shop = CoffeeShop(
+        name=name, address=address, latitude=latitude, longitude=longitude,
+        accessibility=True, has_wifi=False, machine="", pour_over=True,
+    )
+    db.add(shop)
+    db.flush()
+    refresh_city_stats(db, [(shop.city, shop.state)])
+    return shop
+
+
+def test_first_shops_in_a_new_city_written_concurrently(session_factory):
+    first = session_factory()
+    add_shop(first, "First", 43.60)
+
+    errors = []
+
+    def second_writer():
+        db = session_factory()
+        try:
+            add_shop(db, "Second", 43.62)
+            db.commit()
+        except Exception as e:
+            errors.append(e)
+            db.rollback()
+        finally:
+            db.close()
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    time.sleep(0.3)
+    first.commit()
+    thread.join(10)
+
+    assert errors == []
+    stat = first.query(CityStat).filter_by(city="Boise", state="ID").one()
+    assert stat.shop_count == 2
+    assert stat.pour_over_count == 2
+    assert (stat.min_latitude, stat.max_latitude) == (43.60, 43.62)
+    first.close()
+
+
+def test_refresh_tracks_moves_and_deletes(session_factory):
+    db = session_factory()
+    shop = add_shop(db, "Mover")
+    db.commit()
+
+    shop.address = "2 Elm St, Nampa, ID 83651"
+    db.flush()
+    refresh_city_stats(db, [("Boise", "ID"), (shop.city, shop.state)])
+    db.commit()
+    assert [(s.city, s.shop_count) for s in db.query(CityStat).all()] == [("Nampa", 1)]
+
+    db.delete(shop)
+    db.flush()
+    refresh_city_stats(db, [("Nampa", "ID")])
+    db.commit()
+    assert db.query(CityStat).count() == 0
+
+    # The city comes back after its row was deleted
+    add_shop(db, "Return", address="3 Oak St, Nampa, ID 83651")
+    db.commit()
+    assert db.query(CityStat).one().shop_count == 1
+    db.close()
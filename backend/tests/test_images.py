@@ -0,0 +1,154 @@
+import asyncio
+import http.server
+import os
+import socket
+import threading
+
+import httpcore
+import httpx
+import pytest
+
+from app.core.images import (
+    DiskLRUCache,
+    ImageResizer,
+    ImageUnavailable,
+    PublicAddressTransport,
+    check_public_url,
+)
+
+
+def fill(cache, name, size, mtime):
+    cache.put(name, b"x" * size)
+    os.utime(cache.path(name), (mtime, mtime))
+
+
+def cached_names(directory):
+    return sorted(name for name in os.listdir(directory) if not name.startswith("."))
+
+
+def test_bound_holds_across_workers_sharing_a_directory(tmp_path):
+    # Two processes' caches over the same directory, each unaware of the other's writes
+    first = DiskLRUCache(str(tmp_path), max_bytes=1000)
+    second = DiskLRUCache(str(tmp_path), max_bytes=1000)
+    fill(first, "a", 400, 1)
+    fill(second, "b", 400, 2)
+    fill(first, "c", 400, 3)
+
+    total = sum(os.path.getsize(tmp_path / name) for name in cached_names(tmp_path))
+    assert total <= 1000
+    assert cached_names(tmp_path) == ["b", "c"]
+
+
+def test_eviction_is_least_recently_used(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), max_bytes=1000)
+    fill(cache, "a", 300, 1)
+    fill(cache, "b", 300, 2)
+    fill(cache, "c", 300, 3)
+    assert cache.get("a") == b"x" * 300  # a hit makes "a" the newest
+
+    cache.put("d", b"x" * 300)
+
+    assert cached_names(tmp_path) == ["a", "c", "d"]
+
+
+def test_get_sees_files_written_by_other_workers(tmp_path):
+    writer = DiskLRUCache(str(tmp_path), max_bytes=1000)
+    reader = DiskLRUCache(str(tmp_path), max_bytes=1000)
+    assert reader.get("shared") is None
+
+    writer.put("shared", b"data")
+
+    assert reader.get("shared") == b"data"
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/image.jpg",
+    "http://10.0.0.5/image.jpg",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/image.jpg",
+    "http://localhost/image.jpg",
+    "file:///etc/passwd",
+])
+def test_private_urls_are_refused(url):
+    with pytest.raises(ImageUnavailable):
+        asyncio.run(check_public_url(url))
+
+
+def test_public_address_is_allowed():
+    asyncio.run(check_public_url("https://8.8.8.8/image.jpg"))
+
+
+def test_redirect_to_a_private_host_is_not_followed(tmp_path):
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data/"})
+
+    resizer = ImageResizer(DiskLRUCache(str(tmp_path), max_bytes=1000))
+    resizer._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with pytest.raises(ImageUnavailable, match="not a public address"):
+        asyncio.run(resizer._fetch("http://8.8.8.8/image.jpg"))
+    assert requested == ["http://8.8.8.8/image.jpg"]
+
+
+class RecordingBackend(httpcore.AsyncNetworkBackend):
+    """Stands in for the network: records where connections go, then fails them."""
+
+    def __init__(self):
+        self.connected = []
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        self.connected.append((host, port))
+        raise httpcore.ConnectError("offline")
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+
+def fake_dns(monkeypatch, answers):
+    """Answer getaddrinfo from `answers` in turn, like a TTL-0 record."""
+    answers = iter(answers)
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (next(answers), port))]
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+
+
+def test_connection_goes_to_the_address_that_was_checked(tmp_path, monkeypatch):
+    fake_dns(monkeypatch, ["93.184.216.34", "93.184.216.34"])
+    backend = RecordingBackend()
+    resizer = ImageResizer(DiskLRUCache(str(tmp_path), max_bytes=1000))
+    resizer._client = httpx.AsyncClient(transport=PublicAddressTransport(backend))
+
+    with pytest.raises(ImageUnavailable):
+        asyncio.run(resizer._fetch("http://images.example/photo.jpg"))
+    assert backend.connected == [("93.184.216.34", 80)]
+
+
+def test_dns_rebinding_to_a_private_address_is_refused(tmp_path, monkeypatch):
+    requests = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        # Public when checked, loopback when connecting
+        fake_dns(monkeypatch, ["93.184.216.34", "127.0.0.1"])
+        resizer = ImageResizer(DiskLRUCache(str(tmp_path), max_bytes=1000))
+
+        with pytest.raises(ImageUnavailable, match="not a public address"):
+            asyncio.run(resizer._fetch(f"http://rebind.example:{server.server_port}/photo.jpg"))
+        assert requests == []
+    finally:
+        server.shutdown()
@@ -0,0 +1,34 @@
+import json
+
+from sqlalchemy import text
+
+from app.core.changes import catalog_state
+from migrate_weekly_hours import convert_rows
+
+
+def test_conversion_marks_a_bulk_change(session_factory):
+    db = session_factory()
+    try:
+        engine = db.get_bind()
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO coffee_shops (name, address, latitude, longitude, weekly_hours) "
+                "VALUES ('Legacy', '1 Main St, Boise, ID 83702', 43.6, -116.2, :weekly_hours)"
+            ), {"weekly_hours": json.dumps({})})
+        before = catalog_state(db)
+
+        assert convert_rows(engine, False, False, dry_run=True)["updated"] == 1
+        db.rollback()
+        assert catalog_state(db) == before
+
+        assert convert_rows(engine, False, False)["updated"] == 1
+        db.rollback()
+        after = catalog_state(db)
+        assert after.version == after.baseline == before.version + 1
+
+        # Nothing left to convert, so no bump
+        assert convert_rows(engine, False, False)["updated"] == 0
+        db.rollback()
+        assert catalog_state(db) == after
+    finally:
+        db.close()
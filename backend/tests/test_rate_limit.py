@@ -0,0 +1,155 @@
+import asyncio
+from datetime import timedelta
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.auth import create_access_token
+from app.core.rate_limit import MemoryStore, RateLimit, RateLimitMiddleware, client_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def consume(store, key, limit):
+    return asyncio.run(store.consume(key, limit))
+
+
+def scope(client="1.2.3.4", authorization=None):
+    headers = [(b"authorization", authorization.encode())] if authorization else []
+    return {"type": "http", "headers": headers, "client": (client, 5000)}
+
+
+def limited_client(limits):
+    async def ok(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/limited", ok), Route("/items/{item_id}", ok), Route("/free", ok)])
+    return TestClient(RateLimitMiddleware(app, limits=limits, store=MemoryStore()))
+
+
+# Bucket math
+
+def test_bucket_allows_burst_then_refuses(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    store, limit = MemoryStore(), RateLimit(3, 60)
+
+    results = [consume(store, "k", limit) for _ in range(4)]
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert [tokens for _, tokens in results] == [2, 1, 0, 0]
+
+
+def test_bucket_refills_at_limit_per_window(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    store, limit = MemoryStore(), RateLimit(3, 60)
+    for _ in range(3):
+        consume(store, "k", limit)
+
+    clock.now += 19  # 0.95 of a token
+    assert consume(store, "k", limit)[0] is False
+    clock.now += 1.5  # 1.025 tokens, so one is spent
+    allowed, tokens = consume(store, "k", limit)
+    assert allowed is True
+    assert abs(tokens - 0.025) < 1e-9
+
+
+def test_bucket_never_exceeds_limit(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    store, limit = MemoryStore(), RateLimit(3, 60)
+    consume(store, "k", limit)
+
+    clock.now += 3600
+    assert consume(store, "k", limit) == (True, 2)
+
+
+def test_buckets_are_independent_per_key(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "monotonic", Clock())
+    store, limit = MemoryStore(), RateLimit(1, 60)
+
+    assert consume(store, "a", limit)[0] is True
+    assert consume(store, "a", limit)[0] is False
+    assert consume(store, "b", limit)[0] is True
+
+
+# Middleware
+
+def test_429_with_retry_after_once_bucket_is_empty():
+    client = limited_client({"/limited": RateLimit(2, 60)})
+
+    first = client.get("/limited")
+    assert first.status_code == 200
+    assert first.headers["ratelimit-limit"] == "2"
+    assert first.headers["ratelimit-remaining"] == "1"
+    assert first.headers["ratelimit-policy"] == "2;w=60"
+    assert client.get("/limited").status_code == 200
+
+    refused = client.get("/limited")
+    assert refused.status_code == 429
+    assert refused.json() == {"detail": "Rate limit exceeded, retry later"}
+    # One token every 30s, and the bucket is (almost exactly) empty
+    assert 1 <= int(refused.headers["retry-after"]) <= 30
+    assert refused.headers["ratelimit-remaining"] == "0"
+
+
+def test_templated_routes_share_one_bucket():
+    client = limited_client({"/items/{item_id}": RateLimit(1, 60)})
+
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 429
+
+
+def test_unlisted_routes_and_writes_are_not_limited():
+    client = limited_client({"/limited": RateLimit(1, 60)})
+
+    assert all(client.get("/free").status_code == 200 for _ in range(3))
+    assert "ratelimit-limit" not in client.get("/free").headers
+    client.get("/limited")
+    assert client.post("/limited").status_code == 405  # reached the app, not refused
+
+
+# Key selection
+
+def test_key_is_client_ip_without_token():
+    assert client_key(scope("10.1.1.1")) == "ip:10.1.1.1"
+
+
+def test_key_is_user_for_valid_token():
+    token = create_access_token({"sub": "alice"})
+
+    assert client_key(scope(authorization=f"Bearer {token}")) == "u:alice"
+    # Any valid token for the same user shares the bucket, from any IP
+    other = create_access_token({"sub": "alice"}, expires_delta=timedelta(minutes=5))
+    assert client_key(scope("5.6.7.8", f"bearer {other}")) == "u:alice"
+
+
+def test_invalid_tokens_fall_back_to_ip():
+    assert client_key(scope("10.1.1.1", "Bearer junk1")) == "ip:10.1.1.1"
+    assert client_key(scope("10.1.1.1", "Bearer junk2")) == "ip:10.1.1.1"
+
+    expired = create_access_token({"sub": "alice"}, expires_delta=timedelta(minutes=-1))
+    assert client_key(scope("10.1.1.1", f"Bearer {expired}")) == "ip:10.1.1.1"
+
+    forged = create_access_token({"sub": "alice"})[:-4] + "AAAA"
+    assert client_key(scope("10.1.1.1", f"Bearer {forged}")) == "ip:10.1.1.1"
+
+
+def test_rotating_junk_tokens_do_not_reset_the_budget():
+    client = limited_client({"/limited": RateLimit(2, 3600)})
+
+    statuses = [
+        client.get("/limited", headers={"Authorization": f"Bearer junk{i}"}).status_code for i in range(4)
+    ]
+
+    assert statuses == [200, 200, 429, 429]
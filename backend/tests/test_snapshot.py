@@ -0,0 +1,65 @@
+import orjson
+
+from app.core.changes import UPSERT, record_change
+from app.core.database import SessionLocal, engine
+from app.core.migrations import run_migrations
+from app.core.shop_writes import apply_shop_update
+from app.core.snapshot import CatalogSnapshot, SnapshotManager, build_snapshot, snapshot_version
+from app.models.coffee_shop import CoffeeShop
+
+
+def seed_shops():
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        db.query(CoffeeShop).delete()
+        for i, (latitude, longitude) in enumerate([(43.60, -116.20), (39.10, -94.58), (43.61, -116.21)]):
+            shop = CoffeeShop(
+                name=f"Shop {i}", address="1 Main St, Boise, ID 83702", latitude=latitude, longitude=longitude,
+                accessibility=i % 2 == 0, has_wifi=True, machine="", pour_over=False,
+            )
+            db.add(shop)
+            db.flush()
+            record_change(db, shop.id, UPSERT)
+        db.commit()
+        return [shop_id for (shop_id,) in db.query(CoffeeShop.id).order_by(CoffeeShop.id)]
+    finally:
+        db.close()
+
+
+def test_snapshot_round_trip(tmp_path):
+    ids = seed_shops()
+
+    path = str(tmp_path / "catalog.snapshot")
+    version = build_snapshot(path)
+    snapshot = CatalogSnapshot(path)
+
+    assert snapshot_version(path) == (snapshot.epoch, version)
+    assert [shop["id"] for shop in orjson.loads(bytes(snapshot.list_body("summary")))] == ids
+    assert orjson.loads(bytes(snapshot.shop_body(ids[1])))["name"] == "Shop 1"
+    assert snapshot.shop_body(max(ids) + 1) is None
+    nearby = orjson.loads(snapshot.bodies(snapshot.in_bbox(43.5, -116.3, 43.7, -116.1), "summary"))
+    assert [shop["name"] for shop in nearby] == ["Shop 0", "Shop 2"]
+    # Already current, so a second build keeps the same file
+    assert build_snapshot(path) == version
+
+
+def test_snapshot_bypassed_after_write_without_event(tmp_path):
+    ids = seed_shops()
+    manager = SnapshotManager(str(tmp_path / "catalog.snapshot"), delay=60)
+    manager.build()
+    db = SessionLocal()
+    try:
+        assert manager.current(db) is not None
+
+        # update_shop.py path: no event reaches this process
+        apply_shop_update(db, db.get(CoffeeShop, ids[0]), {"name": "Renamed"})
+        assert manager.current(db) is None
+        assert manager._timer is not None
+        manager._timer.cancel()
+
+        manager._rebuild()
+        snapshot = manager.current(db)
+        assert orjson.loads(bytes(snapshot.shop_body(ids[0])))["name"] == "Renamed"
+    finally:
+        db.close()
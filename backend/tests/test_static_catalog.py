@@ -0,0 +1,50 @@
+import json
+import os
+
+from app.core.changes import UPSERT, catalog_state, record_change
+from app.core.database import SessionLocal, engine
+from app.core.migrations import run_migrations
+from app.core.static_catalog import build_static_catalog
+from app.models.coffee_shop import CoffeeShop
+
+
+def add_shop(name):
+    db = SessionLocal()
+    try:
+        shop = CoffeeShop(
+            name=name, address="1 Main St, Boise, ID 83702", latitude=43.6, longitude=-116.2,
+            accessibility=False, has_wifi=True, machine="", pour_over=False,
+        )
+        db.add(shop)
+        db.flush()
+        record_change(db, shop.id, UPSERT)
+        db.commit()
+        return catalog_state(db)
+    finally:
+        db.close()
+
+
+def test_build_is_skipped_when_the_manifest_is_current(tmp_path):
+    run_migrations(engine)
+    state = add_shop("First")
+    output_dir = str(tmp_path)
+
+    manifest = build_static_catalog(output_dir)
+    assert (manifest["catalog_epoch"], manifest["catalog_version"]) == (state.epoch, state.version)
+    assert build_static_catalog(output_dir)["generated_at"] == manifest["generated_at"]
+
+    state = add_shop("Second")
+    rebuilt = build_static_catalog(output_dir)
+    assert rebuilt["catalog_version"] == state.version
+    assert rebuilt["version"] != manifest["version"]
+
+
+def test_older_build_does_not_replace_a_newer_manifest(tmp_path):
+    run_migrations(engine)
+    state = add_shop("Third")
+    newer = {"version": "newer", "catalog_epoch": state.epoch, "catalog_version": state.version + 1}
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump(newer, f)
+
+    assert build_static_catalog(str(tmp_path)) == newer
+    assert build_static_catalog(str(tmp_path), force=True)["catalog_version"] == state.version
@@ -0,0 +1,118 @@
+from app.api.v1.tiles import sync_tile_cache
+from app.core.changes import catalog_state, mark_bulk_change
+from app.core.shop_writes import apply_shop_update, insert_shop, remove_shop
+from app.core.tiles import TileCache, tile_cache, tiles_for_point
+
+
+def test_tile_is_only_served_at_the_version_it_was_built_for():
+    cache = TileCache()
+    cache.put((1, 0, 0), (7, 3), b"v3")
+
+    assert cache.get((1, 0, 0), (7, 3)) == b"v3"
+    # A write from any worker or script bumps the version
+    assert cache.get((1, 0, 0), (7, 4)) is None
+    # A recreated database with the same version number has a new epoch
+    assert cache.get((1, 0, 0), (8, 3)) is None
+
+
+def test_tile_read_before_a_write_cannot_be_cached_after_it():
+    cache = TileCache()
+    cache.put((1, 0, 0), (7, 4), b"v4")
+
+    # A request that read version 3, finishing after the write, is dropped
+    cache.put((1, 0, 1), (7, 3), b"stale")
+    assert cache.get((1, 0, 1), (7, 3)) is None
+    assert cache.get((1, 0, 1), (7, 4)) is None
+    assert cache.get((1, 0, 0), (7, 4)) == b"v4"
+
+
+def test_newer_version_replaces_older_tiles():
+    cache = TileCache()
+    cache.put((1, 0, 0), (7, 3), b"v3")
+    cache.put((1, 0, 1), (7, 4), b"v4")
+
+    assert len(cache) == 1
+    assert cache.get((1, 0, 1), (7, 4)) == b"v4"
+
+
+def test_lru_eviction():
+    cache = TileCache(max_tiles=2)
+    for y in range(3):
+        cache.put((2, 0, y), (1, 1), bytes([y]))
+
+    assert cache.get((2, 0, 0), (1, 1)) is None
+    assert cache.get((2, 0, 2), (1, 1)) == b"\x02"
+
+
+def test_advance_evicts_only_tiles_covering_the_changed_positions():
+    cache = TileCache()
+    boise = next(tiles_for_point(43.615, -116.202, 10))
+    kansas_city = next(tiles_for_point(39.0997, -94.5786, 10))
+    kansas_city_low = next(tiles_for_point(39.0997, -94.5786, 4))
+    for key in (boise, kansas_city, kansas_city_low):
+        cache.put(key, (7, 3), b"v3")
+
+    cache.advance((7, 3), (7, 4), [(39.0997, -94.5786)])
+
+    assert cache.version == (7, 4)
+    assert cache.get(boise, (7, 4)) == b"v3"
+    assert cache.get(kansas_city, (7, 4)) is None
+    assert cache.get(kansas_city_low, (7, 4)) is None
+
+
+def test_advance_is_skipped_when_another_request_moved_the_cache():
+    cache = TileCache()
+    cache.put((1, 0, 0), (7, 5), b"v5")
+
+    cache.advance((7, 3), (7, 4), [])
+    assert cache.version == (7, 5)
+
+
+def shop_data(name, latitude, longitude):
+    return {
+        "name": name, "address": "1 Main St, Boise, ID 83702", "latitude": latitude, "longitude": longitude,
+        "accessibility": False, "has_wifi": True, "machine": "", "pour_over": False, "weekly_hours": {},
+    }
+
+
+def test_sync_evicts_old_and_new_positions_of_logged_writes(session_factory):
+    db = session_factory()
+    tile_cache.clear()
+    try:
+        moved = insert_shop(db, shop_data("Moved", 43.615, -116.202))
+        deleted = insert_shop(db, shop_data("Deleted", 39.0997, -94.5786))
+        untouched = next(tiles_for_point(47.6062, -122.3321, 12))
+        old, new, gone = (
+            next(tiles_for_point(latitude, longitude, 12))
+            for latitude, longitude in ((43.615, -116.202), (45.523, -122.676), (39.0997, -94.5786))
+        )
+        version = sync_tile_cache(db, catalog_state(db))
+        for key in (untouched, old, new, gone):
+            tile_cache.put(key, version, b"cached")
+
+        apply_shop_update(db, moved, {"latitude": 45.523, "longitude": -122.676})
+        remove_shop(db, deleted)
+        version = sync_tile_cache(db, catalog_state(db))
+
+        assert tile_cache.get(untouched, version) == b"cached"
+        assert [tile_cache.get(key, version) for key in (old, new, gone)] == [None, None, None]
+    finally:
+        db.close()
+        tile_cache.clear()
+
+
+def test_sync_starts_over_after_a_bulk_change(session_factory):
+    db = session_factory()
+    tile_cache.clear()
+    try:
+        version = sync_tile_cache(db, catalog_state(db))
+        tile_cache.put((1, 0, 0), version, b"cached")
+
+        mark_bulk_change(db)
+        db.commit()
+        version = sync_tile_cache(db, catalog_state(db))
+
+        assert tile_cache.get((1, 0, 0), version) is None
+    finally:
+        db.close()
+        tile_cache.clear()
@@ -4,6 +4,7 @@ Usage: python update_shop.py <shop_id>
 """
 import sys
 from app.core.database import SessionLocal
+from app.core.shop_writes import apply_shop_update
 from app.models.coffee_shop import CoffeeShop
 
 def update_coffee_shop(shop_id: int, updates: dict):
@@ -16,12 +17,12 @@ def update_coffee_shop(shop_id: int, updates: dict):
             return
         
         # Update fields
-        for key, value in updates.items():
-            if hasattr(shop, key):
-                setattr(shop, key, value)
-                print(f"Updated {key} to {value}")
+        update_data = {key: value for key, value in updates.items() if hasattr(shop, key)}
+        for key, value in update_data.items():
+            print(f"Updated {key} to {value}")
         
-        db.commit()
+        # Same path as the API: change log, city stats and catalog event
+        apply_shop_update(db, shop, update_data)
         print(f"Successfully updated coffee shop {shop_id}")
     except Exception as e:
         print(f"Error updating coffee shop: {e}")
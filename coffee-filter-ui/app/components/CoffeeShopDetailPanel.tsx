@@ -22,6 +22,7 @@ import { Button } from "./ui/button";
 import { Badge } from "./ui/badge";
 import { Card } from "./ui/card";
 import type { CoffeeShop } from "../lib/types";
+import { shopImageUrl } from "../lib/api";
 import { isCurrentlyOpen } from "./WeeklyHoursInput";
 
 interface CoffeeShopDetailPanelProps {
@@ -309,7 +310,9 @@ export function CoffeeShopDetailPanel({
         {shop.image && (
           <div className="text-sm font-medium mb-2">
             <img
-              src={shop.image}
+              src={shopImageUrl(shop, 480)}
+              srcSet={`${shopImageUrl(shop, 480)} 480w, ${shopImageUrl(shop, 960)} 960w`}
+              sizes="(max-width: 640px) 100vw, 480px"
               alt={shop.name}
               width={500}
               height={500}
@@ -318,6 +321,7 @@ export function CoffeeShopDetailPanel({
                 // Fall back to placeholder if image fails to load
                 // Only set placeholder if not already the placeholder (prevent infinite loop)
                 if (!e.currentTarget.src.includes("placehold.co")) {
+                  e.currentTarget.srcset = "";
                   e.currentTarget.src = PLACEHOLDER_IMAGE;
                 }
               }}
@@ -23,6 +23,37 @@ function getAuthHeaders(): HeadersInit {
   return headers;
 }
 
+export interface DuplicateCandidate {
+  id: number;
+  name: string;
+  address: string;
+  distance_m: number;
+  name_similarity: number;
+  same_address: boolean;
+}
+
+// Thrown on 409: the API thinks the shop already exists. Retry with
+// allowDuplicate to save it anyway.
+export class DuplicateShopError extends Error {
+  candidates: DuplicateCandidate[];
+
+  constructor(message: string, candidates: DuplicateCandidate[]) {
+    super(message);
+    this.name = "DuplicateShopError";
+    this.candidates = candidates;
+  }
+}
+
+async function throwIfDuplicate(response: Response): Promise<void> {
+  if (response.status === 409) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new DuplicateShopError(
+      errorData.detail || "Possible duplicate shop",
+      errorData.candidates || []
+    );
+  }
+}
+
 // Transform backend snake_case to frontend camelCase
 function transformToFrontend(backendShop: any): CoffeeShop {
   return {
@@ -72,9 +103,20 @@ function transformToBackend(frontendShop: Partial<CoffeeShop>): any {
   return result;
 }
 
+// Resized WebP/JPEG variant served by the backend's image cache. Placeholders
+// and shops without an id (not saved yet) use the original URL.
+export function shopImageUrl(shop: CoffeeShop, width: number): string {
+  if (!shop.id || !shop.image || shop.image.includes("placehold.co")) {
+    return shop.image;
+  }
+  return `${API_BASE_URL}/images/${shop.id}?w=${width}`;
+}
+
+// Slim records for the map and list (no description, machine or links);
+// load the full record with getCoffeeShop when a shop is opened.
 export async function getCoffeeShops(): Promise<CoffeeShop[]> {
   try {
-    const response = await fetch(`${API_BASE_URL}/coffee-shops`);
+    const response = await fetch(`${API_BASE_URL}/coffee-shops?view=summary`);
     if (!response.ok) {
       throw new Error(`Failed to fetch coffee shops: ${response.statusText}`);
     }
@@ -101,7 +143,8 @@ export async function getCoffeeShop(id: number): Promise<CoffeeShop> {
 }
 
 export async function createCoffeeShop(
-  shop: Partial<Omit<CoffeeShop, "id">>
+  shop: Partial<Omit<CoffeeShop, "id">>,
+  allowDuplicate = false
 ): Promise<CoffeeShop> {
   try {
     // Convert to backend format - don't include lat/lng if not provided (backend will geocode)
@@ -118,13 +161,15 @@ export async function createCoffeeShop(
       shopData.longitude = parseFloat(shop.longitude.toString());
     }
 
-    const response = await fetch(`${API_BASE_URL}/coffee-shops`, {
+    const query = allowDuplicate ? "?allow_duplicate=true" : "";
+    const response = await fetch(`${API_BASE_URL}/coffee-shops${query}`, {
       method: "POST",
       headers: getAuthHeaders(),
       body: JSON.stringify(shopData),
     });
 
     if (!response.ok) {
+      await throwIfDuplicate(response);
       const errorData = await response.json().catch(() => ({}));
       throw new Error(
         errorData.detail ||
@@ -142,18 +187,21 @@ export async function createCoffeeShop(
 
 export async function updateCoffeeShop(
   id: number,
-  updates: Partial<CoffeeShop>
+  updates: Partial<CoffeeShop>,
+  allowDuplicate = false
 ): Promise<CoffeeShop> {
   try {
     const shopData = transformToBackend(updates);
 
-    const response = await fetch(`${API_BASE_URL}/coffee-shops/${id}`, {
+    const query = allowDuplicate ? "?allow_duplicate=true" : "";
+    const response = await fetch(`${API_BASE_URL}/coffee-shops/${id}${query}`, {
       method: "PUT",
       headers: getAuthHeaders(),
       body: JSON.stringify(shopData),
     });
 
     if (!response.ok) {
+      await throwIfDuplicate(response);
       throw new Error(`Failed to update coffee shop: ${response.statusText}`);
     }
 
@@ -2,7 +2,13 @@ import { Coffee } from "lucide-react";
 import type { Route } from "./+types/home";
 import { CoffeeShopMap } from "../components/CoffeeShopMap";
 import type { CoffeeShop } from "../lib/types";
-import { getCoffeeShops, deleteCoffeeShop, updateCoffeeShop } from "../lib/api";
+import {
+  getCoffeeShops,
+  getCoffeeShop,
+  deleteCoffeeShop,
+  updateCoffeeShop,
+  DuplicateShopError,
+} from "../lib/api";
 import { useEffect, useState, useCallback, useMemo, lazy, Suspense } from "react";
 import { CoffeeShopDetailPanel } from "../components/CoffeeShopDetailPanel";
 
@@ -41,6 +47,16 @@ function getIdFromSlug(slug: string): number | null {
   return match ? parseInt(match[1], 10) : null;
 }
 
+// Ask the admin whether to save a shop the API flagged as a likely duplicate
+function confirmDuplicate(err: DuplicateShopError): boolean {
+  const matches = err.candidates
+    .map((c) => `• ${c.name} (${c.address}, ${Math.round(c.distance_m)} m away)`)
+    .join("\n");
+  return window.confirm(
+    `This looks like a shop that already exists:\n\n${matches}\n\nSave it anyway?`
+  );
+}
+
 // Parse map view from URL params (format: "lat,lng,zoom")
 function parseMapView(
   viewParam: string | null
@@ -87,6 +103,8 @@ export default function Home() {
   const { isAdmin } = useAuth();
   const [searchParams, setSearchParams] = useSearchParams();
   const [selectedShop, setSelectedShop] = useState<CoffeeShop | null>(null);
+  const [selectedShopDetail, setSelectedShopDetail] =
+    useState<CoffeeShop | null>(null);
   const [coffeeShops, setCoffeeShops] = useState<CoffeeShop[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
@@ -155,6 +173,30 @@ export default function Home() {
     }
   }, [searchParams, shopById]);
 
+  // The list only holds summaries; load the full record for the detail panel.
+  // Re-runs after a refresh so the panel picks up edits.
+  useEffect(() => {
+    if (!selectedShop) {
+      setSelectedShopDetail(null);
+      return;
+    }
+    let cancelled = false;
+    getCoffeeShop(selectedShop.id)
+      .then((shop) => {
+        if (!cancelled) setSelectedShopDetail(shop);
+      })
+      .catch((err) => console.error("Error loading coffee shop:", err));
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedShop]);
+
+  // Only show the panel once the full record for the selected shop is here
+  const detailShop =
+    selectedShopDetail && selectedShopDetail.id === selectedShop?.id
+      ? selectedShopDetail
+      : null;
+
   const fetchCoffeeShops = async () => {
     try {
       setLoading(true);
@@ -211,7 +253,14 @@ export default function Home() {
     };
 
     const { createCoffeeShop } = await import("../lib/api");
-    await createCoffeeShop(shopData as Omit<CoffeeShop, "id">);
+    try {
+      await createCoffeeShop(shopData as Omit<CoffeeShop, "id">);
+    } catch (err) {
+      if (!(err instanceof DuplicateShopError) || !confirmDuplicate(err)) {
+        throw err;
+      }
+      await createCoffeeShop(shopData as Omit<CoffeeShop, "id">, true);
+    }
     // Refresh the list
     await fetchCoffeeShops();
   };
@@ -235,8 +284,17 @@ export default function Home() {
     data: Partial<CoffeeShop>
   ) => {
     try {
-      const updatedShop = await updateCoffeeShop(id, data);
+      let updatedShop: CoffeeShop;
+      try {
+        updatedShop = await updateCoffeeShop(id, data);
+      } catch (err) {
+        if (!(err instanceof DuplicateShopError) || !confirmDuplicate(err)) {
+          throw err;
+        }
+        updatedShop = await updateCoffeeShop(id, data, true);
+      }
       setSelectedShop(updatedShop);
+      setSelectedShopDetail(updatedShop);
       await fetchCoffeeShops();
     } catch (err) {
       console.error("Error updating coffee shop:", err);
@@ -331,21 +389,21 @@ export default function Home() {
               : undefined
           }
         />
-        {selectedShop && (
+        {detailShop && (
           <>
             <CoffeeShopDetailPanel
-              shop={selectedShop}
+              shop={detailShop}
               onClose={() => handleSelectShop(null)}
               onDelete={isAdmin ? handleDeleteCoffeeShop : undefined}
               onEdit={isAdmin ? () => setIsEditDialogOpen(true) : undefined}
               onAddLocation={
-                isAdmin ? () => handleAddLocation(selectedShop) : undefined
+                isAdmin ? () => handleAddLocation(detailShop) : undefined
               }
             />
             {isAdmin && (
               <>
                 <EditCoffeeShopDialog
-                  shop={selectedShop}
+                  shop={detailShop}
                   open={isEditDialogOpen}
                   onOpenChange={setIsEditDialogOpen}
                   onSave={handleUpdateCoffeeShop}